@@ -33,7 +33,7 @@ async def export_user_data(
     db = DatabaseAdminService()
     
     # Get user
-    user = db.select_one("users", {"auth0_sub": user_id})
+    user = await db.select_one("users", {"auth0_sub": user_id})
     if not user:
         raise NotFoundError("user", user_id)
     
@@ -43,8 +43,8 @@ async def export_user_data(
     # Collect all user data
     export_data = {
         "user": user,
-        "client": db.select_one("clients", {"id": client_id}) if client_id else None,
-        "audit_logs": db.select("audit_logs", {"user_id": user_id}, order_by="created_at"),
+        "client": await db.select_one("clients", {"id": client_id}) if client_id else None,
+        "audit_logs": await db.select("audit_logs", {"user_id": user_id}, order_by="created_at"),
         "created_at": datetime.utcnow().isoformat(),
     }
     
@@ -66,7 +66,7 @@ async def delete_user(
     db = DatabaseAdminService()
     
     # Get user
-    user = db.select_one("users", {"auth0_sub": user_id})
+    user = await db.select_one("users", {"auth0_sub": user_id})
     if not user:
         raise NotFoundError("user", user_id)
     
@@ -82,7 +82,7 @@ async def delete_user(
     )
     
     # Soft delete (mark as deleted rather than hard delete)
-    db.update(
+    await db.update(
         "users",
         {"auth0_sub": user_id},
         {
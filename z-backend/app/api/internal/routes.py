@@ -4,6 +4,7 @@ Internal API Routes for Step Functions
 from fastapi import APIRouter, Header, HTTPException, Depends
 from typing import Optional
 from datetime import datetime
+import time
 import uuid
 import logging
 
@@ -43,7 +44,7 @@ async def update_voice_status(
     db = DatabaseAdminService()
     
     # Check if voice exists
-    voice = db.select_one("voices", {"id": voice_id})
+    voice = await db.select_one("voices", {"id": voice_id})
     if not voice:
         raise NotFoundError("voice", voice_id)
     
@@ -62,7 +63,7 @@ async def update_voice_status(
         update_data["ultravox_voice_id"] = status_data["ultravox_voice_id"]
     
     # Update voice
-    db.update("voices", {"id": voice_id}, update_data)
+    await db.update("voices", {"id": voice_id}, update_data)
     
     logger.info(f"Updated voice status: {voice_id} -> {status_data.get('status')}")
     
@@ -84,22 +85,12 @@ async def update_campaign_stats(
     db = DatabaseAdminService()
     
     # Check if campaign exists
-    campaign = db.select_one("campaigns", {"id": campaign_id})
+    campaign = await db.select_one("campaigns", {"id": campaign_id})
     if not campaign:
         raise NotFoundError("campaign", campaign_id)
     
-    # Calculate stats from contacts
-    contacts = db.select("campaign_contacts", {"campaign_id": campaign_id})
-    
-    stats = {
-        "pending": sum(1 for c in contacts if c.get("status") == "pending"),
-        "calling": sum(1 for c in contacts if c.get("status") == "calling"),
-        "completed": sum(1 for c in contacts if c.get("status") == "completed"),
-        "failed": sum(1 for c in contacts if c.get("status") == "failed"),
-    }
-    
-    # Update campaign
-    db.update("campaigns", {"id": campaign_id}, {"stats": stats})
+    # Recount stats from contacts (repairs any drift in the trigger-maintained counters)
+    stats = await db.rpc("recalculate_campaign_stats", {"p_campaign_id": campaign_id})
     
     logger.info(f"Updated campaign stats: {campaign_id} -> {stats}")
     
@@ -116,28 +107,43 @@ async def update_campaign_stats(
 async def cleanup_idempotency_keys(
     _: bool = Depends(verify_internal_request),
 ):
-    """Cleanup expired idempotency keys (called by scheduled job)"""
-    db = DatabaseAdminService()
+    """Cleanup expired idempotency keys (called by scheduled job)
     
-    from datetime import datetime
+    Deletes in bounded batches until no expired keys remain or the time
+    budget is spent; "complete" is false if the job should be run again.
+    """
+    from app.core.config import settings
     
-    # Get expired keys
-    expired_keys = db.select("idempotency_keys", {})
+    db = DatabaseAdminService()
+    batch_size = settings.IDEMPOTENCY_CLEANUP_BATCH_SIZE
+    deadline = time.monotonic() + settings.IDEMPOTENCY_CLEANUP_MAX_SECONDS
     
-    # Filter expired keys
-    now = datetime.utcnow()
     deleted_count = 0
-    
-    for key in expired_keys:
-        ttl_at = datetime.fromisoformat(key["ttl_at"].replace("Z", "+00:00"))
-        if now > ttl_at:
-            db.delete("idempotency_keys", {"id": key["id"]})
-            deleted_count += 1
+    batches = 0
+    complete = False
+    
+    while time.monotonic() < deadline:
+        deleted = await db.rpc("delete_expired_idempotency_keys", {"p_batch_size": batch_size}) or 0
+        deleted_count += deleted
+        batches += 1
+        
+        logger.info(
+            f"Idempotency cleanup batch {batches}: deleted {deleted} (total {deleted_count})",
+            extra={"batch": batches, "deleted": deleted, "deleted_total": deleted_count},
+        )
+        
+        if deleted < batch_size:
+            complete = True
+            break
     
     logger.info(f"Cleaned up {deleted_count} expired idempotency keys")
     
     return {
-        "data": {"deleted_count": deleted_count},
+        "data": {
+            "deleted_count": deleted_count,
+            "batches": batches,
+            "complete": complete,
+        },
         "meta": ResponseMeta(
             request_id=str(uuid.uuid4()),
             ts=datetime.utcnow(),
@@ -2,7 +2,7 @@
 API v1 Router
 """
 from fastapi import APIRouter
-from app.api.v1 import auth, voices, agents, knowledge_bases, calls, campaigns, webhooks, tools, telephony
+from app.api.v1 import auth, voices, agents, knowledge_bases, calls, campaigns, webhooks, tools, telephony, jobs
 
 api_router = APIRouter()
 
@@ -16,4 +16,5 @@ api_router.include_router(campaigns.router, prefix="/campaigns", tags=["campaign
 api_router.include_router(webhooks.router, prefix="/webhooks", tags=["webhooks"])
 api_router.include_router(tools.router, prefix="/tools", tags=["tools"])
 api_router.include_router(telephony.router, prefix="/telephony", tags=["telephony"])
+api_router.include_router(jobs.router, prefix="/jobs", tags=["jobs"])
 
@@ -56,7 +56,7 @@ async def create_agent(
     db.set_auth(current_user["token"])
     
     # Validate voice
-    voice = db.get_voice(agent_data.voice_id, current_user["client_id"])
+    voice = await db.get_voice(agent_data.voice_id, current_user["client_id"])
     if not voice:
         raise NotFoundError("voice", agent_data.voice_id)
     if voice.get("status") != "active":
@@ -65,7 +65,7 @@ async def create_agent(
     # Validate knowledge bases
     if agent_data.knowledge_bases:
         for kb_id in agent_data.knowledge_bases:
-            kb = db.get_knowledge_base(kb_id, current_user["client_id"])
+            kb = await db.get_knowledge_base(kb_id, current_user["client_id"])
             if not kb:
                 raise NotFoundError("knowledge_base", kb_id)
             if kb.get("status") != "ready":
@@ -86,7 +86,7 @@ async def create_agent(
         "status": "creating",
     }
     
-    db.insert("agents", agent_record)
+    await db.insert("agents", agent_record)
     
     # Call Ultravox API
     try:
@@ -94,7 +94,7 @@ async def create_agent(
         corpus_ids = []
         if agent_data.knowledge_bases:
             for kb_id in agent_data.knowledge_bases:
-                kb = db.get_knowledge_base(kb_id, current_user["client_id"])
+                kb = await db.get_knowledge_base(kb_id, current_user["client_id"])
                 if kb.get("ultravox_corpus_id"):
                     corpus_ids.append(kb["ultravox_corpus_id"])
         
@@ -128,7 +128,7 @@ async def create_agent(
         ultravox_response = await ultravox_client.create_agent(ultravox_data)
         
         # Update with Ultravox ID
-        db.update(
+        await db.update(
             "agents",
             {"id": agent_id},
             {
@@ -140,7 +140,7 @@ async def create_agent(
         agent_record["status"] = "active"
         
     except Exception as e:
-        db.update(
+        await db.update(
             "agents",
             {"id": agent_id},
             {"status": "failed"},
@@ -190,19 +190,19 @@ async def update_agent(
     db = DatabaseService(current_user["token"])
     db.set_auth(current_user["token"])
     
-    agent = db.get_agent(agent_id, current_user["client_id"])
+    agent = await db.get_agent(agent_id, current_user["client_id"])
     if not agent:
         raise NotFoundError("agent", agent_id)
     
     # Validate voice if changed
     if agent_data.voice_id:
-        voice = db.get_voice(agent_data.voice_id, current_user["client_id"])
+        voice = await db.get_voice(agent_data.voice_id, current_user["client_id"])
         if not voice or voice.get("status") != "active":
             raise ValidationError("Voice must be active")
     
     # Update local database
     update_data = agent_data.dict(exclude_unset=True)
-    db.update("agents", {"id": agent_id}, update_data)
+    await db.update("agents", {"id": agent_id}, update_data)
     
     # Update Ultravox
     if agent.get("ultravox_agent_id"):
@@ -213,7 +213,7 @@ async def update_agent(
             pass
     
     # Get updated agent
-    updated_agent = db.get_agent(agent_id, current_user["client_id"])
+    updated_agent = await db.get_agent(agent_id, current_user["client_id"])
     
     # Emit EventBridge event
     await emit_agent_updated(
@@ -240,7 +240,7 @@ async def list_agents(
     db = DatabaseService(current_user["token"])
     db.set_auth(current_user["token"])
     
-    agents = db.select("agents", {"client_id": current_user["client_id"]}, "created_at")
+    agents = await db.select("agents", {"client_id": current_user["client_id"]}, "created_at")
     
     return {
         "data": [AgentResponse(**agent) for agent in agents],
@@ -261,7 +261,7 @@ async def get_agent(
     db = DatabaseService(current_user["token"])
     db.set_auth(current_user["token"])
     
-    agent = db.get_agent(agent_id, current_user["client_id"])
+    agent = await db.get_agent(agent_id, current_user["client_id"])
     if not agent:
         raise NotFoundError("agent", agent_id)
     
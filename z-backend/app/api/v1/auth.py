@@ -31,7 +31,7 @@ async def get_me(
     db = DatabaseService(current_user["token"])
     db.set_auth(current_user["token"])
     
-    user = db.get_user_by_auth0_sub(current_user["user_id"])
+    user = await db.get_user_by_auth0_sub(current_user["user_id"])
     if not user:
         raise NotFoundError("user")
     
@@ -54,9 +54,9 @@ async def get_clients(
     db.set_auth(current_user["token"])
     
     if current_user["role"] == "agency_admin":
-        clients = db.select("clients")
+        clients = await db.select("clients")
     else:
-        clients = db.select("clients", {"id": current_user["client_id"]})
+        clients = await db.select("clients", {"id": current_user["client_id"]})
     
     return {
         "data": [ClientResponse(**client) for client in clients],
@@ -81,7 +81,7 @@ async def create_api_key(
     db.set_auth(current_user["token"])
     
     # Check for duplicate
-    existing = db.select_one(
+    existing = await db.select_one(
         "api_keys",
         {
             "client_id": current_user["client_id"],
@@ -93,12 +93,12 @@ async def create_api_key(
         raise ConflictError("API key with this name already exists")
     
     # Encrypt API key
-    encrypted_key = encrypt_api_key(api_key_data.api_key)
+    encrypted_key = await encrypt_api_key(api_key_data.api_key, current_user["client_id"], api_key_data.service)
     if not encrypted_key:
         raise ValidationError("Failed to encrypt API key")
     
     # Insert API key
-    api_key_record = db.insert(
+    api_key_record = await db.insert(
         "api_keys",
         {
             "client_id": current_user["client_id"],
@@ -140,7 +140,7 @@ async def update_tts_provider(
     db.set_auth(current_user["token"])
     
     # Update or create API key
-    existing = db.select_one(
+    existing = await db.select_one(
         "api_keys",
         {
             "client_id": current_user["client_id"],
@@ -149,12 +149,12 @@ async def update_tts_provider(
     )
     
     # Encrypt API key
-    encrypted_key = encrypt_api_key(provider_data.api_key)
+    encrypted_key = await encrypt_api_key(provider_data.api_key, current_user["client_id"], provider_data.provider)
     if not encrypted_key:
         raise ValidationError("Failed to encrypt API key")
     
     if existing:
-        api_key_record = db.update(
+        api_key_record = await db.update(
             "api_keys",
             {"id": existing["id"]},
             {
@@ -164,7 +164,7 @@ async def update_tts_provider(
             },
         )
     else:
-        api_key_record = db.insert(
+        api_key_record = await db.insert(
             "api_keys",
             {
                 "client_id": current_user["client_id"],
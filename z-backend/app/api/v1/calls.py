@@ -1,7 +1,7 @@
 """
 Call Endpoints
 """
-from fastapi import APIRouter, Header, Depends
+from fastapi import APIRouter, Header, Depends, Query
 from starlette.requests import Request
 from typing import Optional
 from datetime import datetime
@@ -9,11 +9,12 @@ import uuid
 import json
 
 from app.core.auth import get_current_user
-from app.core.database import DatabaseService
+from app.core.database import DatabaseService, encode_cursor, decode_cursor
 from app.core.exceptions import NotFoundError, ForbiddenError, PaymentRequiredError, ValidationError
 from app.core.idempotency import check_idempotency_key, store_idempotency_response
 from app.core.events import emit_call_created
 from app.services.ultravox import ultravox_client
+from app.services.credit_ledger import get_credit_balance
 from app.models.schemas import (
     CallCreate,
     CallResponse,
@@ -54,19 +55,19 @@ async def create_call(
     db.set_auth(current_user["token"])
     
     # Validate agent
-    agent = db.get_agent(call_data.agent_id, current_user["client_id"])
+    agent = await db.get_agent(call_data.agent_id, current_user["client_id"])
     if not agent:
         raise NotFoundError("agent", call_data.agent_id)
     if agent.get("status") != "active":
         raise ValidationError("Agent must be active", {"agent_status": agent.get("status")})
     
-    # Credit check for outbound calls
+    # Credit check for outbound calls (cached balance; the call is debited on completion)
     if call_data.direction == "outbound":
-        client = db.get_client(current_user["client_id"])
-        if not client or client.get("credits_balance", 0) < 1:
+        balance = await get_credit_balance(current_user["client_id"])
+        if balance < 1:
             raise PaymentRequiredError(
                 "Insufficient credits for outbound call",
-                {"required": 1, "available": client.get("credits_balance", 0) if client else 0},
+                {"required": 1, "available": balance},
             )
     
     # Create call record
@@ -82,7 +83,7 @@ async def create_call(
         "call_settings": call_data.call_settings.dict() if call_data.call_settings else {},
     }
     
-    db.insert("calls", call_record)
+    await db.insert("calls", call_record)
     
     # Call Ultravox API
     try:
@@ -96,7 +97,7 @@ async def create_call(
         ultravox_response = await ultravox_client.create_call(ultravox_data)
         
         # Update with Ultravox ID
-        db.update(
+        await db.update(
             "calls",
             {"id": call_id},
             {"ultravox_call_id": ultravox_response.get("id")},
@@ -104,7 +105,7 @@ async def create_call(
         call_record["ultravox_call_id"] = ultravox_response.get("id")
         
     except Exception as e:
-        db.update(
+        await db.update(
             "calls",
             {"id": call_id},
             {"status": "failed"},
@@ -150,10 +151,15 @@ async def list_calls(
     agent_id: Optional[str] = None,
     status: Optional[str] = None,
     direction: Optional[str] = None,
-    limit: int = 50,
-    offset: int = 0,
+    limit: int = Query(50, ge=1, le=200),
+    offset: int = Query(0, ge=0),
+    cursor: Optional[str] = None,
 ):
-    """List calls with filtering and pagination"""
+    """List calls with filtering and pagination
+    
+    Pass the returned `next_cursor` as `cursor` to fetch the next page
+    (keyset pagination); `offset` is kept for backwards compatibility.
+    """
     db = DatabaseService(current_user["token"])
     db.set_auth(current_user["token"])
     
@@ -166,16 +172,23 @@ async def list_calls(
     if direction:
         filters["direction"] = direction
     
-    # Get calls with pagination
-    # Note: Supabase PostgREST supports limit/offset via query params
-    all_calls = db.select("calls", filters, order_by="created_at")
+    # Fetch one extra row to know whether another page exists
+    calls = await db.select(
+        "calls",
+        filters,
+        order_by="created_at",
+        columns=list(CallResponse.model_fields),
+        limit=limit + 1,
+        offset=None if cursor else offset,
+        cursor=decode_cursor(cursor) if cursor else None,
+    )
+    has_more = len(calls) > limit
+    calls = calls[:limit]
     
-    # Apply pagination manually (since db.select doesn't support limit/offset directly)
-    total = len(all_calls)
-    paginated_calls = all_calls[offset:offset + limit]
+    total = await db.count("calls", filters, method="estimated")
     
     return {
-        "data": [CallResponse(**call) for call in paginated_calls],
+        "data": [CallResponse(**call) for call in calls],
         "meta": ResponseMeta(
             request_id=str(uuid.uuid4()),
             ts=datetime.utcnow(),
@@ -184,7 +197,8 @@ async def list_calls(
             "total": total,
             "limit": limit,
             "offset": offset,
-            "has_more": offset + limit < total,
+            "has_more": has_more,
+            "next_cursor": encode_cursor(calls[-1]) if has_more else None,
         },
     }
 
@@ -200,7 +214,7 @@ async def get_call(
     db = DatabaseService(current_user["token"])
     db.set_auth(current_user["token"])
     
-    call = db.get_call(call_id, current_user["client_id"])
+    call = await db.get_call(call_id, current_user["client_id"])
     if not call:
         raise NotFoundError("call", call_id)
     
@@ -223,9 +237,9 @@ async def get_call(
                 update_data["cost_usd"] = ultravox_call["cost_usd"]
             
             if update_data:
-                db.update("calls", {"id": call_id}, update_data)
+                await db.update("calls", {"id": call_id}, update_data)
                 # Refresh call data
-                call = db.get_call(call_id, current_user["client_id"])
+                call = await db.get_call(call_id, current_user["client_id"])
         except Exception as e:
             # Log error but don't fail the request
             import logging
@@ -251,7 +265,7 @@ async def get_call_transcript(
     db = DatabaseService(current_user["token"])
     db.set_auth(current_user["token"])
     
-    call = db.get_call(call_id, current_user["client_id"])
+    call = await db.get_call(call_id, current_user["client_id"])
     if not call:
         raise NotFoundError("call", call_id)
     
@@ -266,7 +280,7 @@ async def get_call_transcript(
         try:
             transcript_data = await ultravox_client.get_call_transcript(call["ultravox_call_id"])
             # Update cache
-            db.update("calls", {"id": call_id}, {"transcript": transcript_data})
+            await db.update("calls", {"id": call_id}, {"transcript": transcript_data})
         except Exception as e:
             raise NotFoundError("transcript")
     
@@ -293,7 +307,7 @@ async def get_call_recording(
     db = DatabaseService(current_user["token"])
     db.set_auth(current_user["token"])
     
-    call = db.get_call(call_id, current_user["client_id"])
+    call = await db.get_call(call_id, current_user["client_id"])
     if not call:
         raise NotFoundError("call", call_id)
     
@@ -308,7 +322,7 @@ async def get_call_recording(
         try:
             recording_url = await ultravox_client.get_call_recording(call["ultravox_call_id"])
             # TODO: Download to S3 and update database
-            db.update("calls", {"id": call_id}, {"recording_url": recording_url})
+            await db.update("calls", {"id": call_id}, {"recording_url": recording_url})
         except Exception as e:
             raise NotFoundError("recording")
     
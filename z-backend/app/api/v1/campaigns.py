@@ -1,22 +1,24 @@
 """
 Campaign Endpoints
 """
-from fastapi import APIRouter, Header, Depends
+from fastapi import APIRouter, Header, Depends, Query
 from starlette.requests import Request
 from typing import Optional
 from datetime import datetime
 import uuid
-import csv
-import io
 import json
 
 from app.core.auth import get_current_user
-from app.core.database import DatabaseService
-from app.core.s3 import generate_presigned_url, get_s3_client
-from app.core.exceptions import NotFoundError, ForbiddenError, ValidationError
+from app.core.database import DatabaseService, encode_cursor, decode_cursor
+from app.core.s3 import generate_presigned_url
+from app.core.exceptions import NotFoundError, ForbiddenError, ValidationError, ProviderError
 from app.core.idempotency import check_idempotency_key, store_idempotency_response
 from app.core.events import emit_campaign_created, emit_campaign_scheduled
-from app.services.ultravox import ultravox_client
+from app.core.jobs import create_job, fail_dead_jobs, find_live_job, start_job
+from app.services.contact_ingestion import insert_contacts, ingest_contacts_from_s3
+from app.services.campaign_deletion import delete_campaign as delete_campaign_job, restore_campaign_status
+from app.services.campaign_batches import submit_campaign_batches
+from app.services.campaign_dialer import campaign_dialer
 from app.models.schemas import (
     CampaignCreate,
     CampaignUpdate,
@@ -29,6 +31,11 @@ from app.core.config import settings
 router = APIRouter()
 
 
+def _reject_if_deleting(campaign: dict) -> None:
+    if campaign.get("status") == "deleting":
+        raise ValidationError("Campaign is being deleted")
+
+
 @router.post("")
 async def create_campaign(
     campaign_data: CampaignCreate,
@@ -61,7 +68,7 @@ async def create_campaign(
     db.set_auth(current_user["token"])
     
     # Validate agent
-    agent = db.get_agent(campaign_data.agent_id, current_user["client_id"])
+    agent = await db.get_agent(campaign_data.agent_id, current_user["client_id"])
     if not agent:
         raise NotFoundError("agent", campaign_data.agent_id)
     if agent.get("status") != "active":
@@ -82,7 +89,7 @@ async def create_campaign(
         "stats": {"pending": 0, "calling": 0, "completed": 0, "failed": 0},
     }
     
-    db.insert("campaigns", campaign_record)
+    await db.insert("campaigns", campaign_record)
     
     # Emit EventBridge event
     await emit_campaign_created(
@@ -127,10 +134,11 @@ async def presign_contacts_csv(
     db = DatabaseService(current_user["token"])
     db.set_auth(current_user["token"])
     
-    campaign = db.get_campaign(campaign_id, current_user["client_id"])
+    campaign = await db.get_campaign(campaign_id, current_user["client_id"])
     if not campaign:
         raise NotFoundError("campaign", campaign_id)
     
+    _reject_if_deleting(campaign)
     if campaign.get("status") != "draft":
         raise ValidationError("Campaign must be in draft status")
     
@@ -170,70 +178,49 @@ async def upload_campaign_contacts(
     db = DatabaseService(current_user["token"])
     db.set_auth(current_user["token"])
     
-    campaign = db.get_campaign(campaign_id, current_user["client_id"])
+    campaign = await db.get_campaign(campaign_id, current_user["client_id"])
     if not campaign:
         raise NotFoundError("campaign", campaign_id)
     
+    _reject_if_deleting(campaign)
     if campaign.get("status") != "draft":
         raise ValidationError("Campaign must be in draft status")
     
-    contacts = []
-    
     if contacts_data.s3_key:
-        # Parse CSV from S3
-        s3_client = get_s3_client()
-        try:
-            obj = s3_client.get_object(Bucket=settings.S3_BUCKET_UPLOADS, Key=contacts_data.s3_key)
-            csv_content = obj["Body"].read().decode("utf-8")
-            reader = csv.DictReader(io.StringIO(csv_content))
-            
-            for row in reader:
-                phone_number = row.get("phone_number", "").strip()
-                if not phone_number:
-                    continue
-                
-                contacts.append({
-                    "phone_number": phone_number,
-                    "first_name": row.get("first_name", "").strip() or None,
-                    "last_name": row.get("last_name", "").strip() or None,
-                    "email": row.get("email", "").strip() or None,
-                    "custom_fields": {k: v for k, v in row.items() if k not in ["phone_number", "first_name", "last_name", "email"]},
-                })
-        except Exception as e:
-            raise ValidationError(f"Failed to parse CSV: {str(e)}")
-    elif contacts_data.contacts:
-        contacts = [c.dict() for c in contacts_data.contacts]
-    
-    # Insert contacts
-    contacts_added = 0
-    for contact in contacts:
-        try:
-            db.insert(
-                "campaign_contacts",
-                {
-                    "campaign_id": campaign_id,
-                    "phone_number": contact["phone_number"],
-                    "first_name": contact.get("first_name"),
-                    "last_name": contact.get("last_name"),
-                    "email": contact.get("email"),
-                    "custom_fields": contact.get("custom_fields", {}),
-                    "status": "pending",
-                },
-            )
-            contacts_added += 1
-        except Exception:
-            # Skip duplicates
-            continue
+        # Large CSVs are streamed from S3 and inserted in batches by a background job
+        job = await create_job(current_user["client_id"], "campaign_contacts_import", campaign_id)
+        start_job(
+            job,
+            lambda report_progress: ingest_contacts_from_s3(
+                campaign_id,
+                settings.S3_BUCKET_UPLOADS,
+                contacts_data.s3_key,
+                report_progress,
+            ),
+        )
+        
+        return {
+            "data": {
+                "campaign_id": campaign_id,
+                "job_id": job["id"],
+                "status": job["status"],
+            },
+            "meta": ResponseMeta(
+                request_id=str(uuid.uuid4()),
+                ts=datetime.utcnow(),
+            ),
+        }
     
-    # Update campaign stats
-    db.update_campaign_stats(campaign_id)
+    contacts = [c.dict() for c in contacts_data.contacts or []]
+    counts = await insert_contacts(db, campaign_id, contacts)
     
+    # Campaign stats are maintained by the campaign_contacts trigger
     return {
         "data": {
             "campaign_id": campaign_id,
-            "contacts_added": contacts_added,
-            "contacts_failed": len(contacts) - contacts_added,
-            "stats": db.get_campaign(campaign_id, current_user["client_id"]).get("stats", {}),
+            "contacts_added": counts["contacts_added"],
+            "contacts_failed": len(contacts) - counts["contacts_added"],
+            "stats": (await db.get_campaign(campaign_id, current_user["client_id"])).get("stats", {}),
         },
         "meta": ResponseMeta(
             request_id=str(uuid.uuid4()),
@@ -255,90 +242,116 @@ async def schedule_campaign(
     db = DatabaseService(current_user["token"])
     db.set_auth(current_user["token"])
     
-    campaign = db.get_campaign(campaign_id, current_user["client_id"])
+    campaign = await db.get_campaign(campaign_id, current_user["client_id"])
     if not campaign:
         raise NotFoundError("campaign", campaign_id)
     
-    if campaign.get("status") != "draft":
-        raise ValidationError("Campaign must be in draft status")
-    
-    # Get contacts
-    contacts = db.get_campaign_contacts(campaign_id)
-    pending_contacts = [c for c in contacts if c.get("status") == "pending"]
-    
-    if not pending_contacts:
-        raise ValidationError("No pending contacts found")
+    # A failed campaign can be rescheduled; only contacts not yet in a batch are submitted
+    _reject_if_deleting(campaign)
+    status = campaign.get("status")
+    if status in ["scheduled", "active"] and settings.CAMPAIGN_DIALER_ENABLED:
+        # A dial job whose worker crashed leaves the campaign scheduled or
+        # active; take it over once the job has stopped heartbeating
+        if await find_live_job("campaign_dial", campaign_id) or not await fail_dead_jobs("campaign_dial", campaign_id):
+            raise ValidationError("Campaign must be in draft or failed status")
+        # Contacts the dead run claimed but never dialed
+        await db.update(
+            "campaign_contacts",
+            {"campaign_id": campaign_id, "status": "calling", "call_id": None},
+            {"status": "pending"},
+        )
+        schedulable = [status]
+    elif status in ["draft", "failed"]:
+        schedulable = ["draft", "failed"]
+    else:
+        raise ValidationError("Campaign must be in draft or failed status")
     
     # Get agent
-    agent = db.get_agent(campaign["agent_id"], current_user["client_id"])
-    
-    # Prepare batch data
-    batch_contacts = []
-    for contact in pending_contacts:
-        batch_contacts.append({
-            "phone_number": contact["phone_number"],
-            "context": {
-                "first_name": contact.get("first_name"),
-                "last_name": contact.get("last_name"),
-                "campaign_id": campaign_id,
-                "custom_fields": contact.get("custom_fields", {}),
-            },
-        })
+    agent = await db.get_agent(campaign["agent_id"], current_user["client_id"])
+    if not agent:
+        raise NotFoundError("agent", campaign["agent_id"])
     
-    # Call Ultravox API
-    try:
-        batch_data = {
-            "batches": [{
-                "contacts": batch_contacts,
-                "medium": {"telnyx": {}},
-                "schedule": {
-                    "at": campaign.get("scheduled_at"),
-                    "timezone": campaign.get("timezone", "UTC"),
-                },
-                "settings": {
-                    "max_concurrent": campaign.get("max_concurrent_calls", 10),
-                    "recording_enabled": True,
-                },
-            }],
-        }
+    if settings.CAMPAIGN_DIALER_ENABLED:
+        # Calls are placed and paced by this backend; the job waits for scheduled_at
+        pending = await db.count("campaign_contacts", {"campaign_id": campaign_id, "status": "pending"})
+        if not pending:
+            raise ValidationError("No pending contacts found")
         
-        ultravox_response = await ultravox_client.create_scheduled_batch(
-            agent.get("ultravox_agent_id"),
-            batch_data,
+        # Conditional so a concurrent delete (or schedule) wins cleanly
+        claimed = await db.update(
+            "campaigns",
+            {"id": campaign_id, "status": schedulable},
+            {"status": "scheduled"},
         )
+        if not claimed:
+            raise ValidationError("Campaign must be in draft or failed status")
+        campaign["status"] = "scheduled"
         
-        batch_ids = [b.get("batch_id") for b in ultravox_response.get("batches", [])]
-        
-        # Update campaign
-        db.update(
-            "campaigns",
-            {"id": campaign_id},
-            {
-                "status": "scheduled",
-                "ultravox_batch_ids": batch_ids,
-            },
+        job = await create_job(current_user["client_id"], "campaign_dial", campaign_id)
+        ultravox_agent_id = agent.get("ultravox_agent_id")
+        start_job(
+            job,
+            lambda report_progress: campaign_dialer.run_campaign(campaign, ultravox_agent_id, report_progress),
         )
         
-        # Emit EventBridge event
         await emit_campaign_scheduled(
             campaign_id=campaign_id,
             client_id=current_user["client_id"],
             scheduled_at=campaign.get("scheduled_at"),
-            contact_count=len(pending_contacts),
-            batch_ids=batch_ids,
+            contact_count=pending,
+            batch_ids=[],
         )
         
-        # TODO: Trigger Step Function
+        updated_campaign = await db.get_campaign(campaign_id, current_user["client_id"])
         
-    except Exception as e:
-        db.update(
+        return {
+            "data": CampaignResponse(**updated_campaign),
+            "meta": ResponseMeta(
+                request_id=str(uuid.uuid4()),
+                ts=datetime.utcnow(),
+            ),
+        }
+    
+    # Submit contacts to Ultravox in size-bounded batches
+    summary = await submit_campaign_batches(db, campaign, agent.get("ultravox_agent_id"))
+    
+    if summary["failed_batches"]:
+        await db.update(
             "campaigns",
-            {"id": campaign_id},
+            {"id": campaign_id, "status": ["draft", "failed"]},
             {"status": "failed"},
         )
-        raise
+        raise ProviderError(
+            provider="ultravox",
+            message=(
+                f"{summary['failed_batches']} contact batches ({summary['contacts_failed']} contacts) "
+                "failed to submit; schedule the campaign again to retry them"
+            ),
+        )
     
-    updated_campaign = db.get_campaign(campaign_id, current_user["client_id"])
+    batch_ids = (campaign.get("ultravox_batch_ids") or []) + summary["batch_ids"]
+    if not batch_ids:
+        raise ValidationError("No pending contacts found")
+    
+    # Update campaign (unless it started deleting while the batches were submitted)
+    await db.update(
+        "campaigns",
+        {"id": campaign_id, "status": ["draft", "failed"]},
+        {"status": "scheduled"},
+    )
+    
+    # Emit EventBridge event
+    await emit_campaign_scheduled(
+        campaign_id=campaign_id,
+        client_id=current_user["client_id"],
+        scheduled_at=campaign.get("scheduled_at"),
+        contact_count=summary["contacts_submitted"],
+        batch_ids=batch_ids,
+    )
+    
+    # TODO: Trigger Step Function
+    
+    updated_campaign = await db.get_campaign(campaign_id, current_user["client_id"])
     
     return {
         "data": CampaignResponse(**updated_campaign),
@@ -355,10 +368,15 @@ async def list_campaigns(
     x_client_id: Optional[str] = Header(None),
     agent_id: Optional[str] = None,
     status: Optional[str] = None,
-    limit: int = 50,
-    offset: int = 0,
+    limit: int = Query(50, ge=1, le=200),
+    offset: int = Query(0, ge=0),
+    cursor: Optional[str] = None,
 ):
-    """List campaigns with filtering and pagination"""
+    """List campaigns with filtering and pagination
+    
+    Pass the returned `next_cursor` as `cursor` to fetch the next page
+    (keyset pagination); `offset` is kept for backwards compatibility.
+    """
     db = DatabaseService(current_user["token"])
     db.set_auth(current_user["token"])
     
@@ -369,19 +387,20 @@ async def list_campaigns(
     if status:
         filters["status"] = status
     
-    # Get campaigns with pagination
-    all_campaigns = db.select("campaigns", filters, order_by="created_at")
-    
-    # Apply pagination manually
-    total = len(all_campaigns)
-    paginated_campaigns = all_campaigns[offset:offset + limit]
-    
-    # Update stats for each campaign
-    for campaign in paginated_campaigns:
-        db.update_campaign_stats(campaign["id"])
+    # Fetch one extra row to know whether another page exists
+    paginated_campaigns = await db.select(
+        "campaigns",
+        filters,
+        order_by="created_at",
+        limit=limit + 1,
+        offset=None if cursor else offset,
+        cursor=decode_cursor(cursor) if cursor else None,
+    )
+    has_more = len(paginated_campaigns) > limit
+    paginated_campaigns = paginated_campaigns[:limit]
+    next_cursor = encode_cursor(paginated_campaigns[-1]) if has_more else None
     
-    # Refresh campaigns after stats update
-    paginated_campaigns = [db.get_campaign(c["id"], current_user["client_id"]) for c in paginated_campaigns]
+    total = await db.count("campaigns", filters, method="estimated")
     
     return {
         "data": [CampaignResponse(**campaign) for campaign in paginated_campaigns],
@@ -393,7 +412,8 @@ async def list_campaigns(
             "total": total,
             "limit": limit,
             "offset": offset,
-            "has_more": offset + limit < total,
+            "has_more": has_more,
+            "next_cursor": next_cursor,
         },
     }
 
@@ -408,14 +428,10 @@ async def get_campaign(
     db = DatabaseService(current_user["token"])
     db.set_auth(current_user["token"])
     
-    campaign = db.get_campaign(campaign_id, current_user["client_id"])
+    campaign = await db.get_campaign(campaign_id, current_user["client_id"])
     if not campaign:
         raise NotFoundError("campaign", campaign_id)
     
-    # Update stats
-    db.update_campaign_stats(campaign_id)
-    campaign = db.get_campaign(campaign_id, current_user["client_id"])
-    
     return {
         "data": CampaignResponse(**campaign),
         "meta": ResponseMeta(
@@ -440,7 +456,7 @@ async def update_campaign(
     db.set_auth(current_user["token"])
     
     # Check if campaign exists
-    campaign = db.get_campaign(campaign_id, current_user["client_id"])
+    campaign = await db.get_campaign(campaign_id, current_user["client_id"])
     if not campaign:
         raise NotFoundError("campaign", campaign_id)
     
@@ -462,7 +478,7 @@ async def update_campaign(
     
     # Validate agent if agent_id is being updated
     if "agent_id" in update_data:
-        agent = db.get_agent(update_data["agent_id"], current_user["client_id"])
+        agent = await db.get_agent(update_data["agent_id"], current_user["client_id"])
         if not agent:
             raise NotFoundError("agent", update_data["agent_id"])
         if agent.get("status") != "active":
@@ -479,10 +495,10 @@ async def update_campaign(
     
     # Update database
     update_data["updated_at"] = datetime.utcnow().isoformat()
-    db.update("campaigns", {"id": campaign_id}, update_data)
+    await db.update("campaigns", {"id": campaign_id}, update_data)
     
     # Get updated campaign
-    updated_campaign = db.get_campaign(campaign_id, current_user["client_id"])
+    updated_campaign = await db.get_campaign(campaign_id, current_user["client_id"])
     
     return {
         "data": CampaignResponse(**updated_campaign),
@@ -507,27 +523,65 @@ async def delete_campaign(
     db.set_auth(current_user["token"])
     
     # Check if campaign exists
-    campaign = db.get_campaign(campaign_id, current_user["client_id"])
+    campaign = await db.get_campaign(campaign_id, current_user["client_id"])
     if not campaign:
         raise NotFoundError("campaign", campaign_id)
     
-    # Only allow deletion for draft or failed campaigns
-    if campaign.get("status") not in ["draft", "failed"]:
-        raise ValidationError("Campaign can only be deleted when in draft or failed status")
+    if campaign.get("status") == "deleting":
+        # A delete that was interrupted by a crash leaves the campaign in
+        # 'deleting' with no live job; take it over instead of rejecting it
+        if await find_live_job("campaign_delete", campaign_id):
+            raise ValidationError("Campaign is being deleted")
+        # The status before the interrupted delete is unknown
+        previous_status = "failed"
+    else:
+        # Only allow deletion for draft or failed campaigns
+        if campaign.get("status") not in ["draft", "failed"]:
+            raise ValidationError("Campaign can only be deleted when in draft or failed status")
+        previous_status = campaign["status"]
+        
+        # Claim the campaign for deletion; the conditional update makes concurrent
+        # schedule, upload and delete requests see 'deleting' and back off
+        claimed = await db.update(
+            "campaigns",
+            {"id": campaign_id, "status": ["draft", "failed"]},
+            {"status": "deleting"},
+        )
+        if not claimed:
+            raise ValidationError("Campaign can only be deleted when in draft or failed status")
     
-    # Delete campaign contacts first (if cascade delete is not enabled)
-    try:
-        contacts = db.get_campaign_contacts(campaign_id)
-        for contact in contacts:
-            db.delete("campaign_contacts", {"id": contact["id"]})
-    except Exception:
-        pass  # Continue even if contacts deletion fails
+    # Small campaigns are deleted inline (contacts cascade); large ones by a background job
+    contact_count = sum((campaign.get("stats") or {}).values())
+    if contact_count <= settings.CAMPAIGN_DELETE_INLINE_MAX_CONTACTS:
+        try:
+            await db.bulk_delete("campaigns", {"id": campaign_id})
+        except BaseException:
+            # Put it back so the delete can be retried
+            await restore_campaign_status(campaign_id, previous_status)
+            raise
+        
+        return {
+            "data": {"id": campaign_id, "deleted": True},
+            "meta": ResponseMeta(
+                request_id=str(uuid.uuid4()),
+                ts=datetime.utcnow(),
+            ),
+        }
     
-    # Delete campaign
-    db.delete("campaigns", {"id": campaign_id})
+    try:
+        job = await create_job(current_user["client_id"], "campaign_delete", campaign_id)
+        start_job(job, lambda report_progress: delete_campaign_job(campaign_id, report_progress, previous_status))
+    except BaseException:
+        await restore_campaign_status(campaign_id, previous_status)
+        raise
     
     return {
-        "data": {"id": campaign_id, "deleted": True},
+        "data": {
+            "id": campaign_id,
+            "deleted": False,
+            "job_id": job["id"],
+            "status": job["status"],
+        },
         "meta": ResponseMeta(
             request_id=str(uuid.uuid4()),
             ts=datetime.utcnow(),
@@ -0,0 +1,37 @@
+"""
+Background Job Endpoints
+"""
+from fastapi import APIRouter, Header, Depends
+from typing import Optional
+from datetime import datetime
+import uuid
+
+from app.core.auth import get_current_user
+from app.core.database import DatabaseService
+from app.core.exceptions import NotFoundError
+from app.models.schemas import JobResponse, ResponseMeta
+
+router = APIRouter()
+
+
+@router.get("/{job_id}")
+async def get_job(
+    job_id: str,
+    current_user: dict = Depends(get_current_user),
+    x_client_id: Optional[str] = Header(None),
+):
+    """Get background job status and progress"""
+    db = DatabaseService(current_user["token"])
+    db.set_auth(current_user["token"])
+    
+    job = await db.select_one("background_jobs", {"id": job_id, "client_id": current_user["client_id"]})
+    if not job:
+        raise NotFoundError("job", job_id)
+    
+    return {
+        "data": JobResponse(**job),
+        "meta": ResponseMeta(
+            request_id=str(uuid.uuid4()),
+            ts=datetime.utcnow(),
+        ),
+    }
@@ -5,12 +5,13 @@ from fastapi import APIRouter, Header, Depends
 from starlette.requests import Request
 from typing import Optional
 from datetime import datetime
+import asyncio
 import uuid
 import json
 
 from app.core.auth import get_current_user
 from app.core.database import DatabaseService
-from app.core.s3 import generate_presigned_url, check_object_exists
+from app.core.s3 import generate_presigned_url, check_objects_exist
 from app.core.exceptions import NotFoundError, ForbiddenError, ValidationError
 from app.core.idempotency import check_idempotency_key, store_idempotency_response
 from app.core.events import emit_knowledge_base_created, emit_knowledge_base_ingestion_started
@@ -70,7 +71,7 @@ async def create_knowledge_base(
         "status": "creating",
     }
     
-    db.insert("knowledge_documents", kb_record)
+    await db.insert("knowledge_documents", kb_record)
     
     # Call Ultravox API
     try:
@@ -81,7 +82,7 @@ async def create_knowledge_base(
         ultravox_response = await ultravox_client.create_corpus(ultravox_data)
         
         # Update with Ultravox ID
-        db.update(
+        await db.update(
             "knowledge_documents",
             {"id": kb_id},
             {
@@ -93,7 +94,7 @@ async def create_knowledge_base(
         kb_record["status"] = "ready"
         
     except Exception as e:
-        db.update(
+        await db.update(
             "knowledge_documents",
             {"id": kb_id},
             {"status": "failed"},
@@ -143,7 +144,7 @@ async def presign_kb_files(
     db = DatabaseService(current_user["token"])
     db.set_auth(current_user["token"])
     
-    kb = db.get_knowledge_base(kb_id, current_user["client_id"])
+    kb = await db.get_knowledge_base(kb_id, current_user["client_id"])
     if not kb:
         raise NotFoundError("knowledge_base", kb_id)
     
@@ -161,7 +162,7 @@ async def presign_kb_files(
         )
         
         # Create document record
-        db.insert(
+        await db.insert(
             "knowledge_base_documents",
             {
                 "id": doc_id,
@@ -203,27 +204,44 @@ async def ingest_kb_files(
     db = DatabaseService(current_user["token"])
     db.set_auth(current_user["token"])
     
-    kb = db.get_knowledge_base(kb_id, current_user["client_id"])
+    kb = await db.get_knowledge_base(kb_id, current_user["client_id"])
     if not kb:
         raise NotFoundError("knowledge_base", kb_id)
     
     if kb.get("status") != "ready":
         raise ValidationError("Knowledge base must be ready", {"kb_status": kb.get("status")})
     
-    results = []
-    for doc_id in request_data.document_ids:
-        doc = db.select_one("knowledge_base_documents", {"id": doc_id, "knowledge_base_id": kb_id})
-        if not doc:
-            continue
-        
-        # Check S3 file exists
-        if not check_object_exists(settings.S3_BUCKET_UPLOADS, doc["s3_key"]):
-            db.update(
-                "knowledge_base_documents",
-                {"id": doc_id},
-                {"status": "failed", "error_message": "File not found in S3"},
-            )
-            continue
+    # One query for all documents, returned in request order
+    rows = await db.select(
+        "knowledge_base_documents",
+        {"id": list(request_data.document_ids), "knowledge_base_id": kb_id},
+    )
+    docs_by_id = {doc["id"]: doc for doc in rows}
+    docs = [docs_by_id[doc_id] for doc_id in dict.fromkeys(request_data.document_ids) if doc_id in docs_by_id]
+    
+    # HEAD every file concurrently
+    exists = await check_objects_exist(settings.S3_BUCKET_UPLOADS, [doc["s3_key"] for doc in docs])
+    
+    missing_ids = [doc["id"] for doc in docs if not exists[doc["s3_key"]]]
+    if missing_ids:
+        await db.update(
+            "knowledge_base_documents",
+            {"id": missing_ids},
+            {"status": "failed", "error_message": "File not found in S3"},
+        )
+    
+    docs = [doc for doc in docs if exists[doc["s3_key"]]]
+    if docs:
+        await db.update(
+            "knowledge_base_documents",
+            {"id": [doc["id"] for doc in docs]},
+            {"status": "processing"},
+        )
+    
+    semaphore = asyncio.Semaphore(settings.KB_INGEST_PARALLELISM)
+    
+    async def ingest(doc: dict) -> dict:
+        doc_id = doc["id"]
         
         # Generate presigned URL for Ultravox
         file_url = generate_presigned_url(
@@ -233,13 +251,6 @@ async def ingest_kb_files(
             expires_in=86400,
         )
         
-        # Update status
-        db.update(
-            "knowledge_base_documents",
-            {"id": doc_id},
-            {"status": "processing"},
-        )
-        
         # Call Ultravox API
         try:
             ultravox_data = {
@@ -250,9 +261,10 @@ async def ingest_kb_files(
                     "fileType": doc["file_type"],
                 },
             }
-            ultravox_response = await ultravox_client.add_corpus_source(kb["ultravox_corpus_id"], ultravox_data)
+            async with semaphore:
+                ultravox_response = await ultravox_client.add_corpus_source(kb["ultravox_corpus_id"], ultravox_data)
             
-            db.update(
+            await db.update(
                 "knowledge_base_documents",
                 {"id": doc_id},
                 {
@@ -261,22 +273,24 @@ async def ingest_kb_files(
                 },
             )
             
-            results.append({
+            return {
                 "doc_id": doc_id,
                 "status": "processing",
                 "ultravox_source_id": ultravox_response.get("id"),
-            })
+            }
         except Exception as e:
-            db.update(
+            await db.update(
                 "knowledge_base_documents",
                 {"id": doc_id},
                 {"status": "failed", "error_message": str(e)},
             )
-            results.append({
+            return {
                 "doc_id": doc_id,
                 "status": "failed",
                 "error_message": str(e),
-            })
+            }
+    
+    results = await asyncio.gather(*(ingest(doc) for doc in docs))
     
     return {
         "data": {"documents": results},
@@ -297,12 +311,12 @@ async def get_knowledge_base(
     db = DatabaseService(current_user["token"])
     db.set_auth(current_user["token"])
     
-    kb = db.get_knowledge_base(kb_id, current_user["client_id"])
+    kb = await db.get_knowledge_base(kb_id, current_user["client_id"])
     if not kb:
         raise NotFoundError("knowledge_base", kb_id)
     
     # Get document counts
-    documents = db.select("knowledge_base_documents", {"knowledge_base_id": kb_id})
+    documents = await db.select("knowledge_base_documents", {"knowledge_base_id": kb_id})
     document_counts = {
         "total": len(documents),
         "indexed": sum(1 for d in documents if d.get("status") == "indexed"),
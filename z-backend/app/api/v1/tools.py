@@ -70,7 +70,7 @@ async def create_tool(
         "status": "creating",
     }
     
-    db.insert("tools", tool_record)
+    await db.insert("tools", tool_record)
     
     # Call Ultravox API
     try:
@@ -86,7 +86,7 @@ async def create_tool(
         ultravox_response = await ultravox_client.create_tool(ultravox_data)
         
         # Update with Ultravox ID
-        db.update(
+        await db.update(
             "tools",
             {"id": tool_id},
             {
@@ -98,7 +98,7 @@ async def create_tool(
         tool_record["status"] = "active"
         
     except Exception as e:
-        db.update(
+        await db.update(
             "tools",
             {"id": tool_id},
             {"status": "failed"},
@@ -136,7 +136,7 @@ async def list_tools(
     db = DatabaseService(current_user["token"])
     db.set_auth(current_user["token"])
     
-    tools = db.select("tools", {"client_id": current_user["client_id"]}, order_by="created_at")
+    tools = await db.select("tools", {"client_id": current_user["client_id"]}, order_by="created_at")
     
     return {
         "data": [ToolResponse(**tool) for tool in tools],
@@ -157,7 +157,7 @@ async def get_tool(
     db = DatabaseService(current_user["token"])
     db.set_auth(current_user["token"])
     
-    tool = db.select_one("tools", {"id": tool_id, "client_id": current_user["client_id"]})
+    tool = await db.select_one("tools", {"id": tool_id, "client_id": current_user["client_id"]})
     if not tool:
         raise NotFoundError("tool", tool_id)
     
@@ -185,7 +185,7 @@ async def update_tool(
     db.set_auth(current_user["token"])
     
     # Check if tool exists
-    tool = db.select_one("tools", {"id": tool_id, "client_id": current_user["client_id"]})
+    tool = await db.select_one("tools", {"id": tool_id, "client_id": current_user["client_id"]})
     if not tool:
         raise NotFoundError("tool", tool_id)
     
@@ -203,7 +203,7 @@ async def update_tool(
     
     # Update local database
     update_data["updated_at"] = datetime.utcnow().isoformat()
-    db.update("tools", {"id": tool_id}, update_data)
+    await db.update("tools", {"id": tool_id}, update_data)
     
     # Update Ultravox if tool has ultravox_tool_id and relevant fields changed
     if tool.get("ultravox_tool_id") and any(key in update_data for key in ["name", "description", "endpoint", "method", "authentication", "parameters", "response_schema"]):
@@ -225,7 +225,7 @@ async def update_tool(
             logger.error(f"Failed to update tool in Ultravox: {e}")
     
     # Get updated tool
-    updated_tool = db.select_one("tools", {"id": tool_id, "client_id": current_user["client_id"]})
+    updated_tool = await db.select_one("tools", {"id": tool_id, "client_id": current_user["client_id"]})
     
     return {
         "data": ToolResponse(**updated_tool),
@@ -250,7 +250,7 @@ async def delete_tool(
     db.set_auth(current_user["token"])
     
     # Check if tool exists
-    tool = db.select_one("tools", {"id": tool_id, "client_id": current_user["client_id"]})
+    tool = await db.select_one("tools", {"id": tool_id, "client_id": current_user["client_id"]})
     if not tool:
         raise NotFoundError("tool", tool_id)
     
@@ -265,7 +265,7 @@ async def delete_tool(
             logger.error(f"Failed to delete tool from Ultravox: {e}")
     
     # Delete from database
-    db.delete("tools", {"id": tool_id})
+    await db.delete("tools", {"id": tool_id})
     
     return {
         "data": {"id": tool_id, "deleted": True},
@@ -10,11 +10,12 @@ import json
 
 from app.core.auth import get_current_user
 from app.core.database import DatabaseService
-from app.core.s3 import generate_presigned_url, check_object_exists
+from app.core.s3 import generate_presigned_url, check_objects_exist
 from app.core.exceptions import NotFoundError, ValidationError, PaymentRequiredError, ForbiddenError
 from app.core.idempotency import check_idempotency_key, store_idempotency_response
 from app.core.events import emit_voice_training_started, emit_voice_created
 from app.services.ultravox import ultravox_client
+from app.services.credit_ledger import get_credit_balance, debit_credits, add_credits
 from app.models.schemas import (
     VoiceCreate,
     VoiceResponse,
@@ -26,6 +27,8 @@ from app.core.config import settings
 
 router = APIRouter()
 
+VOICE_TRAINING_CREDITS = 50
+
 
 @router.post("/files/presign")
 async def presign_voice_files(
@@ -97,13 +100,13 @@ async def create_voice(
     db = DatabaseService(current_user["token"])
     db.set_auth(current_user["token"])
     
-    # Credit check for native training
+    # Credit check for native training (cached balance; the debit below is authoritative)
     if voice_data.strategy == "native":
-        client = db.get_client(current_user["client_id"])
-        if not client or client.get("credits_balance", 0) < 50:
+        balance = await get_credit_balance(current_user["client_id"])
+        if balance < VOICE_TRAINING_CREDITS:
             raise PaymentRequiredError(
-                "Insufficient credits for voice training. Required: 50",
-                {"required": 50, "available": client.get("credits_balance", 0) if client else 0},
+                f"Insufficient credits for voice training. Required: {VOICE_TRAINING_CREDITS}",
+                {"required": VOICE_TRAINING_CREDITS, "available": balance},
             )
     
     # Create voice record
@@ -122,16 +125,21 @@ async def create_voice(
         } if voice_data.strategy == "native" else {},
     }
     
-    db.insert("voices", voice_record)
+    await db.insert("voices", voice_record)
     
     # Generate presigned URLs for Ultravox
     training_samples = []
     if voice_data.strategy == "native" and voice_data.source.samples:
+        # Check all sample files exist (concurrent HEADs)
+        exists = await check_objects_exist(
+            settings.S3_BUCKET_UPLOADS,
+            [sample.s3_key for sample in voice_data.source.samples],
+        )
         for sample in voice_data.source.samples:
-            # Check S3 file exists
-            if not check_object_exists(settings.S3_BUCKET_UPLOADS, sample.s3_key):
+            if not exists[sample.s3_key]:
                 raise NotFoundError("voice sample", sample.s3_key)
-            
+        
+        for sample in voice_data.source.samples:
             # Generate read-only presigned URL
             audio_url = generate_presigned_url(
                 bucket=settings.S3_BUCKET_UPLOADS,
@@ -146,6 +154,20 @@ async def create_voice(
                 "duration_seconds": sample.duration_seconds,
             })
     
+    # Debit training credits before calling Ultravox; refunded if the call fails
+    if voice_data.strategy == "native":
+        try:
+            await debit_credits(
+                current_user["client_id"],
+                VOICE_TRAINING_CREDITS,
+                reference_type="voice_training",
+                reference_id=voice_id,
+                description=f"Voice training: {voice_data.name}",
+            )
+        except PaymentRequiredError:
+            await db.update("voices", {"id": voice_id}, {"status": "failed"})
+            raise
+    
     # Call Ultravox API
     try:
         if voice_data.strategy == "native":
@@ -167,7 +189,7 @@ async def create_voice(
             ultravox_response = await ultravox_client.create_voice(ultravox_data)
         
         # Update with Ultravox ID
-        db.update(
+        await db.update(
             "voices",
             {"id": voice_id},
             {"ultravox_voice_id": ultravox_response.get("id")},
@@ -176,32 +198,22 @@ async def create_voice(
         
     except Exception as e:
         # Mark as failed
-        db.update(
+        await db.update(
             "voices",
             {"id": voice_id},
             {"status": "failed", "training_info": {"error_message": str(e)}},
         )
+        if voice_data.strategy == "native":
+            await add_credits(
+                current_user["client_id"],
+                VOICE_TRAINING_CREDITS,
+                tx_type="refunded",
+                reference_type="voice_training",
+                reference_id=voice_id,
+                description=f"Voice training failed: {voice_data.name}",
+            )
         raise
     
-    # Debit credits if native
-    if voice_data.strategy == "native":
-        db.insert(
-            "credit_transactions",
-            {
-                "client_id": current_user["client_id"],
-                "type": "spent",
-                "amount": 50,
-                "reference_type": "voice_training",
-                "reference_id": voice_id,
-                "description": f"Voice training: {voice_data.name}",
-            },
-        )
-        db.update(
-            "clients",
-            {"id": current_user["client_id"]},
-            {"credits_balance": client["credits_balance"] - 50},
-        )
-    
     # TODO: Trigger Step Function for native training
     
     response_data = {
@@ -235,7 +247,7 @@ async def list_voices(
     db = DatabaseService(current_user["token"])
     db.set_auth(current_user["token"])
     
-    voices = db.select("voices", {"client_id": current_user["client_id"]}, "created_at")
+    voices = await db.select("voices", {"client_id": current_user["client_id"]}, "created_at")
     
     # TODO: Optionally poll Ultravox for training status
     
@@ -258,7 +270,7 @@ async def get_voice(
     db = DatabaseService(current_user["token"])
     db.set_auth(current_user["token"])
     
-    voice = db.get_voice(voice_id, current_user["client_id"])
+    voice = await db.get_voice(voice_id, current_user["client_id"])
     if not voice:
         raise NotFoundError("voice", voice_id)
     
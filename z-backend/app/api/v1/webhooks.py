@@ -12,7 +12,10 @@ import logging
 
 from app.core.auth import get_current_user
 from app.core.database import DatabaseService
-from app.core.webhooks import verify_ultravox_signature, verify_timestamp, verify_stripe_signature, deliver_webhook
+from app.core.webhooks import verify_ultravox_signature, verify_timestamp, verify_stripe_signature
+from app.services.webhook_delivery import enqueue_webhook_deliveries
+from app.services.campaign_dialer import campaign_dialer
+from app.services.credit_ledger import debit_credits, add_credits
 from app.core.events import (
     emit_voice_training_completed,
     emit_voice_training_failed,
@@ -78,11 +81,11 @@ async def ultravox_webhook(
     if event_type == "call.started":
         # Update call status
         ultravox_call_id = event_data.get("call_id")
-        call = db.select_one("calls", {"ultravox_call_id": ultravox_call_id})
+        call = await db.select_one("calls", {"ultravox_call_id": ultravox_call_id})
         
         if call:
             client_id_for_webhook = call["client_id"]
-            db.update(
+            await db.update(
                 "calls",
                 {"id": call["id"]},
                 {
@@ -97,37 +100,26 @@ async def ultravox_webhook(
     elif event_type == "call.completed":
         # Update call status
         ultravox_call_id = event_data.get("call_id")
-        call = db.select_one("calls", {"ultravox_call_id": ultravox_call_id})
+        call = await db.select_one("calls", {"ultravox_call_id": ultravox_call_id})
         
         if call:
             client_id_for_webhook = call["client_id"]
             duration = event_data.get("data", {}).get("duration_seconds", 0)
             cost = event_data.get("data", {}).get("cost_usd", 0)
             
-            # Debit credits
+            # Debit credits (the call already happened, so the balance may not cover it)
             credits = max(1, (duration + 59) // 60)  # Round up to minutes
-            db.insert(
-                "credit_transactions",
-                {
-                    "client_id": call["client_id"],
-                    "type": "spent",
-                    "amount": credits,
-                    "reference_type": "call",
-                    "reference_id": call["id"],
-                    "description": f"Call duration: {credits} minutes",
-                },
+            await debit_credits(
+                call["client_id"],
+                credits,
+                reference_type="call",
+                reference_id=call["id"],
+                description=f"Call duration: {credits} minutes",
+                require_balance=False,
             )
             
-            client = db.get_client(call["client_id"])
-            if client:
-                db.update(
-                    "clients",
-                    {"id": call["client_id"]},
-                    {"credits_balance": client["credits_balance"] - credits},
-                )
-            
             # Update call
-            db.update(
+            await db.update(
                 "calls",
                 {"id": call["id"]},
                 {
@@ -151,22 +143,24 @@ async def ultravox_webhook(
             if call.get("context", {}).get("campaign_id"):
                 campaign_id = call["context"]["campaign_id"]
                 phone_number = call["phone_number"]
-                db.update(
+                await db.update(
                     "campaign_contacts",
                     {"campaign_id": campaign_id, "phone_number": phone_number},
                     {"status": "completed", "call_id": call["id"]},
                 )
-                db.update_campaign_stats(campaign_id)
+                
+                # Free the dialer slot so the campaign can place its next call
+                campaign_dialer.on_call_finished(call["id"])
     
     elif event_type == "call.failed":
         # Update call status
         ultravox_call_id = event_data.get("call_id")
-        call = db.select_one("calls", {"ultravox_call_id": ultravox_call_id})
+        call = await db.select_one("calls", {"ultravox_call_id": ultravox_call_id})
         
         if call:
             client_id_for_webhook = call["client_id"]
             error_message = event_data.get("data", {}).get("error_message", "Call failed")
-            db.update(
+            await db.update(
                 "calls",
                 {"id": call["id"]},
                 {
@@ -183,21 +177,21 @@ async def ultravox_webhook(
             if call.get("context", {}).get("campaign_id"):
                 campaign_id = call["context"]["campaign_id"]
                 phone_number = call["phone_number"]
-                db.update(
+                await db.update(
                     "campaign_contacts",
                     {"campaign_id": campaign_id, "phone_number": phone_number},
                     {"status": "failed"},
                 )
-                db.update_campaign_stats(campaign_id)
+                campaign_dialer.on_call_finished(call["id"])
     
     elif event_type == "voice.training.completed":
         # Update voice status
         ultravox_voice_id = event_data.get("voice_id")
-        voice = db.select_one("voices", {"ultravox_voice_id": ultravox_voice_id})
+        voice = await db.select_one("voices", {"ultravox_voice_id": ultravox_voice_id})
         
         if voice:
             client_id_for_webhook = voice["client_id"]
-            db.update(
+            await db.update(
                 "voices",
                 {"id": voice["id"]},
                 {
@@ -219,12 +213,12 @@ async def ultravox_webhook(
     elif event_type == "voice.training.failed":
         # Update voice status
         ultravox_voice_id = event_data.get("voice_id")
-        voice = db.select_one("voices", {"ultravox_voice_id": ultravox_voice_id})
+        voice = await db.select_one("voices", {"ultravox_voice_id": ultravox_voice_id})
         
         if voice:
             client_id_for_webhook = voice["client_id"]
             error_message = event_data.get("error_message", "Voice training failed")
-            db.update(
+            await db.update(
                 "voices",
                 {"id": voice["id"]},
                 {
@@ -243,9 +237,9 @@ async def ultravox_webhook(
                 error_message=error_message,
             )
     
-    # Trigger egress webhooks
+    # Queue egress webhooks (sent by the delivery workers)
     if client_id_for_webhook:
-        await trigger_egress_webhooks(
+        await enqueue_webhook_deliveries(
             client_id=client_id_for_webhook,
             event_type=event_type,
             event_data=event_data,
@@ -254,95 +248,6 @@ async def ultravox_webhook(
     return {"status": "ok"}
 
 
-async def trigger_egress_webhooks(
-    client_id: str,
-    event_type: str,
-    event_data: dict,
-) -> None:
-    """Trigger egress webhooks for a client"""
-    from app.core.database import DatabaseAdminService
-    
-    db = DatabaseAdminService()
-    
-    # Get enabled webhook endpoints for this client and event type
-    endpoints = db.select(
-        "webhook_endpoints",
-        {
-            "client_id": client_id,
-            "enabled": True,
-        },
-    )
-    
-    # Filter endpoints that subscribe to this event type
-    matching_endpoints = [
-        ep for ep in endpoints
-        if event_type in (ep.get("event_types") or [])
-    ]
-    
-    # Create webhook delivery tasks
-    for endpoint in matching_endpoints:
-        delivery_id = str(uuid.uuid4())
-        
-        # Create delivery record
-        db.insert(
-            "webhook_deliveries",
-            {
-                "id": delivery_id,
-                "webhook_endpoint_id": endpoint["id"],
-                "event_type": event_type,
-                "payload": event_data,
-                "status": "pending",
-                "attempt": 1,
-            },
-        )
-        
-        # Queue webhook delivery (SQS or direct)
-        # For now, we'll deliver directly. In production, use SQS
-        try:
-            success, status_code, error = await deliver_webhook(
-                url=endpoint["url"],
-                payload={
-                    "event": event_type,
-                    "data": event_data,
-                    "timestamp": datetime.utcnow().isoformat(),
-                },
-                secret=endpoint["secret"],
-            )
-            
-            # Update delivery status
-            if success:
-                db.update(
-                    "webhook_deliveries",
-                    {"id": delivery_id},
-                    {
-                        "status": "delivered",
-                        "response_code": status_code,
-                        "delivered_at": datetime.utcnow().isoformat(),
-                    },
-                )
-            else:
-                db.update(
-                    "webhook_deliveries",
-                    {"id": delivery_id},
-                    {
-                        "status": "failed",
-                        "response_code": status_code,
-                        "error_message": error,
-                    },
-                )
-                
-        except Exception as e:
-            logger.error(f"Error delivering webhook: {e}")
-            db.update(
-                "webhook_deliveries",
-                {"id": delivery_id},
-                {
-                    "status": "failed",
-                    "error_message": str(e),
-                },
-            )
-
-
 @router.post("/stripe")
 async def stripe_webhook(
     request: Request,
@@ -383,29 +288,21 @@ async def stripe_webhook(
         client_id = metadata.get("client_id")
         
         if client_id:
-            # Verify client exists
-            client = db.select_one("clients", {"id": client_id})
-            if client:
-                # Add credit transaction
-                db.insert(
-                    "credit_transactions",
-                    {
-                        "client_id": client_id,
-                        "type": "purchased",
-                        "amount": credits,
-                        "reference_type": "stripe_payment",
-                        "reference_id": payment_intent.get("id"),
-                        "description": f"Stripe payment: {payment_intent.get('id')}",
-                    },
+            # Add credits and record the transaction in one statement
+            credited = True
+            try:
+                await add_credits(
+                    client_id,
+                    credits,
+                    tx_type="purchased",
+                    reference_type="stripe_payment",
+                    reference_id=payment_intent.get("id"),
+                    description=f"Stripe payment: {payment_intent.get('id')}",
                 )
-                
-                # Update client credits balance
-                db.update(
-                    "clients",
-                    {"id": client_id},
-                    {"credits_balance": client.get("credits_balance", 0) + credits},
-                )
-                
+            except NotFoundError:
+                credited = False
+            
+            if credited:
                 # Emit EventBridge event
                 await emit_credits_purchased(
                     client_id=client_id,
@@ -426,7 +323,7 @@ async def stripe_webhook(
         status = subscription.get("status")
         
         # Update client subscription status
-        client = db.select_one("clients", {"stripe_customer_id": customer_id})
+        client = await db.select_one("clients", {"stripe_customer_id": customer_id})
         if client:
             # Map Stripe status to our status
             status_map = {
@@ -438,7 +335,7 @@ async def stripe_webhook(
             }
             mapped_status = status_map.get(status, "active")
             
-            db.update(
+            await db.update(
                 "clients",
                 {"id": client["id"]},
                 {"subscription_status": mapped_status},
@@ -484,7 +381,7 @@ async def create_webhook_endpoint(
     # Generate secret if not provided
     secret = webhook_data.secret or secrets.token_hex(16)
     
-    webhook_record = db.insert(
+    webhook_record = await db.insert(
         "webhook_endpoints",
         {
             "client_id": current_user["client_id"],
@@ -522,7 +419,7 @@ async def list_webhook_endpoints(
     db = DatabaseService(current_user["token"])
     db.set_auth(current_user["token"])
     
-    webhooks = db.select("webhook_endpoints", {"client_id": current_user["client_id"]})
+    webhooks = await db.select("webhook_endpoints", {"client_id": current_user["client_id"]})
     
     # Don't return secrets
     for wh in webhooks:
@@ -547,7 +444,7 @@ async def get_webhook_endpoint(
     db = DatabaseService(current_user["token"])
     db.set_auth(current_user["token"])
     
-    webhook = db.select_one("webhook_endpoints", {"id": webhook_id, "client_id": current_user["client_id"]})
+    webhook = await db.select_one("webhook_endpoints", {"id": webhook_id, "client_id": current_user["client_id"]})
     if not webhook:
         raise NotFoundError("webhook_endpoint", webhook_id)
     
@@ -578,7 +475,7 @@ async def update_webhook_endpoint(
     db.set_auth(current_user["token"])
     
     # Check if webhook exists
-    webhook = db.select_one("webhook_endpoints", {"id": webhook_id, "client_id": current_user["client_id"]})
+    webhook = await db.select_one("webhook_endpoints", {"id": webhook_id, "client_id": current_user["client_id"]})
     if not webhook:
         raise NotFoundError("webhook_endpoint", webhook_id)
     
@@ -597,10 +494,10 @@ async def update_webhook_endpoint(
     
     # Update database
     update_data["updated_at"] = datetime.utcnow().isoformat()
-    db.update("webhook_endpoints", {"id": webhook_id}, update_data)
+    await db.update("webhook_endpoints", {"id": webhook_id}, update_data)
     
     # Get updated webhook
-    updated_webhook = db.select_one("webhook_endpoints", {"id": webhook_id, "client_id": current_user["client_id"]})
+    updated_webhook = await db.select_one("webhook_endpoints", {"id": webhook_id, "client_id": current_user["client_id"]})
     updated_webhook.pop("secret", None)
     
     return {
@@ -625,11 +522,11 @@ async def delete_webhook_endpoint(
     db = DatabaseService(current_user["token"])
     db.set_auth(current_user["token"])
     
-    webhook = db.select_one("webhook_endpoints", {"id": webhook_id})
+    webhook = await db.select_one("webhook_endpoints", {"id": webhook_id})
     if not webhook:
         raise NotFoundError("webhook_endpoint", webhook_id)
     
-    db.delete("webhook_endpoints", {"id": webhook_id})
+    await db.delete("webhook_endpoints", {"id": webhook_id})
     
     return {"status": "deleted"}
 
@@ -1,13 +1,44 @@
 """
 Audit Logging Service
 """
+import asyncio
+import json
 import logging
-from typing import Dict, Any, Optional
+import threading
+from collections import deque
+from typing import Dict, Any, Optional, List, Deque, Tuple
 from datetime import datetime
+from app.core.config import settings
 from app.core.database import DatabaseAdminService
 
 logger = logging.getLogger(__name__)
 
+# Buffered audit rows awaiting insert: (row, attempts so far)
+_buffer: Deque[Tuple[Dict[str, Any], int]] = deque()
+_flush_event: Optional[asyncio.Event] = None
+_writer_task: Optional[asyncio.Task] = None
+
+# Serializes spill file appends from worker threads so lines don't interleave
+_spill_lock = threading.Lock()
+
+
+def _write_spill_file(rows: List[Dict[str, Any]]) -> None:
+    lines = "".join(json.dumps(row, default=str) + "\n" for row in rows)
+    with _spill_lock, open(settings.AUDIT_SPILL_PATH, "a", encoding="utf-8") as f:
+        f.write(lines)
+
+
+async def _spill(rows: List[Dict[str, Any]]) -> None:
+    """Append audit rows to the local spill file (JSON lines) so they aren't lost
+    
+    The file is written in a worker thread so disk I/O never blocks the event loop.
+    """
+    try:
+        await asyncio.to_thread(_write_spill_file, rows)
+        logger.warning(f"Spilled {len(rows)} audit events to {settings.AUDIT_SPILL_PATH}")
+    except OSError as e:
+        logger.error(f"Failed to spill {len(rows)} audit events: {e}")
+
 
 async def log_audit_event(
     action: str,
@@ -21,6 +52,11 @@ async def log_audit_event(
     """
     Log audit event to database
     
+    Events are buffered and written in multi-row inserts by a background
+    writer (see start_audit_writer), so callers don't wait on the
+    database. When the buffer is full the event is appended to
+    AUDIT_SPILL_PATH instead.
+    
     Args:
         action: Action type (INSERT, UPDATE, DELETE)
         table_name: Name of the table
@@ -31,8 +67,6 @@ async def log_audit_event(
         metadata: Additional metadata
     """
     try:
-        admin_db = DatabaseAdminService()
-        
         audit_data = {
             "action": action,
             "table_name": table_name,
@@ -44,7 +78,16 @@ async def log_audit_event(
             "created_at": datetime.utcnow().isoformat(),
         }
         
-        admin_db.insert("audit_logs", audit_data)
+        if _writer_task is None:
+            # Writer not running (e.g. scripts): insert right away
+            await DatabaseAdminService().insert("audit_logs", audit_data)
+        elif len(_buffer) >= settings.AUDIT_BUFFER_SIZE:
+            # Database is falling behind; keep the event on local disk instead
+            await _spill([audit_data])
+        else:
+            _buffer.append((audit_data, 0))
+            if len(_buffer) >= settings.AUDIT_FLUSH_BATCH_SIZE:
+                _flush_event.set()
         
         logger.info(
             f"Audit log: {action} on {table_name}.{record_id}",
@@ -56,12 +99,97 @@ async def log_audit_event(
                 "client_id": client_id,
             },
         )
-        
+    
     except Exception as e:
         # Log error but don't fail the request
         logger.error(f"Failed to log audit event: {e}")
 
 
+async def _write_batch(db: DatabaseAdminService, batch: List[Tuple[Dict[str, Any], int]]) -> List[Tuple[Dict[str, Any], int]]:
+    """
+    Insert one batch of audit rows
+    
+    Returns:
+        Rows to retry (attempt count incremented); rows out of attempts are spilled
+    """
+    try:
+        await db.bulk_insert("audit_logs", [row for row, _ in batch])
+        return []
+    except Exception as e:
+        logger.error(f"Failed to write {len(batch)} audit events: {e}")
+    
+    retry = [(row, attempts + 1) for row, attempts in batch if attempts + 1 < settings.AUDIT_MAX_ATTEMPTS]
+    exhausted = [row for row, attempts in batch if attempts + 1 >= settings.AUDIT_MAX_ATTEMPTS]
+    if exhausted:
+        await _spill(exhausted)
+    return retry
+
+
+async def _flush(db: DatabaseAdminService) -> None:
+    """Write everything currently buffered; failed rows go back to the front of the buffer"""
+    retry = []
+    while _buffer:
+        batch = [_buffer.popleft() for _ in range(min(len(_buffer), settings.AUDIT_FLUSH_BATCH_SIZE))]
+        retry.extend(await _write_batch(db, batch))
+    _buffer.extendleft(reversed(retry))
+
+
+async def _writer() -> None:
+    db = DatabaseAdminService()
+    interval = settings.AUDIT_FLUSH_INTERVAL_MS / 1000
+    
+    while True:
+        try:
+            await asyncio.wait_for(_flush_event.wait(), timeout=interval)
+        except asyncio.TimeoutError:
+            pass
+        _flush_event.clear()
+        
+        try:
+            await _flush(db)
+        except Exception:
+            logger.exception("Audit flush failed")
+
+
+async def start_audit_writer() -> None:
+    """Start the background audit writer (called on startup)"""
+    global _flush_event, _writer_task
+    
+    if _writer_task is None:
+        _flush_event = asyncio.Event()
+        _writer_task = asyncio.create_task(_writer())
+
+
+async def stop_audit_writer() -> None:
+    """Stop the writer and flush buffered events (called on shutdown)
+    
+    Anything that still can't be written is spilled to AUDIT_SPILL_PATH.
+    """
+    global _writer_task
+    
+    if _writer_task is None:
+        return
+    
+    _writer_task.cancel()
+    await asyncio.gather(_writer_task, return_exceptions=True)
+    _writer_task = None
+    
+    # Never raise: the rest of the shutdown sequence must still run
+    try:
+        db = DatabaseAdminService()
+        while _buffer:
+            await _flush(db)
+    except Exception as e:
+        logger.error(f"Failed to drain audit buffer on shutdown: {e}")
+    
+    if _buffer:
+        rows = [row for row, _ in _buffer]
+        _buffer.clear()
+        await _spill(rows)
+    
+    logger.info("Audit writer drained")
+
+
 def audit_log_middleware(action: str, table_name: str):
     """Decorator to automatically log audit events"""
     def decorator(func):
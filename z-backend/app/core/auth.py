@@ -1,49 +1,140 @@
 """
 JWT Authentication and Authorization
 """
+import asyncio
+import hashlib
+import time
 import jwt
-from typing import Optional, Dict, Any
+from collections import OrderedDict
+from typing import Optional, Dict, Any, Tuple
 from fastapi import Header, HTTPException
-from jose import jwt as jose_jwt, JWTError
+from jose import jwk, jwt as jose_jwt, JWTError
 from jose.utils import base64url_decode
 import httpx
 import logging
 from app.core.config import settings
 from app.core.exceptions import UnauthorizedError, ForbiddenError
+from app.core.logging import update_request_context
 from uuid import UUID
 
 logger = logging.getLogger(__name__)
 
-# Cache for JWKs
-_jwks_cache: Optional[Dict[str, Any]] = None
+# JWKS signing keys indexed by kid (pre-constructed for verification)
+_jwks_keys: Dict[str, Any] = {}
 _jwks_cache_expiry: Optional[float] = None
+_jwks_last_refresh: float = 0.0
+_jwks_refresh_lock: Optional[asyncio.Lock] = None
+_jwks_refresh_task: Optional[asyncio.Task] = None
 
+# Verified claims keyed by token hash: hash -> (claims, expires_at)
+_claims_cache: "OrderedDict[str, Tuple[Dict[str, Any], float]]" = OrderedDict()
 
-async def get_jwks() -> Dict[str, Any]:
-    """Fetch JWKs from Auth0"""
-    global _jwks_cache, _jwks_cache_expiry
-    import time
+
+def _token_hash(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+def get_cached_claims(token: str) -> Optional[Dict[str, Any]]:
+    """Return verified claims for a token if it was verified recently and has not expired"""
+    key = _token_hash(token)
+    entry = _claims_cache.get(key)
+    if entry is None:
+        return None
     
-    # Check cache
-    if _jwks_cache and _jwks_cache_expiry and time.time() < _jwks_cache_expiry:
-        return _jwks_cache
+    claims, expires_at = entry
+    if time.time() >= expires_at:
+        del _claims_cache[key]
+        return None
     
-    # Fetch from Auth0
-    # Ensure we don't end up with a double slash when building the JWKS URL
-    issuer_base = settings.JWT_ISSUER.rstrip("/")
-    jwks_url = f"{issuer_base}/.well-known/jwks.json"
-    try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(jwks_url, timeout=5.0)
-            response.raise_for_status()
-            _jwks_cache = response.json()
-            _jwks_cache_expiry = time.time() + 3600  # Cache for 1 hour
-            return _jwks_cache
-    except Exception as e:
-        logger.error(f"Failed to fetch JWKs: {e}")
-        if _jwks_cache:
-            return _jwks_cache  # Use stale cache as fallback
-        raise UnauthorizedError("Failed to fetch authentication keys")
+    _claims_cache.move_to_end(key)
+    return claims
+
+
+def _cache_claims(token: str, claims: Dict[str, Any]) -> None:
+    exp = claims.get("exp")
+    if not isinstance(exp, (int, float)):
+        return
+    
+    _claims_cache[_token_hash(token)] = (claims, float(exp))
+    while len(_claims_cache) > settings.JWT_CACHE_MAX_SIZE:
+        _claims_cache.popitem(last=False)
+
+
+async def _refresh_jwks(force: bool = False) -> None:
+    """
+    Fetch JWKs from Auth0 (single-flight)
+    
+    Concurrent callers share one fetch; callers that were waiting on the lock
+    return once the keys have been refreshed by someone else.
+    """
+    global _jwks_keys, _jwks_cache_expiry, _jwks_last_refresh, _jwks_refresh_lock
+    
+    if _jwks_refresh_lock is None:
+        _jwks_refresh_lock = asyncio.Lock()
+    
+    started_at = time.time()
+    async with _jwks_refresh_lock:
+        if _jwks_last_refresh >= started_at:
+            return
+        if not force and _jwks_cache_expiry and time.time() < _jwks_cache_expiry - settings.JWKS_REFRESH_AHEAD_SECONDS:
+            return
+        
+        # Ensure we don't end up with a double slash when building the JWKS URL
+        issuer_base = settings.JWT_ISSUER.rstrip("/")
+        jwks_url = f"{issuer_base}/.well-known/jwks.json"
+        try:
+            async with httpx.AsyncClient() as client:
+                response = await client.get(jwks_url, timeout=5.0)
+                response.raise_for_status()
+                jwks = response.json()
+            
+            keys = {}
+            for key in jwks.get("keys", []):
+                try:
+                    keys[key["kid"]] = jwk.construct(key, settings.JWT_ALGORITHM)
+                except Exception as e:
+                    logger.warning(f"Skipping unusable JWK {key.get('kid')}: {e}")
+            
+            _jwks_keys = keys
+            _jwks_cache_expiry = time.time() + settings.JWKS_CACHE_TTL_SECONDS
+        except Exception as e:
+            logger.error(f"Failed to fetch JWKs: {e}")
+            if not _jwks_keys:
+                raise UnauthorizedError("Failed to fetch authentication keys")
+            # Keep using the stale keys; try again after the minimum refresh interval
+            _jwks_cache_expiry = (
+                time.time() + settings.JWKS_REFRESH_AHEAD_SECONDS + settings.JWKS_MIN_REFRESH_INTERVAL_SECONDS
+            )
+        finally:
+            _jwks_last_refresh = time.time()
+
+
+def _schedule_jwks_refresh() -> None:
+    """Refresh JWKs in the background (at most one refresh task at a time)"""
+    global _jwks_refresh_task
+    
+    if _jwks_refresh_task is None or _jwks_refresh_task.done():
+        _jwks_refresh_task = asyncio.create_task(_refresh_jwks())
+        _jwks_refresh_task.add_done_callback(lambda t: t.cancelled() or t.exception())
+
+
+async def get_signing_key(kid: str) -> Any:
+    """Get the JWKS key for a kid, refreshing the key set when needed"""
+    now = time.time()
+    
+    if not _jwks_keys or not _jwks_cache_expiry or now >= _jwks_cache_expiry:
+        await _refresh_jwks(force=True)
+    elif now >= _jwks_cache_expiry - settings.JWKS_REFRESH_AHEAD_SECONDS:
+        # Refresh ahead of expiry without blocking this request
+        _schedule_jwks_refresh()
+    
+    key = _jwks_keys.get(kid)
+    if key is None and time.time() - _jwks_last_refresh >= settings.JWKS_MIN_REFRESH_INTERVAL_SECONDS:
+        # Unknown kid: Auth0 may have rotated keys
+        await _refresh_jwks(force=True)
+        key = _jwks_keys.get(kid)
+    
+    return key
 
 
 def get_jwt_header(authorization: Optional[str] = Header(None)) -> str:
@@ -58,41 +149,34 @@ def get_jwt_header(authorization: Optional[str] = Header(None)) -> str:
 
 
 async def verify_jwt(token: str) -> Dict[str, Any]:
-    """Verify JWT token and return claims"""
+    """Verify JWT token and return claims (cached until the token expires)"""
+    claims = get_cached_claims(token)
+    if claims is not None:
+        return claims
+    
     try:
-        # Get JWKs
-        jwks = await get_jwks()
-        
         # Decode header
         unverified_header = jwt.get_unverified_header(token)
         
         # Find matching key
-        rsa_key = {}
-        for key in jwks.get("keys", []):
-            if key["kid"] == unverified_header["kid"]:
-                rsa_key = {
-                    "kty": key["kty"],
-                    "kid": key["kid"],
-                    "use": key["use"],
-                    "n": key["n"],
-                    "e": key["e"],
-                }
-                break
-        
-        if not rsa_key:
+        key = await get_signing_key(unverified_header.get("kid"))
+        if key is None:
             raise UnauthorizedError("Unable to find appropriate key")
         
         # Verify token
         claims = jose_jwt.decode(
             token,
-            rsa_key,
+            key,
             algorithms=[settings.JWT_ALGORITHM],
             audience=settings.JWT_AUDIENCE,
             issuer=settings.JWT_ISSUER,
         )
         
+        _cache_claims(token, claims)
         return claims
         
+    except UnauthorizedError:
+        raise
     except JWTError as e:
         logger.warning(f"JWT verification failed: {e}")
         raise UnauthorizedError("Invalid or expired token")
@@ -142,8 +226,8 @@ async def get_current_user(
     else:
         client_id = client_id or normalized_header_client_id
     
-    # Note: request.state is set by middleware after authentication
-    # The logging middleware will extract client_id/user_id from the request
+    # Tag the rest of this request's logs (including the access log line)
+    update_request_context(client_id=client_id, user_id=user_id)
     
     return {
         "user_id": user_id,
@@ -28,11 +28,18 @@ class Settings(BaseSettings):
     SUPABASE_URL: str = os.getenv("SUPABASE_URL", "")
     SUPABASE_KEY: str = os.getenv("SUPABASE_KEY", "")
     SUPABASE_SERVICE_KEY: str = os.getenv("SUPABASE_SERVICE_KEY", "")
+    SUPABASE_MAX_CONNECTIONS: int = int(os.getenv("SUPABASE_MAX_CONNECTIONS", "100"))
+    SUPABASE_MAX_KEEPALIVE_CONNECTIONS: int = int(os.getenv("SUPABASE_MAX_KEEPALIVE_CONNECTIONS", "20"))
+    SUPABASE_HTTP_TIMEOUT: float = float(os.getenv("SUPABASE_HTTP_TIMEOUT", "30"))
     
     # Auth0
     JWT_AUDIENCE: str = os.getenv("JWT_AUDIENCE", "")
     JWT_ISSUER: str = os.getenv("JWT_ISSUER", "")
     JWT_ALGORITHM: str = "RS256"
+    JWT_CACHE_MAX_SIZE: int = int(os.getenv("JWT_CACHE_MAX_SIZE", "10000"))
+    JWKS_CACHE_TTL_SECONDS: int = int(os.getenv("JWKS_CACHE_TTL_SECONDS", "3600"))
+    JWKS_REFRESH_AHEAD_SECONDS: int = int(os.getenv("JWKS_REFRESH_AHEAD_SECONDS", "300"))
+    JWKS_MIN_REFRESH_INTERVAL_SECONDS: int = int(os.getenv("JWKS_MIN_REFRESH_INTERVAL_SECONDS", "60"))
     
     # AWS
     AWS_REGION: str = os.getenv("AWS_REGION", "us-east-1")
@@ -40,11 +47,26 @@ class Settings(BaseSettings):
     AWS_SECRET_ACCESS_KEY: str = os.getenv("AWS_SECRET_ACCESS_KEY", "")
     S3_BUCKET_UPLOADS: str = os.getenv("S3_BUCKET_UPLOADS", "trudy-uploads")
     S3_BUCKET_RECORDINGS: str = os.getenv("S3_BUCKET_RECORDINGS", "trudy-recordings")
+    S3_MAX_CONCURRENT_REQUESTS: int = int(os.getenv("S3_MAX_CONCURRENT_REQUESTS", "20"))
+    KB_INGEST_PARALLELISM: int = int(os.getenv("KB_INGEST_PARALLELISM", "10"))
     KMS_KEY_ID: str = os.getenv("KMS_KEY_ID", "")  # KMS key ID for encryption
+    ENCRYPTION_DATA_KEY_MAX_AGE_SECONDS: float = float(os.getenv("ENCRYPTION_DATA_KEY_MAX_AGE_SECONDS", "300"))
+    ENCRYPTION_DATA_KEY_MAX_USES: int = int(os.getenv("ENCRYPTION_DATA_KEY_MAX_USES", "1000"))
+    ENCRYPTION_DATA_KEY_CACHE_MAX_SIZE: int = int(os.getenv("ENCRYPTION_DATA_KEY_CACHE_MAX_SIZE", "1000"))
+    ENCRYPTION_SECRET_CACHE_TTL_SECONDS: float = float(os.getenv("ENCRYPTION_SECRET_CACHE_TTL_SECONDS", "300"))
+    ENCRYPTION_SECRET_CACHE_MAX_SIZE: int = int(os.getenv("ENCRYPTION_SECRET_CACHE_MAX_SIZE", "10000"))
     
     # External APIs
     ULTRAVOX_API_KEY: str = os.getenv("ULTRAVOX_API_KEY", "")
     ULTRAVOX_BASE_URL: str = os.getenv("ULTRAVOX_BASE_URL", "https://api.ultravox.ai/v1")
+    ULTRAVOX_MAX_CONNECTIONS: int = int(os.getenv("ULTRAVOX_MAX_CONNECTIONS", "50"))
+    ULTRAVOX_MAX_CONCURRENT_REQUESTS: int = int(os.getenv("ULTRAVOX_MAX_CONCURRENT_REQUESTS", "20"))
+    ULTRAVOX_TIMEOUT: float = float(os.getenv("ULTRAVOX_TIMEOUT", "30"))
+    ULTRAVOX_CONNECT_TIMEOUT: float = float(os.getenv("ULTRAVOX_CONNECT_TIMEOUT", "5"))
+    ULTRAVOX_RATE_LIMIT_PER_SECOND: float = float(os.getenv("ULTRAVOX_RATE_LIMIT_PER_SECOND", "10"))
+    ULTRAVOX_RATE_LIMIT_BURST: int = int(os.getenv("ULTRAVOX_RATE_LIMIT_BURST", "20"))
+    ULTRAVOX_CIRCUIT_FAILURE_THRESHOLD: int = int(os.getenv("ULTRAVOX_CIRCUIT_FAILURE_THRESHOLD", "5"))
+    ULTRAVOX_CIRCUIT_RECOVERY_SECONDS: float = float(os.getenv("ULTRAVOX_CIRCUIT_RECOVERY_SECONDS", "30"))
     STRIPE_SECRET_KEY: str = os.getenv("STRIPE_SECRET_KEY", "")
     TELNYX_API_KEY: str = os.getenv("TELNYX_API_KEY", "")
     
@@ -53,6 +75,13 @@ class Settings(BaseSettings):
     STRIPE_WEBHOOK_SECRET: str = os.getenv("STRIPE_WEBHOOK_SECRET", "")
     TELNYX_WEBHOOK_SECRET: str = os.getenv("TELNYX_WEBHOOK_SECRET", "")
     WEBHOOK_SIGNING_SECRET: str = os.getenv("WEBHOOK_SIGNING_SECRET", "")
+    WEBHOOK_DELIVERY_WORKERS: int = int(os.getenv("WEBHOOK_DELIVERY_WORKERS", "10"))
+    WEBHOOK_DELIVERY_TIMEOUT: int = int(os.getenv("WEBHOOK_DELIVERY_TIMEOUT", "10"))
+    WEBHOOK_DELIVERY_BATCH_SIZE: int = int(os.getenv("WEBHOOK_DELIVERY_BATCH_SIZE", "50"))
+    WEBHOOK_DELIVERY_LEASE_SECONDS: int = int(os.getenv("WEBHOOK_DELIVERY_LEASE_SECONDS", "120"))
+    WEBHOOK_DELIVERY_POLL_SECONDS: float = float(os.getenv("WEBHOOK_DELIVERY_POLL_SECONDS", "5"))
+    WEBHOOK_RETRY_BASE_SECONDS: int = int(os.getenv("WEBHOOK_RETRY_BASE_SECONDS", "30"))
+    WEBHOOK_RETRY_MAX_SECONDS: int = int(os.getenv("WEBHOOK_RETRY_MAX_SECONDS", "3600"))
     
     # Secrets Manager (optional, for production)
     USE_SECRETS_MANAGER: bool = os.getenv("USE_SECRETS_MANAGER", "false").lower() == "true"
@@ -60,14 +89,74 @@ class Settings(BaseSettings):
     
     # Logging
     LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
+    LOG_QUEUE_SIZE: int = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+    LOG_ACCESS_SAMPLE_RATE: float = float(os.getenv("LOG_ACCESS_SAMPLE_RATE", "1.0"))  # share of fast 2xx/3xx access logs kept
+    LOG_ACCESS_SLOW_MS: int = int(os.getenv("LOG_ACCESS_SLOW_MS", "1000"))
     SENTRY_DSN: str = os.getenv("SENTRY_DSN", "")
     
     # Rate Limiting
     RATE_LIMIT_ENABLED: bool = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
     RATE_LIMIT_PER_MINUTE: int = int(os.getenv("RATE_LIMIT_PER_MINUTE", "100"))
+    RATE_LIMIT_WRITE_PER_MINUTE: int = int(os.getenv("RATE_LIMIT_WRITE_PER_MINUTE", "60"))
+    RATE_LIMIT_WEBHOOK_PER_MINUTE: int = int(os.getenv("RATE_LIMIT_WEBHOOK_PER_MINUTE", "1000"))
+    RATE_LIMIT_BACKEND: str = os.getenv("RATE_LIMIT_BACKEND", "memory")  # memory or redis
+    RATE_LIMIT_REDIS_URL: str = os.getenv("RATE_LIMIT_REDIS_URL", "redis://localhost:6379/0")
+    RATE_LIMIT_MAX_KEYS: int = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
     
     # Idempotency
     IDEMPOTENCY_TTL_DAYS: int = int(os.getenv("IDEMPOTENCY_TTL_DAYS", "7"))
+    IDEMPOTENCY_CACHE_MAX_SIZE: int = int(os.getenv("IDEMPOTENCY_CACHE_MAX_SIZE", "10000"))
+    IDEMPOTENCY_WAIT_SECONDS: float = float(os.getenv("IDEMPOTENCY_WAIT_SECONDS", "10"))
+    IDEMPOTENCY_RESERVATION_TIMEOUT_SECONDS: int = int(os.getenv("IDEMPOTENCY_RESERVATION_TIMEOUT_SECONDS", "60"))
+    IDEMPOTENCY_CLEANUP_BATCH_SIZE: int = int(os.getenv("IDEMPOTENCY_CLEANUP_BATCH_SIZE", "5000"))
+    IDEMPOTENCY_CLEANUP_MAX_SECONDS: float = float(os.getenv("IDEMPOTENCY_CLEANUP_MAX_SECONDS", "240"))
+    
+    # Background jobs (a queued/running job whose heartbeat is older than the lease is treated as dead)
+    JOB_HEARTBEAT_SECONDS: float = float(os.getenv("JOB_HEARTBEAT_SECONDS", "30"))
+    JOB_LEASE_SECONDS: float = float(os.getenv("JOB_LEASE_SECONDS", "120"))
+    
+    # Campaign contact ingestion and deletion
+    CONTACT_INGEST_BATCH_SIZE: int = int(os.getenv("CONTACT_INGEST_BATCH_SIZE", "1000"))
+    CAMPAIGN_DELETE_BATCH_SIZE: int = int(os.getenv("CAMPAIGN_DELETE_BATCH_SIZE", "1000"))
+    CAMPAIGN_DELETE_INLINE_MAX_CONTACTS: int = int(os.getenv("CAMPAIGN_DELETE_INLINE_MAX_CONTACTS", "1000"))
+    
+    # Campaign scheduling (Ultravox batch submission)
+    CAMPAIGN_BATCH_MAX_CONTACTS: int = int(os.getenv("CAMPAIGN_BATCH_MAX_CONTACTS", "1000"))
+    CAMPAIGN_BATCH_MAX_BYTES: int = int(os.getenv("CAMPAIGN_BATCH_MAX_BYTES", "1000000"))
+    CAMPAIGN_BATCH_PARALLELISM: int = int(os.getenv("CAMPAIGN_BATCH_PARALLELISM", "4"))
+    
+    # Credit ledger
+    CREDIT_BALANCE_CACHE_TTL_SECONDS: float = float(os.getenv("CREDIT_BALANCE_CACHE_TTL_SECONDS", "5"))
+    CREDIT_BALANCE_CACHE_MAX_SIZE: int = int(os.getenv("CREDIT_BALANCE_CACHE_MAX_SIZE", "10000"))
+    
+    # Campaign dialer (in-process pacing instead of Ultravox batches)
+    CAMPAIGN_DIALER_ENABLED: bool = os.getenv("CAMPAIGN_DIALER_ENABLED", "false").lower() == "true"
+    CAMPAIGN_DIALER_MAX_CONCURRENT_PER_CLIENT: int = int(os.getenv("CAMPAIGN_DIALER_MAX_CONCURRENT_PER_CLIENT", "100"))
+    CAMPAIGN_DIALER_START_CPS: float = float(os.getenv("CAMPAIGN_DIALER_START_CPS", "1"))
+    CAMPAIGN_DIALER_MAX_CPS: float = float(os.getenv("CAMPAIGN_DIALER_MAX_CPS", "10"))
+    CAMPAIGN_DIALER_RAMP_SECONDS: float = float(os.getenv("CAMPAIGN_DIALER_RAMP_SECONDS", "60"))
+    CAMPAIGN_DIALER_RECONCILE_SECONDS: float = float(os.getenv("CAMPAIGN_DIALER_RECONCILE_SECONDS", "15"))
+    CAMPAIGN_DIALER_CALL_TIMEOUT_SECONDS: float = float(os.getenv("CAMPAIGN_DIALER_CALL_TIMEOUT_SECONDS", "3600"))
+    
+    # Audit log writer
+    AUDIT_FLUSH_BATCH_SIZE: int = int(os.getenv("AUDIT_FLUSH_BATCH_SIZE", "100"))
+    AUDIT_FLUSH_INTERVAL_MS: int = int(os.getenv("AUDIT_FLUSH_INTERVAL_MS", "500"))
+    AUDIT_BUFFER_SIZE: int = int(os.getenv("AUDIT_BUFFER_SIZE", "10000"))
+    AUDIT_MAX_ATTEMPTS: int = int(os.getenv("AUDIT_MAX_ATTEMPTS", "3"))
+    AUDIT_SPILL_PATH: str = os.getenv("AUDIT_SPILL_PATH", "audit_spill.jsonl")
+    
+    # Tracing (OpenTelemetry-compatible spans)
+    TRACING_ENABLED: bool = os.getenv("TRACING_ENABLED", "false").lower() == "true"
+    TRACING_EXPORTER: str = os.getenv("TRACING_EXPORTER", "file")  # file, otlp, memory or none
+    TRACING_FILE_PATH: str = os.getenv("TRACING_FILE_PATH", "traces.jsonl")
+    TRACING_OTLP_ENDPOINT: str = os.getenv("TRACING_OTLP_ENDPOINT", "http://localhost:4318")
+    TRACING_SERVICE_NAME: str = os.getenv("TRACING_SERVICE_NAME", "trudy-api")
+    TRACING_SAMPLE_RATE: float = float(os.getenv("TRACING_SAMPLE_RATE", "1.0"))
+    # Honor the sampled flag of incoming traceparent headers (only when every caller is a trusted upstream)
+    TRACING_TRUST_INCOMING_SAMPLING: bool = os.getenv("TRACING_TRUST_INCOMING_SAMPLING", "false").lower() == "true"
+    TRACING_EXPORT_BATCH_SIZE: int = int(os.getenv("TRACING_EXPORT_BATCH_SIZE", "512"))
+    TRACING_EXPORT_INTERVAL_MS: int = int(os.getenv("TRACING_EXPORT_INTERVAL_MS", "1000"))
+    TRACING_BUFFER_SIZE: int = int(os.getenv("TRACING_BUFFER_SIZE", "20000"))
     
     # Internal API
     INTERNAL_API_KEY: str = os.getenv("INTERNAL_API_KEY", "")
@@ -75,6 +164,9 @@ class Settings(BaseSettings):
     # EventBridge
     EVENTBRIDGE_ENABLED: bool = os.getenv("EVENTBRIDGE_ENABLED", "true").lower() == "true"
     EVENTBRIDGE_SOURCE: str = os.getenv("EVENTBRIDGE_SOURCE", "trudy-backend")
+    EVENTBRIDGE_FLUSH_INTERVAL_SECONDS: float = float(os.getenv("EVENTBRIDGE_FLUSH_INTERVAL_SECONDS", "1"))
+    EVENTBRIDGE_BUFFER_SIZE: int = int(os.getenv("EVENTBRIDGE_BUFFER_SIZE", "10000"))
+    EVENTBRIDGE_MAX_ATTEMPTS: int = int(os.getenv("EVENTBRIDGE_MAX_ATTEMPTS", "3"))
     
     class Config:
         env_file = ".env"
@@ -1,22 +1,69 @@
 """
 Supabase Database Client
 """
-from supabase import create_client, Client
-from typing import Optional, Dict, Any, List
+from postgrest import AsyncPostgrestClient
+from postgrest.constants import DEFAULT_POSTGREST_CLIENT_HEADERS
+from typing import Optional, Dict, Any, List, Tuple
+import base64
+import json
 import logging
+import time
+import httpx
 from jose import jwt as jose_jwt
 from app.core.config import settings
+from app.core.exceptions import ValidationError
+from app.core.auth import get_cached_claims
+from app.core.metrics import DB_QUERY_DURATION, DB_QUERY_ERRORS
+from app.core.tracing import CLIENT, trace_span
 
 logger = logging.getLogger(__name__)
 
-# Global Supabase clients
-_supabase_client: Optional[Client] = None
-_supabase_admin_client: Optional[Client] = None
+# Shared HTTP connection pool used by every PostgREST client
+_http_pool: Optional[httpx.AsyncClient] = None
 
+# Global Supabase (PostgREST) clients
+_supabase_client: Optional[AsyncPostgrestClient] = None
+_supabase_admin_client: Optional[AsyncPostgrestClient] = None
+
+
+def get_http_pool() -> httpx.AsyncClient:
+    """Get or create the HTTP connection pool shared by all Supabase clients"""
+    global _http_pool
+    
+    if _http_pool is None:
+        _http_pool = httpx.AsyncClient(
+            http2=True,
+            follow_redirects=True,
+            timeout=settings.SUPABASE_HTTP_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=settings.SUPABASE_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.SUPABASE_MAX_KEEPALIVE_CONNECTIONS,
+            ),
+        )
+    
+    return _http_pool
 
-def get_supabase_client() -> Client:
-    """Get or create Supabase client.
 
+def _create_postgrest_client(api_key: str, token: Optional[str] = None) -> AsyncPostgrestClient:
+    """Create an async PostgREST client for the Supabase REST endpoint
+    
+    The client only holds headers; all requests go through the shared
+    connection pool, so creating one is cheap.
+    """
+    return AsyncPostgrestClient(
+        f"{settings.SUPABASE_URL.rstrip('/')}/rest/v1",
+        headers={
+            **DEFAULT_POSTGREST_CLIENT_HEADERS,
+            "apiKey": api_key,
+            "Authorization": f"Bearer {token or api_key}",
+        },
+        http_client=get_http_pool(),
+    )
+
+
+def get_supabase_client() -> AsyncPostgrestClient:
+    """Get or create Supabase client.
+    
     Prefers the anon key (respects RLS). Falls back to the service role key
     when the anon key isn't configured so local development doesn't fail with
     confusing PostgREST errors (PGRST301).
@@ -35,15 +82,12 @@ def get_supabase_client() -> Client:
                 "Set SUPABASE_KEY to re-enable row-level security."
             )
         
-        _supabase_client = create_client(
-            settings.SUPABASE_URL,
-            api_key,
-        )
+        _supabase_client = _create_postgrest_client(api_key)
     
     return _supabase_client
 
 
-def get_supabase_admin_client() -> Client:
+def get_supabase_admin_client() -> AsyncPostgrestClient:
     """Get or create Supabase admin client with service role key (bypasses RLS)
     
     WARNING: This client bypasses Row Level Security. Use only for:
@@ -56,150 +100,329 @@ def get_supabase_admin_client() -> Client:
     if _supabase_admin_client is None:
         if not settings.SUPABASE_SERVICE_KEY:
             raise ValueError("SUPABASE_SERVICE_KEY is required for admin operations")
-        _supabase_admin_client = create_client(
-            settings.SUPABASE_URL,
-            settings.SUPABASE_SERVICE_KEY,  # Service role key - bypasses RLS
-        )
+        # Service role key - bypasses RLS
+        _supabase_admin_client = _create_postgrest_client(settings.SUPABASE_SERVICE_KEY)
     
     return _supabase_admin_client
 
 
-def set_auth_context(token: str):
-    """Set JWT context for RLS"""
-    client = get_supabase_client()
-    client.postgrest.auth(token)
+def create_scoped_client(token: str) -> AsyncPostgrestClient:
+    """Create a Supabase client whose requests carry the caller's JWT (RLS)
+    
+    Each request gets its own client so concurrent requests for different
+    tenants never share an auth context. Scoped clients reuse the shared
+    connection pool and must not be closed individually.
+    """
+    api_key = get_supabase_client().headers["apiKey"]
+    return _create_postgrest_client(api_key, token)
+
+
+async def close_supabase_clients() -> None:
+    """Close the shared Supabase connection pool (called on shutdown)"""
+    global _http_pool, _supabase_client, _supabase_admin_client
+    
+    if _http_pool is not None:
+        await _http_pool.aclose()
+    
+    _http_pool = None
+    _supabase_client = None
+    _supabase_admin_client = None
+
+
+def encode_cursor(row: Dict[str, Any], order_by: str = "created_at") -> str:
+    """Build an opaque keyset cursor pointing after the given row"""
+    payload = json.dumps([row[order_by], row["id"]], default=str)
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    """Decode a keyset cursor produced by encode_cursor into (value, id)"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        value, row_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except Exception:
+        raise ValidationError("Invalid pagination cursor")
+    
+    # Values are embedded in a PostgREST filter, so reject anything that could escape quoting
+    if not all(isinstance(v, str) and '"' not in v and "\\" not in v for v in (value, row_id)):
+        raise ValidationError("Invalid pagination cursor")
+    
+    return value, row_id
+
+
+def _apply_filters(query, filters: Dict[str, Any]):
+    """Add equality filters to a query; None matches NULL and a list matches any of its values"""
+    for key, value in filters.items():
+        if value is None:
+            query = query.is_(key, "null")
+        elif isinstance(value, list):
+            query = query.in_(key, value)
+        else:
+            query = query.eq(key, value)
+    return query
+
+
+def _build_select(
+    client: AsyncPostgrestClient,
+    table: str,
+    filters: Optional[Dict[str, Any]] = None,
+    order_by: Optional[str] = None,
+    columns: Optional[List[str]] = None,
+    limit: Optional[int] = None,
+    offset: Optional[int] = None,
+    cursor: Optional[Tuple[str, str]] = None,
+):
+    """Build a select query with server-side projection, ordering and pagination
+    
+    Ordering is always descending. When a keyset cursor (order_by value, id)
+    is given, only rows strictly after it are returned; ties on order_by are
+    broken by id so pages are stable.
+    """
+    query = client.table(table).select(",".join(columns) if columns else "*")
+    
+    if filters:
+        query = _apply_filters(query, filters)
+    
+    if cursor:
+        order_by = order_by or "created_at"
+        value, row_id = cursor
+        query = query.or_(f'{order_by}.lt."{value}",and({order_by}.eq."{value}",id.lt."{row_id}")')
+    
+    if order_by:
+        query = query.order(order_by, desc=True)
+        if limit is not None or cursor:
+            query = query.order("id", desc=True)
+    
+    if limit is not None:
+        query = query.limit(limit)
+    
+    if offset:
+        query = query.offset(offset)
+    
+    return query
+
+
+async def _execute(query, table: str, operation: str):
+    """Execute a query in a trace span, recording its latency (and failures) per table and operation"""
+    with trace_span(
+        f"{operation} {table}",
+        CLIENT,
+        {"db.system": "postgresql", "db.operation": operation, "db.sql.table": table},
+    ):
+        start = time.perf_counter()
+        try:
+            return await query.execute()
+        except Exception:
+            DB_QUERY_ERRORS.inc(table, operation)
+            raise
+        finally:
+            DB_QUERY_DURATION.observe(time.perf_counter() - start, table, operation)
 
 
 class DatabaseService:
-    """Database service with RLS support"""
+    """Async database service with RLS support"""
     
     def __init__(self, token: Optional[str] = None):
         self.client = get_supabase_client()
+        self._token: Optional[str] = None
         if token:
             self.set_auth(token)
     
     def set_auth(self, token: Optional[str]):
-        """Set authentication context if token is a Supabase-issued JWT"""
+        """Scope this service to the caller's JWT if it is Supabase-issued"""
+        if token and token == self._token:
+            return
         if not token or not self._is_supabase_token(token):
             logger.debug("Skipping Supabase auth context: non-Supabase token provided")
             return
-        set_auth_context(token)
+        self.client = create_scoped_client(token)
+        self._token = token
     
     @staticmethod
     def _is_supabase_token(token: str) -> bool:
         """Check whether the JWT was issued by Supabase"""
         try:
-            claims = jose_jwt.get_unverified_claims(token)
+            # Reuse the claims verified by get_current_user instead of decoding again
+            claims = get_cached_claims(token) or jose_jwt.get_unverified_claims(token)
             issuer = claims.get("iss", "")
             return issuer.startswith(settings.SUPABASE_URL)
         except Exception:
             return False
     
     # Generic CRUD operations
-    def select(self, table: str, filters: Optional[Dict[str, Any]] = None, order_by: Optional[str] = None) -> List[Dict[str, Any]]:
-        """Select records from table"""
-        query = self.client.table(table).select("*")
-        
-        if filters:
-            for key, value in filters.items():
-                query = query.eq(key, value)
-        
-        if order_by:
-            query = query.order(order_by, desc=True)
+    async def select(
+        self,
+        table: str,
+        filters: Optional[Dict[str, Any]] = None,
+        order_by: Optional[str] = None,
+        columns: Optional[List[str]] = None,
+        limit: Optional[int] = None,
+        offset: Optional[int] = None,
+        cursor: Optional[Tuple[str, str]] = None,
+    ) -> List[Dict[str, Any]]:
+        """Select records from table
         
-        response = query.execute()
+        Args:
+            columns: Columns to return (default: all)
+            limit: Maximum number of rows to return
+            offset: Number of rows to skip (prefer cursor for deep pages)
+            cursor: Keyset cursor (order_by value, id) from decode_cursor
+        """
+        query = _build_select(self.client, table, filters, order_by, columns, limit, offset, cursor)
+        response = await _execute(query, table, "select")
         return response.data if response.data else []
     
-    def select_one(self, table: str, filters: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    async def select_one(self, table: str, filters: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         """Select single record"""
-        results = self.select(table, filters)
+        results = await self.select(table, filters, limit=1)
         return results[0] if results else None
     
-    def insert(self, table: str, data: Dict[str, Any]) -> Dict[str, Any]:
+    async def insert(self, table: str, data: Dict[str, Any]) -> Dict[str, Any]:
         """Insert record"""
-        response = self.client.table(table).insert(data).execute()
+        response = await _execute(self.client.table(table).insert(data), table, "insert")
         return response.data[0] if response.data else {}
     
-    def update(self, table: str, filters: Dict[str, Any], data: Dict[str, Any]) -> Dict[str, Any]:
-        """Update records"""
-        query = self.client.table(table).update(data)
+    async def bulk_insert(
+        self,
+        table: str,
+        rows: List[Dict[str, Any]],
+        on_conflict: Optional[str] = None,
+        ignore_duplicates: bool = False,
+    ) -> int:
+        """Insert many records in a single request
         
-        for key, value in filters.items():
-            query = query.eq(key, value)
+        Args:
+            on_conflict: Comma-separated unique columns; with ignore_duplicates,
+                conflicting rows are skipped (ON CONFLICT DO NOTHING)
+        
+        Returns:
+            Number of rows inserted
+        """
+        if not rows:
+            return 0
+        
+        if on_conflict:
+            query = self.client.table(table).upsert(
+                rows,
+                count="exact",
+                returning="minimal",
+                ignore_duplicates=ignore_duplicates,
+                on_conflict=on_conflict,
+            )
+        else:
+            query = self.client.table(table).insert(rows, count="exact", returning="minimal")
+        
+        response = await _execute(query, table, "bulk_insert")
+        return response.count if response.count else 0
+    
+    async def update(self, table: str, filters: Dict[str, Any], data: Dict[str, Any]) -> Dict[str, Any]:
+        """Update records"""
+        query = _apply_filters(self.client.table(table).update(data), filters)
         
-        response = query.execute()
+        response = await _execute(query, table, "update")
         return response.data[0] if response.data else {}
     
-    def delete(self, table: str, filters: Dict[str, Any]) -> bool:
+    async def delete(self, table: str, filters: Dict[str, Any]) -> bool:
         """Delete records"""
-        query = self.client.table(table).delete()
-        
-        for key, value in filters.items():
-            query = query.eq(key, value)
+        query = _apply_filters(self.client.table(table).delete(), filters)
         
-        response = query.execute()
+        response = await _execute(query, table, "delete")
         return len(response.data) > 0
     
-    def count(self, table: str, filters: Optional[Dict[str, Any]] = None) -> int:
-        """Count records"""
-        query = self.client.table(table).select("*", count="exact")
+    async def bulk_delete(
+        self,
+        table: str,
+        filters: Optional[Dict[str, Any]] = None,
+        ids: Optional[List[str]] = None,
+        chunk_size: int = 200,
+    ) -> int:
+        """Delete many records without fetching them first
+        
+        Args:
+            filters: Equality filters; all matching rows are deleted in one statement
+            ids: Primary keys to delete, sent as chunked `in` filters (combined with filters)
+            chunk_size: Ids per request (keeps the query string bounded)
+        
+        Returns:
+            Number of rows deleted
+        """
+        if ids is None:
+            if not filters:
+                raise ValueError("bulk_delete requires filters or ids")
+            chunks = [None]
+        else:
+            chunks = [ids[i:i + chunk_size] for i in range(0, len(ids), chunk_size)]
+        
+        deleted = 0
+        for chunk in chunks:
+            query = self.client.table(table).delete(count="exact", returning="minimal")
+            for key, value in (filters or {}).items():
+                query = query.eq(key, value)
+            if chunk is not None:
+                query = query.in_("id", chunk)
+            
+            response = await _execute(query, table, "bulk_delete")
+            deleted += response.count if response.count else 0
+        
+        return deleted
+    
+    async def rpc(self, function: str, params: Optional[Dict[str, Any]] = None) -> Any:
+        """Call a Postgres function"""
+        response = await _execute(self.client.rpc(function, params or {}), function, "rpc")
+        return response.data
+    
+    async def count(self, table: str, filters: Optional[Dict[str, Any]] = None, method: str = "exact") -> int:
+        """Count records
+        
+        Args:
+            method: PostgREST count method ("exact", "planned" or "estimated").
+                "estimated" uses planner statistics for large result sets.
+        """
+        query = self.client.table(table).select("*", count=method, head=True)
         
         if filters:
             for key, value in filters.items():
                 query = query.eq(key, value)
         
-        response = query.execute()
+        response = await _execute(query, table, "count")
         return response.count if response.count else 0
     
     # Specific table methods
-    def get_client(self, client_id: str) -> Optional[Dict[str, Any]]:
+    async def get_client(self, client_id: str) -> Optional[Dict[str, Any]]:
         """Get client by ID"""
-        return self.select_one("clients", {"id": client_id})
+        return await self.select_one("clients", {"id": client_id})
     
-    def get_user_by_auth0_sub(self, auth0_sub: str) -> Optional[Dict[str, Any]]:
+    async def get_user_by_auth0_sub(self, auth0_sub: str) -> Optional[Dict[str, Any]]:
         """Get user by Auth0 sub"""
-        return self.select_one("users", {"auth0_sub": auth0_sub})
+        return await self.select_one("users", {"auth0_sub": auth0_sub})
     
-    def get_voice(self, voice_id: str, client_id: str) -> Optional[Dict[str, Any]]:
+    async def get_voice(self, voice_id: str, client_id: str) -> Optional[Dict[str, Any]]:
         """Get voice by ID"""
-        return self.select_one("voices", {"id": voice_id, "client_id": client_id})
+        return await self.select_one("voices", {"id": voice_id, "client_id": client_id})
     
-    def get_agent(self, agent_id: str, client_id: str) -> Optional[Dict[str, Any]]:
+    async def get_agent(self, agent_id: str, client_id: str) -> Optional[Dict[str, Any]]:
         """Get agent by ID"""
-        return self.select_one("agents", {"id": agent_id, "client_id": client_id})
+        return await self.select_one("agents", {"id": agent_id, "client_id": client_id})
     
-    def get_knowledge_base(self, kb_id: str, client_id: str) -> Optional[Dict[str, Any]]:
+    async def get_knowledge_base(self, kb_id: str, client_id: str) -> Optional[Dict[str, Any]]:
         """Get knowledge base by ID"""
-        return self.select_one("knowledge_documents", {"id": kb_id, "client_id": client_id})
+        return await self.select_one("knowledge_documents", {"id": kb_id, "client_id": client_id})
     
-    def get_campaign(self, campaign_id: str, client_id: str) -> Optional[Dict[str, Any]]:
+    async def get_campaign(self, campaign_id: str, client_id: str) -> Optional[Dict[str, Any]]:
         """Get campaign by ID"""
-        return self.select_one("campaigns", {"id": campaign_id, "client_id": client_id})
+        return await self.select_one("campaigns", {"id": campaign_id, "client_id": client_id})
     
-    def get_call(self, call_id: str, client_id: str) -> Optional[Dict[str, Any]]:
+    async def get_call(self, call_id: str, client_id: str) -> Optional[Dict[str, Any]]:
         """Get call by ID"""
-        return self.select_one("calls", {"id": call_id, "client_id": client_id})
+        return await self.select_one("calls", {"id": call_id, "client_id": client_id})
     
-    def get_campaign_contacts(self, campaign_id: str) -> List[Dict[str, Any]]:
+    async def get_campaign_contacts(self, campaign_id: str) -> List[Dict[str, Any]]:
         """Get campaign contacts"""
-        return self.select("campaign_contacts", {"campaign_id": campaign_id})
-    
-    def update_campaign_stats(self, campaign_id: str) -> Dict[str, Any]:
-        """Update campaign statistics"""
-        contacts = self.get_campaign_contacts(campaign_id)
-        
-        stats = {
-            "pending": sum(1 for c in contacts if c.get("status") == "pending"),
-            "calling": sum(1 for c in contacts if c.get("status") == "calling"),
-            "completed": sum(1 for c in contacts if c.get("status") == "completed"),
-            "failed": sum(1 for c in contacts if c.get("status") == "failed"),
-        }
-        
-        return self.update("campaigns", {"id": campaign_id}, {"stats": stats})
+        return await self.select("campaign_contacts", {"campaign_id": campaign_id})
 
 
 class DatabaseAdminService:
-    """Database admin service that bypasses RLS using service role key
+    """Async database admin service that bypasses RLS using service role key
     
     WARNING: This service bypasses Row Level Security. Use only for:
     - Admin operations that need full database access
@@ -211,47 +434,124 @@ class DatabaseAdminService:
         self.client = get_supabase_admin_client()
     
     # Generic CRUD operations (same as DatabaseService but with admin client)
-    def select(self, table: str, filters: Optional[Dict[str, Any]] = None, order_by: Optional[str] = None) -> List[Dict[str, Any]]:
-        """Select records from table (bypasses RLS)"""
-        query = self.client.table(table).select("*")
+    async def select(
+        self,
+        table: str,
+        filters: Optional[Dict[str, Any]] = None,
+        order_by: Optional[str] = None,
+        columns: Optional[List[str]] = None,
+        limit: Optional[int] = None,
+        offset: Optional[int] = None,
+        cursor: Optional[Tuple[str, str]] = None,
+    ) -> List[Dict[str, Any]]:
+        """Select records from table (bypasses RLS)
         
-        if filters:
-            for key, value in filters.items():
-                query = query.eq(key, value)
-        
-        if order_by:
-            query = query.order(order_by, desc=True)
-        
-        response = query.execute()
+        Args:
+            columns: Columns to return (default: all)
+            limit: Maximum number of rows to return
+            offset: Number of rows to skip (prefer cursor for deep pages)
+            cursor: Keyset cursor (order_by value, id) from decode_cursor
+        """
+        query = _build_select(self.client, table, filters, order_by, columns, limit, offset, cursor)
+        response = await _execute(query, table, "select")
         return response.data if response.data else []
     
-    def select_one(self, table: str, filters: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    async def select_one(self, table: str, filters: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         """Select single record (bypasses RLS)"""
-        results = self.select(table, filters)
+        results = await self.select(table, filters, limit=1)
         return results[0] if results else None
     
-    def insert(self, table: str, data: Dict[str, Any]) -> Dict[str, Any]:
+    async def insert(self, table: str, data: Dict[str, Any]) -> Dict[str, Any]:
         """Insert record (bypasses RLS)"""
-        response = self.client.table(table).insert(data).execute()
+        response = await _execute(self.client.table(table).insert(data), table, "insert")
         return response.data[0] if response.data else {}
     
-    def update(self, table: str, filters: Dict[str, Any], data: Dict[str, Any]) -> Dict[str, Any]:
-        """Update records (bypasses RLS)"""
-        query = self.client.table(table).update(data)
+    async def bulk_insert(
+        self,
+        table: str,
+        rows: List[Dict[str, Any]],
+        on_conflict: Optional[str] = None,
+        ignore_duplicates: bool = False,
+    ) -> int:
+        """Insert many records in a single request (bypasses RLS)
         
-        for key, value in filters.items():
-            query = query.eq(key, value)
+        Args:
+            on_conflict: Comma-separated unique columns; with ignore_duplicates,
+                conflicting rows are skipped (ON CONFLICT DO NOTHING)
+        
+        Returns:
+            Number of rows inserted
+        """
+        if not rows:
+            return 0
+        
+        if on_conflict:
+            query = self.client.table(table).upsert(
+                rows,
+                count="exact",
+                returning="minimal",
+                ignore_duplicates=ignore_duplicates,
+                on_conflict=on_conflict,
+            )
+        else:
+            query = self.client.table(table).insert(rows, count="exact", returning="minimal")
         
-        response = query.execute()
+        response = await _execute(query, table, "bulk_insert")
+        return response.count if response.count else 0
+    
+    async def update(self, table: str, filters: Dict[str, Any], data: Dict[str, Any]) -> Dict[str, Any]:
+        """Update records (bypasses RLS)"""
+        query = _apply_filters(self.client.table(table).update(data), filters)
+        
+        response = await _execute(query, table, "update")
         return response.data[0] if response.data else {}
     
-    def delete(self, table: str, filters: Dict[str, Any]) -> bool:
+    async def delete(self, table: str, filters: Dict[str, Any]) -> bool:
         """Delete records (bypasses RLS)"""
-        query = self.client.table(table).delete()
-        
-        for key, value in filters.items():
-            query = query.eq(key, value)
+        query = _apply_filters(self.client.table(table).delete(), filters)
         
-        response = query.execute()
+        response = await _execute(query, table, "delete")
         return len(response.data) > 0
+    
+    async def bulk_delete(
+        self,
+        table: str,
+        filters: Optional[Dict[str, Any]] = None,
+        ids: Optional[List[str]] = None,
+        chunk_size: int = 200,
+    ) -> int:
+        """Delete many records without fetching them first (bypasses RLS)
+        
+        Args:
+            filters: Equality filters; all matching rows are deleted in one statement
+            ids: Primary keys to delete, sent as chunked `in` filters (combined with filters)
+            chunk_size: Ids per request (keeps the query string bounded)
+        
+        Returns:
+            Number of rows deleted
+        """
+        if ids is None:
+            if not filters:
+                raise ValueError("bulk_delete requires filters or ids")
+            chunks = [None]
+        else:
+            chunks = [ids[i:i + chunk_size] for i in range(0, len(ids), chunk_size)]
+        
+        deleted = 0
+        for chunk in chunks:
+            query = self.client.table(table).delete(count="exact", returning="minimal")
+            for key, value in (filters or {}).items():
+                query = query.eq(key, value)
+            if chunk is not None:
+                query = query.in_("id", chunk)
+            
+            response = await _execute(query, table, "bulk_delete")
+            deleted += response.count if response.count else 0
+        
+        return deleted
+    
+    async def rpc(self, function: str, params: Optional[Dict[str, Any]] = None) -> Any:
+        """Call a Postgres function (bypasses RLS)"""
+        response = await _execute(self.client.rpc(function, params or {}), function, "rpc")
+        return response.data
 
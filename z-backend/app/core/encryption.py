@@ -1,18 +1,61 @@
 """
-AWS KMS Encryption Service for API Keys
+AWS KMS Envelope Encryption Service for API Keys
 """
+import asyncio
+import base64
 import logging
+import os
+import struct
+import time
 import boto3
+from collections import OrderedDict
 from botocore.exceptions import ClientError, BotoCoreError
-from typing import Optional
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from typing import Optional, Tuple, Dict
 from app.core.config import settings
+from app.core.metrics import AWS_REQUEST_DURATION
+from app.core.tracing import CLIENT, trace_span
 
 logger = logging.getLogger(__name__)
 
+# Envelope ciphertext: "env2:" + base64(len(encrypted data key) | encrypted data key | nonce | AES-GCM ciphertext)
+# The owning client and service are bound as AES-GCM associated data
+ENVELOPE_PREFIX = "env2:"
+NONCE_SIZE = 12
+ENCRYPTION_CONTEXT = {"purpose": "api_key"}
+
 # Global KMS client
 _kms_client = None
 
 
+class _DataKey:
+    """KMS data key used to encrypt secrets until it reaches its age or use limit"""
+    
+    def __init__(self, plaintext: bytes, encrypted: bytes):
+        self.aesgcm = AESGCM(plaintext)
+        self.encrypted = encrypted
+        self.created_at = time.monotonic()
+        self.uses = 0
+    
+    def usable(self) -> bool:
+        return (
+            self.uses < settings.ENCRYPTION_DATA_KEY_MAX_USES
+            and time.monotonic() - self.created_at < settings.ENCRYPTION_DATA_KEY_MAX_AGE_SECONDS
+        )
+
+
+_data_key: Optional[_DataKey] = None
+_data_key_lock: Optional[asyncio.Lock] = None
+
+# Encrypted data key -> (AESGCM, fetched_at), so decrypting doesn't call KMS per secret
+_decrypted_data_keys: "OrderedDict[bytes, Tuple[AESGCM, float]]" = OrderedDict()
+_pending_data_keys: Dict[bytes, "asyncio.Future[AESGCM]"] = {}
+
+# (ciphertext, associated data) -> (plaintext, cached_at) for hot read paths
+_secret_cache: "OrderedDict[Tuple[str, bytes], Tuple[str, float]]" = OrderedDict()
+
+
 def get_kms_client():
     """Get or create KMS client"""
     global _kms_client
@@ -32,46 +75,148 @@ def get_kms_client():
     return _kms_client
 
 
-def encrypt_api_key(plaintext: str, key_id: Optional[str] = None) -> Optional[str]:
+def _kms_configured() -> bool:
+    return bool(settings.KMS_KEY_ID and settings.AWS_REGION)
+
+
+async def _kms_call(operation: str, **kwargs):
+    """Run a (blocking) KMS operation in a worker thread, traced and recording its latency"""
+    method = "".join(part.title() for part in operation.split("_"))
+    with trace_span(f"KMS.{method}", CLIENT, {"rpc.system": "aws-api", "rpc.service": "KMS", "rpc.method": method}):
+        start = time.perf_counter()
+        status = "error"
+        try:
+            response = await asyncio.to_thread(getattr(get_kms_client(), operation), **kwargs)
+            status = "ok"
+            return response
+        finally:
+            AWS_REQUEST_DURATION.observe(time.perf_counter() - start, "kms", operation, status)
+
+
+async def _get_data_key() -> _DataKey:
+    """Current data key, generating a new one via KMS when it has expired (single-flight)"""
+    global _data_key, _data_key_lock
+    
+    if _data_key is not None and _data_key.usable():
+        return _data_key
+    
+    if _data_key_lock is None:
+        _data_key_lock = asyncio.Lock()
+    
+    async with _data_key_lock:
+        if _data_key is not None and _data_key.usable():
+            return _data_key
+        
+        response = await _kms_call(
+            "generate_data_key",
+            KeyId=settings.KMS_KEY_ID,
+            KeySpec="AES_256",
+            EncryptionContext=ENCRYPTION_CONTEXT,
+        )
+        _data_key = _DataKey(response["Plaintext"], response["CiphertextBlob"])
+        return _data_key
+
+
+async def _get_data_key_cipher(encrypted_key: bytes) -> AESGCM:
+    """AES-GCM cipher for an encrypted data key, decrypting it via KMS on a cache miss
+    
+    Concurrent misses for the same data key share one KMS request.
+    """
+    entry = _decrypted_data_keys.get(encrypted_key)
+    if entry is not None and time.monotonic() - entry[1] < settings.ENCRYPTION_DATA_KEY_MAX_AGE_SECONDS:
+        _decrypted_data_keys.move_to_end(encrypted_key)
+        return entry[0]
+    
+    pending = _pending_data_keys.get(encrypted_key)
+    if pending is not None:
+        return await asyncio.shield(pending)
+    
+    future = asyncio.get_running_loop().create_future()
+    _pending_data_keys[encrypted_key] = future
+    try:
+        response = await _kms_call(
+            "decrypt",
+            CiphertextBlob=encrypted_key,
+            EncryptionContext=ENCRYPTION_CONTEXT,
+        )
+        aesgcm = AESGCM(response["Plaintext"])
+        
+        _decrypted_data_keys[encrypted_key] = (aesgcm, time.monotonic())
+        while len(_decrypted_data_keys) > settings.ENCRYPTION_DATA_KEY_CACHE_MAX_SIZE:
+            _decrypted_data_keys.popitem(last=False)
+        
+        future.set_result(aesgcm)
+        return aesgcm
+    except asyncio.CancelledError:
+        future.cancel()
+        raise
+    except Exception as e:
+        future.set_exception(e)
+        # Mark retrieved so an unawaited failure isn't logged as never retrieved
+        future.exception()
+        raise
+    finally:
+        _pending_data_keys.pop(encrypted_key, None)
+
+
+def _associated_data(client_id: str, service: str) -> bytes:
+    """AES-GCM associated data tying a secret to the client and service it was stored for"""
+    return f"{client_id}:{service}".encode("utf-8")
+
+
+def _cache_secret(cache_key: Tuple[str, bytes], plaintext: str) -> None:
+    _secret_cache[cache_key] = (plaintext, time.monotonic())
+    _secret_cache.move_to_end(cache_key)
+    while len(_secret_cache) > settings.ENCRYPTION_SECRET_CACHE_MAX_SIZE:
+        _secret_cache.popitem(last=False)
+
+
+async def encrypt_api_key(plaintext: str, client_id: str, service: str) -> Optional[str]:
     """
-    Encrypt API key using AWS KMS
+    Encrypt API key with envelope encryption
+    
+    The secret is encrypted locally with AES-256-GCM under a KMS data key.
+    The data key is reused until ENCRYPTION_DATA_KEY_MAX_AGE_SECONDS or
+    ENCRYPTION_DATA_KEY_MAX_USES is reached, so KMS is only called when it
+    rotates. The encrypted data key is stored alongside the ciphertext.
+    client_id and service are authenticated as associated data, so the
+    ciphertext only decrypts for the same client and service.
     
     Args:
         plaintext: The API key to encrypt
-        key_id: KMS key ID (optional, uses default if not provided)
+        client_id: Client that owns the key
+        service: Provider the key is for (e.g. "elevenlabs")
     
     Returns:
-        Encrypted ciphertext blob (base64 encoded) or None if encryption fails
+        Envelope ciphertext or None if encryption fails
     """
     if not plaintext:
         return None
     
     # If KMS is not configured, return plaintext (development mode)
     # In production, this should always use KMS
-    if not settings.AWS_ACCESS_KEY_ID or not settings.AWS_REGION:
+    if not _kms_configured():
         logger.warning("KMS not configured. Storing API key as plaintext (not recommended for production)")
         return plaintext
     
-    kms_client = get_kms_client()
-    if not kms_client:
+    if not get_kms_client():
         logger.error("KMS client not available. Storing API key as plaintext")
         return plaintext
     
     try:
-        # Use default key ID from environment or parameter
-        encryption_key_id = key_id or settings.AWS_REGION  # You should set KMS_KEY_ID in settings
+        data_key = await _get_data_key()
+        data_key.uses += 1
         
-        response = kms_client.encrypt(
-            KeyId=encryption_key_id,
-            Plaintext=plaintext.encode('utf-8'),
-        )
+        associated_data = _associated_data(client_id, service)
+        nonce = os.urandom(NONCE_SIZE)
+        ciphertext = data_key.aesgcm.encrypt(nonce, plaintext.encode("utf-8"), associated_data)
+        blob = struct.pack(">H", len(data_key.encrypted)) + data_key.encrypted + nonce + ciphertext
         
-        # Return base64 encoded ciphertext
-        import base64
-        ciphertext_blob = response['CiphertextBlob']
-        return base64.b64encode(ciphertext_blob).decode('utf-8')
-        
-    except ClientError as e:
+        encrypted = ENVELOPE_PREFIX + base64.b64encode(blob).decode("utf-8")
+        _cache_secret((encrypted, associated_data), plaintext)
+        return encrypted
+    
+    except (ClientError, BotoCoreError) as e:
         logger.error(f"AWS KMS encryption error: {e}")
         return None
     except Exception as e:
@@ -79,28 +224,44 @@ def encrypt_api_key(plaintext: str, key_id: Optional[str] = None) -> Optional[st
         return None
 
 
-def decrypt_api_key(ciphertext: str, key_id: Optional[str] = None) -> Optional[str]:
+async def decrypt_api_key(ciphertext: str, client_id: str, service: str) -> Optional[str]:
     """
-    Decrypt API key using AWS KMS
+    Decrypt API key
+    
+    Recently decrypted secrets are served from an in-memory cache
+    (ENCRYPTION_SECRET_CACHE_TTL_SECONDS), and decrypted data keys are
+    cached, so KMS is only called for a data key not seen recently.
+    Values encrypted directly with KMS (before envelope encryption) are
+    still decrypted.
     
     Args:
-        ciphertext: The encrypted API key (base64 encoded)
-        key_id: KMS key ID (optional, uses default if not provided)
+        ciphertext: The encrypted API key
+        client_id: Client the key was stored for
+        service: Provider the key was stored for
     
     Returns:
-        Decrypted plaintext or None if decryption fails
+        Decrypted plaintext or None if decryption fails (including a
+        client_id/service that doesn't match the one it was encrypted for)
     """
     if not ciphertext:
         return None
     
+    associated_data = _associated_data(client_id, service)
+    cache_key = (ciphertext, associated_data)
+    entry = _secret_cache.get(cache_key)
+    if entry is not None and time.monotonic() - entry[1] < settings.ENCRYPTION_SECRET_CACHE_TTL_SECONDS:
+        _secret_cache.move_to_end(cache_key)
+        return entry[0]
+    
     # Check if it's plaintext (development mode)
     # In production, all keys should be encrypted
-    if not ciphertext.startswith('AQICA'):  # KMS ciphertext typically starts with this
+    is_envelope = ciphertext.startswith(ENVELOPE_PREFIX)
+    if not is_envelope and not ciphertext.startswith('AQICA'):  # KMS ciphertext typically starts with this
         logger.warning("API key appears to be plaintext (development mode)")
         return ciphertext
     
     # If KMS is not configured, return as-is (development mode)
-    if not settings.AWS_ACCESS_KEY_ID or not settings.AWS_REGION:
+    if not settings.AWS_REGION:
         return ciphertext
     
     kms_client = get_kms_client()
@@ -109,23 +270,30 @@ def decrypt_api_key(ciphertext: str, key_id: Optional[str] = None) -> Optional[s
         return None
     
     try:
-        import base64
-        ciphertext_blob = base64.b64decode(ciphertext)
-        
-        # Use default key ID from environment or parameter
-        encryption_key_id = key_id or settings.AWS_REGION  # You should set KMS_KEY_ID in settings
-        
-        response = kms_client.decrypt(
-            CiphertextBlob=ciphertext_blob,
-            KeyId=encryption_key_id,
-        )
-        
-        return response['Plaintext'].decode('utf-8')
+        if is_envelope:
+            blob = base64.b64decode(ciphertext[len(ENVELOPE_PREFIX):])
+            (key_length,) = struct.unpack(">H", blob[:2])
+            encrypted_key = blob[2:2 + key_length]
+            nonce = blob[2 + key_length:2 + key_length + NONCE_SIZE]
+            
+            aesgcm = await _get_data_key_cipher(encrypted_key)
+            plaintext = aesgcm.decrypt(nonce, blob[2 + key_length + NONCE_SIZE:], associated_data).decode("utf-8")
+        else:
+            response = await _kms_call(
+                "decrypt",
+                CiphertextBlob=base64.b64decode(ciphertext),
+            )
+            plaintext = response['Plaintext'].decode('utf-8')
         
-    except ClientError as e:
+        _cache_secret(cache_key, plaintext)
+        return plaintext
+    
+    except (ClientError, BotoCoreError) as e:
         logger.error(f"AWS KMS decryption error: {e}")
         return None
+    except InvalidTag:
+        logger.error("API key ciphertext failed authentication")
+        return None
     except Exception as e:
         logger.error(f"Decryption error: {e}")
         return None
-
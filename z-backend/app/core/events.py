@@ -1,23 +1,37 @@
 """
 EventBridge Event Publishing Service
 """
+import asyncio
 import json
 import logging
+import time
 import boto3
-from typing import Dict, Any, Optional
+from collections import deque
+from typing import Dict, Any, Optional, List, Deque
 from datetime import datetime
 from app.core.config import settings
+from app.core.metrics import AWS_REQUEST_DURATION
+from app.core.tracing import CLIENT, PRODUCER, trace_span
 
 logger = logging.getLogger(__name__)
 
+# PutEvents limits
+MAX_BATCH_ENTRIES = 10
+MAX_BATCH_BYTES = 256 * 1024
+
 _eventbridge_client = None
 
+# Buffered entries awaiting publication: (entry, size in bytes, attempts so far)
+_buffer: Deque[tuple[Dict[str, Any], int, int]] = deque()
+_flush_event: Optional[asyncio.Event] = None
+_flusher_task: Optional[asyncio.Task] = None
+
 
 def get_eventbridge_client():
     """Get or create EventBridge client"""
     global _eventbridge_client
     
-    if _eventbridge_client is None:
+    if _eventbridge_client is None and settings.EVENTBRIDGE_ENABLED:
         try:
             _eventbridge_client = boto3.client(
                 "events",
@@ -32,21 +46,32 @@ def get_eventbridge_client():
     return _eventbridge_client
 
 
+def _entry_size(entry: Dict[str, Any]) -> int:
+    """Size of a PutEvents entry as EventBridge counts it"""
+    size = 14  # Time
+    for field in ("Source", "DetailType", "Detail"):
+        size += len(entry[field].encode("utf-8"))
+    return size
+
+
 async def publish_event(
     event_type: str,
     event_data: Dict[str, Any],
-    source: str = "trudy-backend",
+    source: Optional[str] = None,
 ) -> bool:
     """
     Publish event to EventBridge
     
+    Events are buffered and sent in PutEvents batches by a background
+    flusher (see start_event_publisher), so this only enqueues.
+    
     Args:
         event_type: Event type (e.g., "voice.training.completed")
         event_data: Event payload
-        source: Event source (default: "trudy-backend")
+        source: Event source (default: settings.EVENTBRIDGE_SOURCE)
     
     Returns:
-        True if published successfully, False otherwise
+        True if the event was queued, False otherwise
     """
     client = get_eventbridge_client()
     
@@ -58,31 +83,151 @@ async def publish_event(
         )
         return False
     
-    try:
-        # Create EventBridge event
-        event = {
-            "Source": source,
-            "DetailType": event_type,
-            "Detail": json.dumps(event_data),
-            "Time": datetime.utcnow(),
-        }
+    entry = {
+        "Source": source or settings.EVENTBRIDGE_SOURCE,
+        "DetailType": event_type,
+        "Detail": json.dumps(event_data, default=str),
+        "Time": datetime.utcnow(),
+    }
+    size = _entry_size(entry)
+    if size > MAX_BATCH_BYTES:
+        logger.error(f"Event {event_type} exceeds the EventBridge entry size limit ({size} bytes)")
+        return False
+    
+    with trace_span(
+        f"{event_type} publish",
+        PRODUCER,
+        {"messaging.system": "eventbridge", "messaging.source": entry["Source"], "messaging.event_type": event_type},
+    ):
+        if _flusher_task is None:
+            # Publisher not running (e.g. scripts): send right away
+            return not await _send_batch([(entry, size, 0)])
         
-        # Publish to default event bus
-        response = client.put_events(Entries=[event])
+        if len(_buffer) >= settings.EVENTBRIDGE_BUFFER_SIZE:
+            dropped, _, _ = _buffer.popleft()
+            logger.error(f"Event buffer full, dropped event {dropped['DetailType']}")
         
-        if response.get("FailedEntryCount", 0) > 0:
-            logger.error(f"Failed to publish event {event_type}: {response.get('Entries', [])}")
-            return False
+        _buffer.append((entry, size, 0))
+        if len(_buffer) >= MAX_BATCH_ENTRIES:
+            _flush_event.set()
         
-        logger.info(
-            f"Published event: {event_type}",
-            extra={"event_type": event_type, "event_id": response.get("Entries", [{}])[0].get("EventId")},
-        )
         return True
+
+
+def _take_batch() -> List[tuple[Dict[str, Any], int, int]]:
+    """Pop up to MAX_BATCH_ENTRIES / MAX_BATCH_BYTES worth of entries from the buffer"""
+    batch = []
+    batch_bytes = 0
+    while _buffer and len(batch) < MAX_BATCH_ENTRIES:
+        size = _buffer[0][1]
+        if batch_bytes + size > MAX_BATCH_BYTES:
+            break
+        batch.append(_buffer.popleft())
+        batch_bytes += size
+    return batch
+
+
+async def _send_batch(batch: List[tuple[Dict[str, Any], int, int]]) -> List[tuple[Dict[str, Any], int, int]]:
+    """
+    Send one PutEvents batch
+    
+    Returns:
+        Entries that failed and should be retried (attempt count incremented)
+    """
+    client = get_eventbridge_client()
+    entries = [entry for entry, _, _ in batch]
+    
+    with trace_span(
+        "EventBridge.PutEvents",
+        CLIENT,
+        {
+            "rpc.system": "aws-api",
+            "rpc.service": "EventBridge",
+            "rpc.method": "PutEvents",
+            "messaging.batch.message_count": len(entries),
+        },
+    ) as span:
+        start = time.perf_counter()
+        try:
+            response = await asyncio.to_thread(client.put_events, Entries=entries)
+        except Exception as e:
+            AWS_REQUEST_DURATION.observe(time.perf_counter() - start, "eventbridge", "put_events", "error")
+            if span is not None:
+                span.record_exception(e)
+            logger.error(f"Error publishing {len(entries)} events: {e}")
+            failed = batch
+        else:
+            AWS_REQUEST_DURATION.observe(time.perf_counter() - start, "eventbridge", "put_events", "ok")
+            # Result entries are positional; failed ones carry an ErrorCode
+            failed = [
+                item
+                for item, result in zip(batch, response.get("Entries", []))
+                if result.get("ErrorCode")
+            ]
+            if failed:
+                if span is not None:
+                    span.set_status("error", f"{len(failed)} entries failed")
+                logger.warning(
+                    f"Failed to publish {len(failed)}/{len(entries)} events",
+                    extra={"errors": [r for r in response.get("Entries", []) if r.get("ErrorCode")]},
+                )
+    
+    retry = []
+    for entry, size, attempts in failed:
+        if attempts + 1 >= settings.EVENTBRIDGE_MAX_ATTEMPTS:
+            logger.error(f"Dropping event {entry['DetailType']} after {attempts + 1} attempts")
+        else:
+            retry.append((entry, size, attempts + 1))
+    return retry
+
+
+async def _flush() -> None:
+    """Send everything currently buffered; failed entries go back to the front of the buffer"""
+    retry = []
+    while _buffer:
+        retry.extend(await _send_batch(_take_batch()))
+    _buffer.extendleft(reversed(retry))
+
+
+async def _flusher() -> None:
+    while True:
+        try:
+            await asyncio.wait_for(_flush_event.wait(), timeout=settings.EVENTBRIDGE_FLUSH_INTERVAL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+        _flush_event.clear()
         
-    except Exception as e:
-        logger.error(f"Error publishing event {event_type}: {e}")
-        return False
+        try:
+            await _flush()
+        except Exception:
+            logger.exception("Event flush failed")
+
+
+async def start_event_publisher() -> None:
+    """Start the background event flusher (called on startup)"""
+    global _flush_event, _flusher_task
+    
+    if _flusher_task is None and get_eventbridge_client():
+        _flush_event = asyncio.Event()
+        _flusher_task = asyncio.create_task(_flusher())
+
+
+async def stop_event_publisher() -> None:
+    """Stop the flusher and drain buffered events (called on shutdown)"""
+    global _flusher_task
+    
+    if _flusher_task is None:
+        return
+    
+    _flusher_task.cancel()
+    await asyncio.gather(_flusher_task, return_exceptions=True)
+    _flusher_task = None
+    
+    # Failed entries are re-queued until they run out of attempts
+    while _buffer:
+        await _flush()
+    
+    logger.info("Event publisher drained")
 
 
 # Convenience functions for common event types
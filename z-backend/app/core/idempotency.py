@@ -1,14 +1,20 @@
 """
 Idempotency Key Checking
 """
+import asyncio
 import hashlib
 import json
 import logging
-from typing import Optional, Dict, Any
-from datetime import datetime, timedelta
+import time
+from collections import OrderedDict
+from typing import Optional, Dict, Any, Tuple
+from datetime import datetime, timedelta, timezone
 from fastapi import Request, Header
+from fastapi.encoders import jsonable_encoder
 from app.core.database import DatabaseService, DatabaseAdminService
+from app.core.exceptions import ConflictError
 from app.core.config import settings
+from app.core.metrics import IDEMPOTENCY_REQUESTS
 
 logger = logging.getLogger(__name__)
 
@@ -47,58 +53,171 @@ def calculate_request_hash(request: Request, body: Any = None) -> str:
     return hashlib.sha256(hash_input.encode('utf-8')).hexdigest()
 
 
+def get_request_hash(request: Request, body: Any = None) -> str:
+    """Request hash, computed once per request and memoized on request.state"""
+    request_hash = getattr(request.state, "idempotency_request_hash", None)
+    if request_hash is None:
+        request_hash = calculate_request_hash(request, body)
+        request.state.idempotency_request_hash = request_hash
+    return request_hash
+
+
+# Hot tier: recently completed keys -> (response, expires_at)
+_completed_cache: "OrderedDict[Tuple[str, str, str], Tuple[Dict[str, Any], float]]" = OrderedDict()
+
+# Reservations held by this process; local duplicates wait on these instead of polling
+_in_flight: Dict[Tuple[str, str, str], asyncio.Future] = {}
+
+
+def _cache_get(cache_key: Tuple[str, str, str]) -> Optional[Dict[str, Any]]:
+    entry = _completed_cache.get(cache_key)
+    if entry is None:
+        return None
+    
+    cached, expires_at = entry
+    if time.time() >= expires_at:
+        del _completed_cache[cache_key]
+        return None
+    
+    _completed_cache.move_to_end(cache_key)
+    return cached
+
+
+def _cache_put(cache_key: Tuple[str, str, str], cached: Dict[str, Any], expires_at: float) -> None:
+    _completed_cache[cache_key] = (cached, expires_at)
+    _completed_cache.move_to_end(cache_key)
+    while len(_completed_cache) > settings.IDEMPOTENCY_CACHE_MAX_SIZE:
+        _completed_cache.popitem(last=False)
+
+
+async def _wait_for_completion(
+    admin_db: DatabaseAdminService,
+    cache_key: Tuple[str, str, str],
+) -> Optional[Dict[str, Any]]:
+    """Wait for the request holding a reservation to complete and return its response"""
+    deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT_SECONDS
+    
+    future = _in_flight.get(cache_key)
+    if future is not None:
+        # Reserved by this process
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), timeout=settings.IDEMPOTENCY_WAIT_SECONDS)
+        except asyncio.TimeoutError:
+            return None
+    
+    # Reserved by another worker: poll with backoff
+    client_id, idempotency_key, request_hash = cache_key
+    delay = 0.05
+    while time.monotonic() < deadline:
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, 1.0)
+        
+        cached = _cache_get(cache_key)
+        if cached:
+            return cached
+        
+        row = await admin_db.select_one(
+            "idempotency_keys",
+            {
+                "client_id": client_id,
+                "key": idempotency_key,
+                "request_hash": request_hash,
+            },
+        )
+        if not row:
+            # Reservation released (the first request failed)
+            return None
+        if row.get("status") == "completed":
+            return {
+                "response_body": row["response_body"],
+                "status_code": row["status_code"],
+            }
+    
+    return None
+
+
 async def check_idempotency_key(
     client_id: str,
     idempotency_key: str,
     request: Request,
     body: Any = None,
 ) -> Optional[Dict[str, Any]]:
-    """Check if idempotency key exists and return cached response"""
+    """
+    Check an idempotency key, reserving it if unseen
+    
+    Returns the stored response for a completed key. For an unseen key the
+    key is atomically reserved for this request and None is returned; the
+    caller then executes and calls store_idempotency_response. A duplicate
+    that arrives while the key is reserved waits for the first request's
+    response (ConflictError if it does not complete in time).
+    """
     if not idempotency_key:
         return None
     
-    # Calculate request hash
-    request_hash = calculate_request_hash(request, body)
+    request_hash = get_request_hash(request, body)
+    cache_key = (client_id, idempotency_key, request_hash)
+    
+    # Hot tier
+    cached = _cache_get(cache_key)
+    if cached:
+        IDEMPOTENCY_REQUESTS.inc("replayed")
+        logger.info(
+            f"Idempotency key hit: {idempotency_key} for client {client_id}",
+            extra={"request_hash": request_hash},
+        )
+        return cached
     
-    # Check database
     admin_db = DatabaseAdminService()
+    ttl_at = datetime.utcnow() + timedelta(days=settings.IDEMPOTENCY_TTL_DAYS)
     
     try:
-        # Query idempotency_keys table
-        existing = admin_db.select_one(
-            "idempotency_keys",
+        rows = await admin_db.rpc(
+            "reserve_idempotency_key",
             {
-                "client_id": client_id,
-                "key": idempotency_key,
-                "request_hash": request_hash,
+                "p_client_id": client_id,
+                "p_key": idempotency_key,
+                "p_request_hash": request_hash,
+                "p_ttl_at": ttl_at.isoformat(),
+                "p_stale_seconds": settings.IDEMPOTENCY_RESERVATION_TIMEOUT_SECONDS,
             },
         )
-        
-        if existing:
-            # Check if expired
-            ttl_at = datetime.fromisoformat(existing["ttl_at"].replace("Z", "+00:00"))
-            if datetime.now(ttl_at.tzinfo) > ttl_at:
-                # Expired, delete it
-                admin_db.delete("idempotency_keys", {"id": existing["id"]})
-                return None
-            
-            # Return cached response
-            logger.info(
-                f"Idempotency key hit: {idempotency_key} for client {client_id}",
-                extra={"request_hash": request_hash},
-            )
-            
-            return {
-                "response_body": existing["response_body"],
-                "status_code": existing["status_code"],
-            }
-        
-        return None
-        
     except Exception as e:
+        IDEMPOTENCY_REQUESTS.inc("error")
         logger.error(f"Error checking idempotency key: {e}")
         # On error, continue without idempotency (fail open)
         return None
+    
+    result = rows[0] if rows else None
+    if not result or result["reserved"]:
+        # This request owns the key
+        IDEMPOTENCY_REQUESTS.inc("new")
+        _in_flight[cache_key] = asyncio.get_running_loop().create_future()
+        request.state.idempotency_reservation = cache_key
+        return None
+    
+    if result["status"] == "completed":
+        cached = {
+            "response_body": result["response_body"],
+            "status_code": result["status_code"],
+        }
+        _cache_put(cache_key, cached, ttl_at.replace(tzinfo=timezone.utc).timestamp())
+        IDEMPOTENCY_REQUESTS.inc("replayed")
+        logger.info(
+            f"Idempotency key hit: {idempotency_key} for client {client_id}",
+            extra={"request_hash": request_hash},
+        )
+        return cached
+    
+    # A concurrent duplicate is executing: reuse its result
+    cached = await _wait_for_completion(admin_db, cache_key)
+    if cached is None:
+        IDEMPOTENCY_REQUESTS.inc("conflict")
+        raise ConflictError(
+            "A request with this idempotency key is already in progress",
+            {"idempotency_key": idempotency_key},
+        )
+    IDEMPOTENCY_REQUESTS.inc("waited")
+    return cached
 
 
 async def store_idempotency_response(
@@ -109,26 +228,36 @@ async def store_idempotency_response(
     response_body: Dict[str, Any],
     status_code: int,
 ) -> None:
-    """Store idempotency key response for future use"""
+    """Complete a reserved idempotency key with the response"""
     if not idempotency_key:
         return
     
-    # Calculate request hash
-    request_hash = calculate_request_hash(request, body)
+    request_hash = get_request_hash(request, body)
+    cache_key = (client_id, idempotency_key, request_hash)
     
-    # Calculate TTL
+    # Responses may contain datetimes/models; store their JSON form
+    response_body = jsonable_encoder(response_body)
+    cached = {"response_body": response_body, "status_code": status_code}
     ttl_at = datetime.utcnow() + timedelta(days=settings.IDEMPOTENCY_TTL_DAYS)
     
-    # Store in database
+    _cache_put(cache_key, cached, ttl_at.replace(tzinfo=timezone.utc).timestamp())
+    request.state.idempotency_reservation = None
+    future = _in_flight.pop(cache_key, None)
+    if future is not None and not future.done():
+        future.set_result(cached)
+    
     admin_db = DatabaseAdminService()
     
     try:
-        admin_db.insert(
+        await admin_db.update(
             "idempotency_keys",
             {
                 "client_id": client_id,
                 "key": idempotency_key,
                 "request_hash": request_hash,
+            },
+            {
+                "status": "completed",
                 "response_body": response_body,
                 "status_code": status_code,
                 "ttl_at": ttl_at.isoformat(),
@@ -139,13 +268,40 @@ async def store_idempotency_response(
             f"Stored idempotency key: {idempotency_key} for client {client_id}",
             extra={"request_hash": request_hash, "status_code": status_code},
         )
-        
+    
+    except Exception as e:
+        logger.error(f"Error storing idempotency key: {e}")
+
+
+async def release_idempotency_reservation(state: Dict[str, Any]) -> None:
+    """
+    Release a reservation whose request finished without storing a response
+    
+    Called by the request pipeline after every request, so a failed request
+    does not block retries with the same key until the reservation goes stale.
+    """
+    cache_key = state.get("idempotency_reservation")
+    if not cache_key:
+        return
+    
+    state["idempotency_reservation"] = None
+    future = _in_flight.pop(cache_key, None)
+    if future is not None and not future.done():
+        future.set_result(None)
+    
+    client_id, idempotency_key, request_hash = cache_key
+    try:
+        await DatabaseAdminService().delete(
+            "idempotency_keys",
+            {
+                "client_id": client_id,
+                "key": idempotency_key,
+                "request_hash": request_hash,
+                "status": "in_progress",
+            },
+        )
     except Exception as e:
-        # Handle unique constraint violation (key already exists)
-        if "unique" in str(e).lower() or "duplicate" in str(e).lower():
-            logger.warning(f"Idempotency key already exists: {idempotency_key}")
-        else:
-            logger.error(f"Error storing idempotency key: {e}")
+        logger.error(f"Error releasing idempotency key {idempotency_key}: {e}")
 
 
 async def get_idempotency_key_header(
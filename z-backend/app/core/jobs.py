@@ -0,0 +1,186 @@
+"""
+Background Jobs
+"""
+import asyncio
+import logging
+from typing import Dict, Any, List, Optional, Set, Callable, Awaitable
+from datetime import datetime, timedelta, timezone
+from app.core.config import settings
+from app.core.database import DatabaseAdminService
+
+logger = logging.getLogger(__name__)
+
+ProgressReporter = Callable[[Dict[str, Any]], Awaitable[None]]
+JobFunc = Callable[[ProgressReporter], Awaitable[Dict[str, Any]]]
+
+# Strong references to running job tasks (the event loop only keeps weak ones)
+_running_jobs: Set[asyncio.Task] = set()
+
+
+async def create_job(
+    client_id: str,
+    job_type: str,
+    resource_id: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Create a queued background job record"""
+    db = DatabaseAdminService()
+    return await db.insert(
+        "background_jobs",
+        {
+            "client_id": client_id,
+            "type": job_type,
+            "resource_id": resource_id,
+            "status": "queued",
+            "progress": {},
+            "heartbeat_at": datetime.utcnow().isoformat(),
+        },
+    )
+
+
+def _parse_timestamp(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value)
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def _is_alive(job: Dict[str, Any]) -> bool:
+    heartbeat = _parse_timestamp(job.get("heartbeat_at") or job.get("updated_at"))
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=settings.JOB_LEASE_SECONDS)
+    return heartbeat is not None and heartbeat > cutoff
+
+
+async def _unfinished_jobs(job_type: str, resource_id: str) -> List[Dict[str, Any]]:
+    db = DatabaseAdminService()
+    return await db.select(
+        "background_jobs",
+        {"type": job_type, "resource_id": resource_id, "status": ["queued", "running"]},
+    )
+
+
+async def find_live_job(job_type: str, resource_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Queued or running job of a type for a resource, if its worker is alive
+    
+    Running jobs heartbeat every JOB_HEARTBEAT_SECONDS; one whose heartbeat is
+    older than JOB_LEASE_SECONDS belongs to a worker that crashed, so the
+    resource can be taken over by a new job.
+    """
+    for job in await _unfinished_jobs(job_type, resource_id):
+        if _is_alive(job):
+            return job
+    return None
+
+
+async def fail_dead_jobs(job_type: str, resource_id: str) -> int:
+    """
+    Mark a resource's queued or running jobs without a fresh heartbeat failed
+    
+    Each job is updated conditionally on its status, so when two requests
+    race to take over the same dead job only one of them counts it.
+    
+    Returns:
+        Number of dead jobs this call marked failed
+    """
+    db = DatabaseAdminService()
+    failed = 0
+    for job in await _unfinished_jobs(job_type, resource_id):
+        if _is_alive(job):
+            continue
+        updated = await db.update(
+            "background_jobs",
+            {"id": job["id"], "status": job["status"]},
+            {
+                "status": "failed",
+                "error_message": "Worker stopped responding",
+                "completed_at": datetime.utcnow().isoformat(),
+            },
+        )
+        if updated:
+            failed += 1
+    return failed
+
+
+def start_job(job: Dict[str, Any], func: JobFunc) -> None:
+    """
+    Run a job in the background of this worker
+    
+    Args:
+        job: Job record returned by create_job
+        func: Coroutine function receiving a progress reporter and returning
+            the final progress dict
+    """
+    task = asyncio.create_task(_run_job(job, func))
+    _running_jobs.add(task)
+    task.add_done_callback(_running_jobs.discard)
+
+
+async def _heartbeat(db: DatabaseAdminService, job_id: str) -> None:
+    """Refresh a running job's heartbeat so find_live_job sees it as alive"""
+    while True:
+        await asyncio.sleep(settings.JOB_HEARTBEAT_SECONDS)
+        try:
+            await db.update("background_jobs", {"id": job_id}, {"heartbeat_at": datetime.utcnow().isoformat()})
+        except Exception as e:
+            logger.warning(f"Failed to record heartbeat for job {job_id}: {e}")
+
+
+async def _run_job(job: Dict[str, Any], func: JobFunc) -> None:
+    """Execute a job and record its status transitions"""
+    db = DatabaseAdminService()
+    job_id = job["id"]
+    
+    async def report_progress(progress: Dict[str, Any]) -> None:
+        await db.update("background_jobs", {"id": job_id}, {"progress": progress})
+    
+    heartbeat = asyncio.create_task(_heartbeat(db, job_id))
+    try:
+        now = datetime.utcnow().isoformat()
+        await db.update(
+            "background_jobs",
+            {"id": job_id},
+            {"status": "running", "started_at": now, "heartbeat_at": now},
+        )
+        
+        progress = await func(report_progress)
+        
+        await db.update(
+            "background_jobs",
+            {"id": job_id},
+            {
+                "status": "completed",
+                "progress": progress,
+                "completed_at": datetime.utcnow().isoformat(),
+            },
+        )
+        logger.info(f"Background job completed: {job['type']} {job_id}", extra={"progress": progress})
+    
+    except asyncio.CancelledError:
+        await db.update(
+            "background_jobs",
+            {"id": job_id},
+            {"status": "failed", "error_message": "Interrupted by shutdown"},
+        )
+        raise
+    except Exception as e:
+        logger.exception(f"Background job failed: {job['type']} {job_id}")
+        await db.update(
+            "background_jobs",
+            {"id": job_id},
+            {
+                "status": "failed",
+                "error_message": str(e)[:500],
+                "completed_at": datetime.utcnow().isoformat(),
+            },
+        )
+    finally:
+        heartbeat.cancel()
+
+
+async def shutdown_jobs() -> None:
+    """Cancel running jobs and wait for them to record their status (called on shutdown)"""
+    for task in list(_running_jobs):
+        task.cancel()
+    
+    if _running_jobs:
+        await asyncio.gather(*_running_jobs, return_exceptions=True)
@@ -1,66 +1,156 @@
 """
 Logging Configuration
 """
+import atexit
 import logging
+import logging.handlers
+import queue
 import sys
 import json
-from typing import Any, Dict
+from contextvars import ContextVar, Token
+from typing import Any, Dict, Optional
 from app.core.config import settings
 
+try:
+    import orjson
+except ImportError:  # Optional: faster JSON encoding
+    orjson = None
 
-def setup_logging():
-    """Setup structured logging with enhanced formatting"""
-    class StructuredFormatter(logging.Formatter):
-        """Custom formatter that includes request_id and client_id in logs"""
+# Per-request log fields (request_id, trace_id, client_id, user_id), added to every record
+# logged while handling the request. Bound by RequestPipelineMiddleware.
+_request_context: ContextVar[Optional[Dict[str, Any]]] = ContextVar("request_context", default=None)
+
+# Fields passed via extra= that are copied into structured output
+EXTRA_FIELDS = ("request_id", "client_id", "user_id", "endpoint", "method", "status_code", "duration_ms")
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def bind_request_context(**fields: Any) -> Token:
+    """Start a log context for the current request; pass the token to reset_request_context"""
+    return _request_context.set({k: v for k, v in fields.items() if v is not None})
+
+
+def update_request_context(**fields: Any) -> None:
+    """Add fields (e.g. client_id once authenticated) to the current request's log context"""
+    context = _request_context.get()
+    if context is not None:
+        context.update((k, v) for k, v in fields.items() if v is not None)
+
+
+def get_request_context() -> Dict[str, Any]:
+    return _request_context.get() or {}
+
+
+def reset_request_context(token: Token) -> None:
+    _request_context.reset(token)
+
+
+def _dumps(data: Dict[str, Any]) -> str:
+    if orjson is not None:
+        return orjson.dumps(data, default=str).decode("utf-8")
+    return json.dumps(data, default=str)
+
+
+class StructuredFormatter(logging.Formatter):
+    """Custom formatter that includes request_id and client_id in logs"""
+    
+    def format(self, record: logging.LogRecord) -> str:
+        log_data: Dict[str, Any] = {
+            "timestamp": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        
+        # Request context captured when the record was queued, then explicit extras
+        context = record.__dict__.get("context")
+        if context:
+            log_data.update(context)
+        for field in EXTRA_FIELDS:
+            value = record.__dict__.get(field)
+            if value is not None:
+                log_data[field] = value
+        
+        # Add exception info if present (pre-rendered by ContextQueueHandler)
+        if record.exc_text:
+            log_data["exception"] = record.exc_text
+        elif record.exc_info:
+            log_data["exception"] = self.formatException(record.exc_info)
         
-        def format(self, record: logging.LogRecord) -> str:
-            # Get default format
-            log_data: Dict[str, Any] = {
-                "timestamp": self.formatTime(record),
-                "level": record.levelname,
-                "logger": record.name,
-                "message": record.getMessage(),
-            }
-            
-            # Add extra context if available
-            if hasattr(record, "request_id"):
-                log_data["request_id"] = record.request_id
-            if hasattr(record, "client_id"):
-                log_data["client_id"] = record.client_id
-            if hasattr(record, "user_id"):
-                log_data["user_id"] = record.user_id
-            if hasattr(record, "endpoint"):
-                log_data["endpoint"] = record.endpoint
-            if hasattr(record, "method"):
-                log_data["method"] = record.method
-            if hasattr(record, "status_code"):
-                log_data["status_code"] = record.status_code
-            if hasattr(record, "duration_ms"):
-                log_data["duration_ms"] = record.duration_ms
-            
-            # Add exception info if present
-            if record.exc_info:
-                log_data["exception"] = self.formatException(record.exc_info)
-            
-            # Format as JSON for structured logging
-            if settings.ENVIRONMENT == "prod":
-                return json.dumps(log_data)
-            else:
-                # Human-readable format for dev
-                parts = [f"[{log_data['timestamp']}]", f"{log_data['level']}", f"{log_data['logger']}"]
-                if "request_id" in log_data:
-                    parts.append(f"req_id={log_data['request_id']}")
-                if "client_id" in log_data:
-                    parts.append(f"client={log_data['client_id']}")
-                parts.append(log_data["message"])
-                return " - ".join(parts)
+        # Format as JSON for structured logging
+        if settings.ENVIRONMENT == "prod":
+            return _dumps(log_data)
+        
+        # Human-readable format for dev
+        parts = [f"[{log_data['timestamp']}]", log_data["level"], log_data["logger"]]
+        if "request_id" in log_data:
+            parts.append(f"req_id={log_data['request_id']}")
+        if "client_id" in log_data:
+            parts.append(f"client={log_data['client_id']}")
+        parts.append(log_data["message"])
+        line = " - ".join(parts)
+        if "exception" in log_data:
+            line += "\n" + log_data["exception"]
+        return line
+
+
+class ContextQueueHandler(logging.handlers.QueueHandler):
+    """
+    Queue handler that does the minimum on the calling thread
+    
+    Captures the request context and renders the message (and traceback,
+    if any) so the record can be formatted on the listener thread. When
+    the queue is full the record is dropped rather than blocking the
+    caller on a slow stdout.
+    """
+    
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+    
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        context = _request_context.get()
+        record.context = dict(context) if context else None
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+    
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            if self.dropped % 1000 == 1:
+                sys.stderr.write(f"Log queue full; dropped {self.dropped} records so far\n")
+
+
+def setup_logging():
+    """Setup structured logging
+    
+    Records are put on a bounded queue by the calling thread and written to
+    stdout by a QueueListener thread, so slow output never adds latency to
+    requests.
+    """
+    global _listener
+    
+    if _listener is not None:
+        _listener.stop()
     
     handler = logging.StreamHandler(sys.stdout)
     handler.setFormatter(StructuredFormatter())
     
+    log_queue: queue.Queue = queue.Queue(maxsize=settings.LOG_QUEUE_SIZE)
+    _listener = logging.handlers.QueueListener(log_queue, handler, respect_handler_level=True)
+    _listener.start()
+    
     logging.basicConfig(
         level=getattr(logging, settings.LOG_LEVEL.upper()),
-        handlers=[handler],
+        handlers=[ContextQueueHandler(log_queue)],
         force=True,
     )
     
@@ -70,3 +160,14 @@ def setup_logging():
     logging.getLogger("boto3").setLevel(logging.WARNING)
     logging.getLogger("botocore").setLevel(logging.WARNING)
 
+
+def stop_logging() -> None:
+    """Flush queued records and stop the listener thread (registered to run at exit)"""
+    global _listener
+    
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(stop_logging)
@@ -0,0 +1,219 @@
+"""
+Prometheus Metrics
+"""
+import asyncio
+import logging
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from typing import Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Latency buckets (seconds) shared by every histogram
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Starlette appends "; charset=utf-8"
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class _Metric(ABC):
+    """
+    Base for metrics keyed by a tuple of label values
+    
+    Recording is a dict lookup and an in-place add with no locks: metrics
+    are recorded from the event loop thread, where nothing can interleave.
+    """
+    
+    type_name = ""
+    
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        _registry.append(self)
+    
+    def _label_str(self, labelvalues: Tuple[str, ...], extra: str = "") -> str:
+        pairs = [
+            f'{name}="{_escape(str(value))}"'
+            for name, value in zip(self.labelnames, labelvalues)
+        ]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+    
+    @abstractmethod
+    def _samples(self) -> List[str]:
+        """Exposition lines for every label combination"""
+    
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    type_name = "counter"
+    
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+    
+    def inc(self, *labelvalues: str, amount: float = 1) -> None:
+        self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+    
+    def _samples(self) -> List[str]:
+        return [f"{self.name}{self._label_str(k)} {v}" for k, v in list(self._values.items())]
+
+
+class Gauge(_Metric):
+    type_name = "gauge"
+    
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+    
+    def set(self, value: float, *labelvalues: str) -> None:
+        self._values[labelvalues] = value
+    
+    def inc(self, *labelvalues: str, amount: float = 1) -> None:
+        self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+    
+    def dec(self, *labelvalues: str, amount: float = 1) -> None:
+        self._values[labelvalues] = self._values.get(labelvalues, 0) - amount
+    
+    def _samples(self) -> List[str]:
+        return [f"{self.name}{self._label_str(k)} {v}" for k, v in list(self._values.items())]
+
+
+class Histogram(_Metric):
+    type_name = "histogram"
+    
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+        # label values -> [per-bucket counts (+Inf last), sum]
+        self._values: Dict[Tuple[str, ...], list] = {}
+    
+    def observe(self, value: float, *labelvalues: str) -> None:
+        entry = self._values.get(labelvalues)
+        if entry is None:
+            entry = self._values[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0]
+        # Non-cumulative counts; render() accumulates
+        entry[0][bisect_left(self.buckets, value)] += 1
+        entry[1] += value
+    
+    def _samples(self) -> List[str]:
+        lines = []
+        for labelvalues, (counts, total) in list(self._values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{self.name}_bucket{self._label_str(labelvalues, 'le=' + chr(34) + le + chr(34))} {cumulative}")
+            lines.append(f"{self.name}_sum{self._label_str(labelvalues)} {total}")
+            lines.append(f"{self.name}_count{self._label_str(labelvalues)} {cumulative}")
+        return lines
+
+
+_registry: List[_Metric] = []
+
+
+def render_metrics() -> str:
+    """All metrics in the Prometheus text exposition format"""
+    return "\n".join(metric.render() for metric in _registry) + "\n"
+
+
+# HTTP
+HTTP_REQUESTS_IN_FLIGHT = Gauge("http_requests_in_flight", "HTTP requests currently being handled")
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template and status",
+    ["method", "route", "status"],
+)
+
+# Database (Supabase PostgREST)
+DB_QUERY_DURATION = Histogram(
+    "db_query_duration_seconds",
+    "Database request latency by table and operation",
+    ["table", "operation"],
+)
+DB_QUERY_ERRORS = Counter("db_query_errors_total", "Failed database requests", ["table", "operation"])
+
+# Ultravox
+ULTRAVOX_REQUEST_DURATION = Histogram(
+    "ultravox_request_duration_seconds",
+    "Ultravox API request latency per attempt",
+    ["endpoint", "status"],
+)
+ULTRAVOX_RETRIES = Counter("ultravox_retries_total", "Ultravox API requests retried", ["endpoint"])
+
+# AWS (S3, KMS, EventBridge)
+AWS_REQUEST_DURATION = Histogram(
+    "aws_request_duration_seconds",
+    "AWS API call latency",
+    ["service", "operation", "status"],
+)
+
+# Webhook delivery (egress)
+WEBHOOK_DELIVERY_DURATION = Histogram(
+    "webhook_delivery_duration_seconds",
+    "Customer webhook delivery latency",
+    ["result"],
+)
+
+# Idempotency
+IDEMPOTENCY_REQUESTS = Counter(
+    "idempotency_requests_total",
+    "Idempotency key checks by outcome (new, replayed, waited, conflict, error)",
+    ["result"],
+)
+
+# Event loop
+EVENT_LOOP_LAG = Gauge("event_loop_lag_seconds", "Delay of the event loop in running a scheduled callback")
+EVENT_LOOP_LAG_HISTOGRAM = Histogram(
+    "event_loop_lag_distribution_seconds",
+    "Distribution of event loop scheduling delay",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0),
+)
+
+_lag_task: Optional[asyncio.Task] = None
+
+LAG_SAMPLE_INTERVAL = 0.5
+
+
+async def _monitor_event_loop_lag() -> None:
+    while True:
+        expected = time.perf_counter() + LAG_SAMPLE_INTERVAL
+        await asyncio.sleep(LAG_SAMPLE_INTERVAL)
+        lag = max(0.0, time.perf_counter() - expected)
+        EVENT_LOOP_LAG.set(lag)
+        EVENT_LOOP_LAG_HISTOGRAM.observe(lag)
+
+
+async def start_metrics() -> None:
+    """Start the event loop lag monitor (called on startup)"""
+    global _lag_task
+    
+    if _lag_task is None:
+        _lag_task = asyncio.create_task(_monitor_event_loop_lag())
+
+
+async def stop_metrics() -> None:
+    """Stop the event loop lag monitor (called on shutdown)"""
+    global _lag_task
+    
+    if _lag_task is not None:
+        _lag_task.cancel()
+        await asyncio.gather(_lag_task, return_exceptions=True)
+        _lag_task = None
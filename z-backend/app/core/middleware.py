@@ -3,69 +3,120 @@ Custom Middleware
 """
 import uuid
 import time
-from fastapi import Request, Response
-from starlette.middleware.base import BaseHTTPMiddleware
+import random
 import logging
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.core.config import settings
+from app.core.logging import bind_request_context, get_request_context, reset_request_context
+from app.core.rate_limiting import check_rate_limit
+from app.core.idempotency import release_idempotency_reservation
+from app.core.metrics import HTTP_REQUEST_DURATION, HTTP_REQUESTS_IN_FLIGHT
+from app.core.tracing import SERVER, TRACEPARENT_HEADER, extract_incoming_context, trace_span
 
 logger = logging.getLogger(__name__)
 
 
-class RequestIDMiddleware(BaseHTTPMiddleware):
-    """Add request ID to each request"""
+class RequestPipelineMiddleware:
+    """
+    Request ID, tracing, rate limiting, access logging, request metrics and
+    idempotency-reservation cleanup in a single pure-ASGI layer
     
-    async def dispatch(self, request: Request, call_next):
-        request_id = str(uuid.uuid4())
-        request.state.request_id = request_id
-        
-        # Add request ID to response headers
-        response: Response = await call_next(request)
-        response.headers["X-Request-ID"] = request_id
-        
-        return response
-
-
-class LoggingMiddleware(BaseHTTPMiddleware):
-    """Log all requests with enhanced context"""
+    Unlike BaseHTTPMiddleware this does not wrap the app in a separate task
+    or buffer the response stream, so streaming responses pass straight
+    through.
+    """
     
-    async def dispatch(self, request: Request, call_next):
-        start_time = time.time()
-        request_id = getattr(request.state, "request_id", None)
-        
-        # Extract client_id and user_id from JWT if available (set by auth middleware)
-        client_id = getattr(request.state, "client_id", None)
-        user_id = getattr(request.state, "user_id", None)
-        
-        # Log request
-        logger.info(
-            f"Request: {request.method} {request.url.path}",
-            extra={
-                "request_id": request_id,
-                "client_id": client_id,
-                "user_id": user_id,
-                "method": request.method,
-                "endpoint": request.url.path,
-                "client_ip": request.client.host if request.client else None,
-            },
-        )
-        
-        response = await call_next(request)
+    def __init__(self, app: ASGIApp):
+        self.app = app
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
         
-        # Calculate duration
-        duration_ms = int((time.time() - start_time) * 1000)
+        start_time = time.perf_counter()
+        method = scope["method"]
+        path = scope["path"]
+        client_ip = scope["client"][0] if scope.get("client") else None
         
-        # Log response
-        logger.info(
-            f"Response: {request.method} {request.url.path} - {response.status_code}",
-            extra={
-                "request_id": request_id,
-                "client_id": client_id,
-                "user_id": user_id,
-                "method": request.method,
-                "endpoint": request.url.path,
-                "status_code": response.status_code,
-                "duration_ms": duration_ms,
-            },
-        )
+        # Request ID (available to handlers as request.state.request_id)
+        request_id = str(uuid.uuid4())
+        state = scope.setdefault("state", {})
+        state["request_id"] = request_id
+        headers = Headers(scope=scope)
         
-        return response
-
+        # Server span for the request, continuing the caller's trace if it sent a traceparent
+        with trace_span(
+            f"{method} {path}",
+            SERVER,
+            {"http.request.method": method, "url.path": path, "request_id": request_id},
+            parent=extract_incoming_context(headers.get(TRACEPARENT_HEADER)),
+        ) as span:
+            trace_id = span.context.trace_id if span is not None else None
+            state["trace_id"] = trace_id
+            
+            # Every record logged while handling the request carries its request_id (and trace_id)
+            context_token = bind_request_context(request_id=request_id, trace_id=trace_id)
+            
+            status_code = 500
+            
+            async def send_wrapper(message: Message) -> None:
+                nonlocal status_code
+                if message["type"] == "http.response.start":
+                    status_code = message["status"]
+                    # Add request ID to response headers
+                    message.setdefault("headers", [])
+                    message["headers"] = list(message["headers"]) + [(b"x-request-id", request_id.encode("latin-1"))]
+                await send(message)
+            
+            HTTP_REQUESTS_IN_FLIGHT.inc()
+            try:
+                rate_limited = await check_rate_limit(method, path, headers, client_ip)
+                if rate_limited is not None:
+                    await rate_limited(scope, receive, send_wrapper)
+                else:
+                    await self.app(scope, receive, send_wrapper)
+            finally:
+                # Free an idempotency key reserved by a request that failed before completing it
+                await release_idempotency_reservation(state)
+                
+                # Calculate duration
+                duration = time.perf_counter() - start_time
+                duration_ms = int(duration * 1000)
+                
+                # Label by route template (set by the router) to keep cardinality bounded
+                HTTP_REQUESTS_IN_FLIGHT.dec()
+                route = scope.get("route")
+                route_path = route.path if route is not None else "unmatched"
+                HTTP_REQUEST_DURATION.observe(duration, method, route_path, str(status_code))
+                
+                if span is not None:
+                    if route is not None:
+                        span.name = f"{method} {route_path}"
+                        span.set_attribute("http.route", route_path)
+                    span.set_attribute("http.response.status_code", status_code)
+                    context = get_request_context()
+                    span.set_attribute("client_id", context.get("client_id"))
+                    span.set_attribute("user_id", context.get("user_id"))
+                    if status_code >= 500:
+                        span.set_status("error")
+                
+                # One access log line per request; fast successful requests are sampled
+                if (
+                    status_code >= 400
+                    or duration_ms >= settings.LOG_ACCESS_SLOW_MS
+                    or random.random() < settings.LOG_ACCESS_SAMPLE_RATE
+                ):
+                    # client_id/user_id are added to the context by get_current_user
+                    logger.info(
+                        f"{method} {path} - {status_code}",
+                        extra={
+                            "method": method,
+                            "endpoint": path,
+                            "status_code": status_code,
+                            "duration_ms": duration_ms,
+                        },
+                    )
+                
+                reset_request_context(context_token)
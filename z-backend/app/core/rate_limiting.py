@@ -1,90 +1,233 @@
 """
-Rate Limiting Middleware
+Rate Limiting
 """
+import math
 import time
 import logging
-from typing import Dict, Optional
-from collections import defaultdict
+from abc import ABC, abstractmethod
+from typing import Dict, Optional, Tuple
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from fastapi import Request, HTTPException, status
-from starlette.middleware.base import BaseHTTPMiddleware
+from fastapi.responses import JSONResponse
+from app.core.auth import get_cached_claims
 from app.core.config import settings
 
 logger = logging.getLogger(__name__)
 
-# In-memory rate limit store (use Redis in production)
-_rate_limit_store: Dict[str, Dict[str, any]] = defaultdict(dict)
+RATE_LIMIT_PERIOD_SECONDS = 60
 
+# Paths that are never rate limited
+EXEMPT_PATHS = ("/health", "/metrics", "/docs", "/redoc", "/openapi.json")
 
-class RateLimitMiddleware(BaseHTTPMiddleware):
-    """Rate limiting middleware"""
+
+def get_route_class(method: str, path: str) -> str:
+    """Classify a request for quota purposes: webhooks, write or read"""
+    if path.startswith("/api/v1/webhooks/") and method == "POST":
+        return "webhooks"
+    if method in ("POST", "PUT", "PATCH", "DELETE"):
+        return "write"
+    return "read"
+
+
+def get_route_class_limit(route_class: str) -> int:
+    """Requests per minute allowed for a route class"""
+    if route_class == "webhooks":
+        return settings.RATE_LIMIT_WEBHOOK_PER_MINUTE
+    if route_class == "write":
+        return settings.RATE_LIMIT_WRITE_PER_MINUTE
+    return settings.RATE_LIMIT_PER_MINUTE
+
+
+class RateLimitStore(ABC):
+    """Rate limit counter backend
     
-    async def dispatch(self, request: Request, call_next):
-        # Skip rate limiting if disabled
-        if not settings.RATE_LIMIT_ENABLED:
-            return await call_next(request)
-        
-        # Get client identifier (from JWT or IP)
-        client_id = self._get_client_id(request)
-        
-        if client_id:
-            # Check rate limit
-            if not self._check_rate_limit(client_id, request.url.path):
-                logger.warning(f"Rate limit exceeded for client: {client_id}")
-                raise HTTPException(
-                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-                    detail={
-                        "error": {
-                            "code": "rate_limit_exceeded",
-                            "message": "Rate limit exceeded",
-                            "details": {
-                                "limit": settings.RATE_LIMIT_PER_MINUTE,
-                                "reset_at": (datetime.utcnow() + timedelta(minutes=1)).isoformat(),
-                            },
-                        },
-                    },
-                )
-        
-        response = await call_next(request)
-        return response
-    
-    def _get_client_id(self, request: Request) -> Optional[str]:
-        """Get client identifier from request"""
-        # Try to get from JWT token (if available in request state)
-        if hasattr(request.state, "client_id"):
-            return request.state.client_id
-        
-        # Fallback to IP address
-        client_host = request.client.host if request.client else "unknown"
-        return client_host
-    
-    def _check_rate_limit(self, client_id: str, path: str) -> bool:
-        """Check if request is within rate limit"""
-        # Get current window
-        current_window = int(time.time() / 60)  # 1-minute windows
+    Implementations use GCRA (generic cell rate algorithm): a single
+    "theoretical arrival time" per key gives smooth sliding-window limiting
+    with O(1) state and work per request.
+    """
+    
+    @abstractmethod
+    async def hit(self, key: str, limit: int, period: float) -> Tuple[bool, float]:
+        """
+        Record a request against a key
         
-        # Get or create client rate limit data
-        client_data = _rate_limit_store[client_id]
+        Returns:
+            (allowed, seconds until the next request would be allowed)
+        """
+    
+    async def close(self) -> None:
+        pass
+
+
+class MemoryRateLimitStore(RateLimitStore):
+    """Per-process GCRA store bounded by an LRU (limits apply per worker)"""
+    
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        self._tat: "OrderedDict[str, float]" = OrderedDict()
+    
+    async def hit(self, key: str, limit: int, period: float) -> Tuple[bool, float]:
+        now = time.monotonic()
+        interval = period / limit
+        tolerance = period - interval
         
-        # Clean old windows (older than 1 minute)
-        current_time = time.time()
-        client_data = {
-            k: v for k, v in client_data.items()
-            if current_time - v.get("timestamp", 0) < 60
-        }
-        _rate_limit_store[client_id] = client_data
+        tat = max(self._tat.get(key, now), now)
+        allow_at = tat - tolerance
+        if now < allow_at:
+            self._tat.move_to_end(key)
+            return False, allow_at - now
         
-        # Get or create window data
-        window_key = f"{current_window}:{path}"
-        if window_key not in client_data:
-            client_data[window_key] = {"count": 0, "timestamp": current_time}
+        self._tat[key] = tat + interval
+        self._tat.move_to_end(key)
         
-        # Increment count
-        client_data[window_key]["count"] += 1
+        # Keys that went quiet fall off the cold end
+        while len(self._tat) > self.max_keys:
+            self._tat.popitem(last=False)
         
-        # Check limit
-        limit = settings.RATE_LIMIT_PER_MINUTE
-        return client_data[window_key]["count"] <= limit
+        return True, 0.0
+
+
+# GCRA in one round trip; uses the Redis clock so all workers agree on "now"
+GCRA_LUA = """
+local period = tonumber(ARGV[1])
+local limit = tonumber(ARGV[2])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local interval = period / limit
+local tolerance = period - interval
+local tat = tonumber(redis.call('GET', KEYS[1])) or now
+if tat < now then
+    tat = now
+end
+local allow_at = tat - tolerance
+if now < allow_at then
+    return {0, math.ceil(allow_at - now)}
+end
+local new_tat = tat + interval
+redis.call('SET', KEYS[1], tostring(new_tat), 'PX', math.ceil(new_tat - now))
+return {1, 0}
+"""
+
+
+class RedisRateLimitStore(RateLimitStore):
+    """GCRA store shared by all workers via Redis (atomic Lua script)
+    
+    Args:
+        url: Redis URL (ignored if client is given)
+        client: Existing redis.asyncio-compatible client (e.g. fakeredis)
+    """
+    
+    def __init__(self, url: Optional[str] = None, client=None):
+        if client is None:
+            import redis.asyncio as redis
+            client = redis.from_url(url)
+        self._client = client
+        self._script = client.register_script(GCRA_LUA)
+    
+    async def hit(self, key: str, limit: int, period: float) -> Tuple[bool, float]:
+        allowed, retry_after_ms = await self._script(
+            keys=[f"ratelimit:{key}"],
+            args=[int(period * 1000), limit],
+        )
+        return bool(allowed), int(retry_after_ms) / 1000
+    
+    async def close(self) -> None:
+        await self._client.aclose()
+
+
+_rate_limit_store: Optional[RateLimitStore] = None
+
+
+def get_rate_limit_store() -> RateLimitStore:
+    """Get or create the configured rate limit store"""
+    global _rate_limit_store
+    
+    if _rate_limit_store is None:
+        if settings.RATE_LIMIT_BACKEND == "redis":
+            _rate_limit_store = RedisRateLimitStore(settings.RATE_LIMIT_REDIS_URL)
+        else:
+            _rate_limit_store = MemoryRateLimitStore(settings.RATE_LIMIT_MAX_KEYS)
+    
+    return _rate_limit_store
+
+
+async def close_rate_limit_store() -> None:
+    """Close the rate limit store (called on shutdown)"""
+    global _rate_limit_store
+    
+    if _rate_limit_store is not None:
+        await _rate_limit_store.close()
+        _rate_limit_store = None
+
+
+def get_rate_limit_identity(headers: Dict[str, str], client_host: Optional[str]) -> str:
+    """
+    Get rate limit identity: the verified client or user, IP otherwise
+    
+    Only tokens that verify_jwt has already accepted (and cached) count as an
+    identity. Headers alone are never trusted, and a token that was never
+    verified is limited by IP, so rotating made-up tokens or x-client-id
+    values does not buy a fresh quota.
+    """
+    authorization = headers.get("authorization", "")
+    if authorization.startswith("Bearer "):
+        claims = get_cached_claims(authorization[7:])
+        if claims is not None:
+            client_claim = claims.get("client_id") or claims.get("https://trudy.ai/client_id")
+            if client_claim:
+                return f"client:{str(client_claim).lower()}"
+            if claims.get("sub"):
+                return f"user:{claims['sub']}"
+    
+    # Fallback to IP address
+    return f"ip:{client_host or 'unknown'}"
+
+
+async def check_rate_limit(
+    method: str,
+    path: str,
+    headers: Dict[str, str],
+    client_host: Optional[str],
+) -> Optional[JSONResponse]:
+    """
+    Apply the rate limit for a request
+    
+    Returns:
+        A 429 response if the request is over its quota, None otherwise
+    """
+    # Skip rate limiting if disabled
+    if not settings.RATE_LIMIT_ENABLED or path in EXEMPT_PATHS:
+        return None
+    
+    route_class = get_route_class(method, path)
+    limit = get_route_class_limit(route_class)
+    key = f"{get_rate_limit_identity(headers, client_host)}:{route_class}"
+    
+    try:
+        allowed, retry_after = await get_rate_limit_store().hit(key, limit, RATE_LIMIT_PERIOD_SECONDS)
+    except Exception as e:
+        logger.error(f"Rate limit store error: {e}")
+        return None  # Fail open
+    
+    if allowed:
+        return None
+    
+    logger.warning(f"Rate limit exceeded for {key}")
+    return JSONResponse(
+        status_code=429,
+        headers={"Retry-After": str(math.ceil(retry_after))},
+        content={
+            "error": {
+                "code": "rate_limit_exceeded",
+                "message": "Rate limit exceeded",
+                "details": {
+                    "limit": limit,
+                    "route_class": route_class,
+                    "reset_at": (datetime.utcnow() + timedelta(seconds=retry_after)).isoformat(),
+                },
+            },
+        },
+    )
 
 
 # Per-client quota checking (for database-backed quotas)
@@ -103,7 +246,7 @@ async def check_client_quota(client_id: str, operation_type: str) -> bool:
     
     try:
         db = DatabaseAdminService()
-        client = db.select_one("clients", {"id": client_id})
+        client = await db.select_one("clients", {"id": client_id})
         
         if not client:
             return False
@@ -111,7 +254,7 @@ async def check_client_quota(client_id: str, operation_type: str) -> bool:
         # Check quotas (implement based on your quota structure)
         # For now, return True (quotas not fully implemented)
         return True
-        
+    
     except Exception as e:
         logger.error(f"Error checking client quota: {e}")
         return True  # Fail open
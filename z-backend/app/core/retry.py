@@ -4,6 +4,9 @@ Retry Logic with Exponential Backoff
 import asyncio
 import random
 import logging
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
 from typing import Callable, TypeVar, Optional
 import httpx
 
@@ -12,6 +15,23 @@ logger = logging.getLogger(__name__)
 T = TypeVar("T")
 
 
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header (delta-seconds or HTTP date) into seconds"""
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max((retry_at - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+
 async def retry_with_backoff(
     func: Callable[[], T],
     max_attempts: int = 5,
@@ -59,6 +79,12 @@ async def retry_with_backoff(
             jitter = delay * random.uniform(0, 0.3)
             final_delay = delay + jitter
             
+            # Never retry sooner than the server asked us to
+            if isinstance(e, httpx.HTTPStatusError):
+                retry_after = parse_retry_after(e.response.headers.get("Retry-After"))
+                if retry_after is not None:
+                    final_delay = max(final_delay, retry_after + jitter)
+            
             logger.warning(
                 f"Retry attempt {attempt}/{max_attempts} after {final_delay:.2f}s",
                 extra={"attempt": attempt, "delay": final_delay},
@@ -74,3 +100,144 @@ async def retry_with_backoff(
     if last_exception:
         raise last_exception
 
+
+
+class AdaptiveRateLimiter:
+    """
+    Token bucket shared by all callers of a provider
+    
+    The refill rate adapts to the provider (AIMD): a 429 halves the rate and
+    pauses all callers for the Retry-After period; each success raises the
+    rate again by a small step up to the configured maximum.
+    """
+    
+    def __init__(
+        self,
+        rate: float,
+        burst: int,
+        min_rate: float = 0.5,
+        increase_step: float = 0.1,
+    ):
+        self.max_rate = rate
+        self.rate = rate
+        self.min_rate = min(min_rate, rate)
+        self.increase_step = increase_step
+        self.capacity = float(burst)
+        self._tokens = float(burst)
+        self._updated_at = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = asyncio.Lock()
+    
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+    
+    async def acquire(self) -> None:
+        """Wait until a request may be sent"""
+        # The lock queues waiters in FIFO order so paced callers don't stampede
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._blocked_until:
+                    await asyncio.sleep(self._blocked_until - now)
+                    continue
+                
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+    
+    def on_success(self) -> None:
+        """Additive increase after a successful request"""
+        if self.rate < self.max_rate:
+            self.rate = min(self.max_rate, self.rate + self.increase_step)
+    
+    def on_throttled(self, retry_after: Optional[float] = None) -> None:
+        """Multiplicative decrease after a 429, pausing callers for retry_after seconds"""
+        now = time.monotonic()
+        self._refill(now)
+        self.rate = max(self.min_rate, self.rate / 2)
+        self._tokens = 0.0
+        if retry_after:
+            self._blocked_until = max(self._blocked_until, now + retry_after)
+        
+        logger.warning(
+            f"Provider throttled, rate limited to {self.rate:.2f} req/s",
+            extra={"rate": self.rate, "retry_after": retry_after},
+        )
+
+
+class CircuitOpenError(Exception):
+    """Raised when a circuit breaker rejects a request"""
+    
+    def __init__(self, name: str, retry_after: float):
+        self.name = name
+        self.retry_after = retry_after
+        super().__init__(f"Circuit '{name}' is open; retry in {retry_after:.1f}s")
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker (closed -> open -> half-open)
+    
+    After failure_threshold consecutive failures the circuit opens and
+    requests fail fast with CircuitOpenError. Once recovery_timeout has
+    elapsed a single probe request is let through; its outcome closes the
+    circuit or re-opens it for another recovery_timeout. Callers report any
+    response that reached the service (including 429/4xx) as a success.
+    """
+    
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+    
+    def __init__(self, name: str, failure_threshold: int = 5, recovery_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._probe_started_at = 0.0
+    
+    def before_request(self) -> None:
+        """Raise CircuitOpenError if the request should not be attempted"""
+        if self.state == self.CLOSED:
+            return
+        
+        now = time.monotonic()
+        remaining = self._opened_at + self.recovery_timeout - now
+        if self.state == self.OPEN and remaining <= 0:
+            self.state = self.HALF_OPEN
+        
+        # A probe that never reported back (e.g. cancelled) is replaced after recovery_timeout
+        if self.state == self.HALF_OPEN and (
+            not self._probe_in_flight or now - self._probe_started_at > self.recovery_timeout
+        ):
+            self._probe_in_flight = True
+            self._probe_started_at = now
+            return
+        
+        raise CircuitOpenError(self.name, max(remaining, 1.0))
+    
+    def record_success(self) -> None:
+        if self.state != self.CLOSED:
+            logger.info(f"Circuit '{self.name}' closed")
+        self.state = self.CLOSED
+        self._failures = 0
+        self._probe_in_flight = False
+    
+    def record_failure(self) -> None:
+        self._failures += 1
+        if self.state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                logger.warning(
+                    f"Circuit '{self.name}' opened after {self._failures} failures",
+                    extra={"circuit": self.name, "failures": self._failures},
+                )
+            self.state = self.OPEN
+            self._opened_at = time.monotonic()
+            self._probe_in_flight = False
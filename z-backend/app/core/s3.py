@@ -1,19 +1,35 @@
 """
 S3 Utilities for Presigned URLs
 """
+import asyncio
+import hashlib
+import hmac
+import re
+import time
 import boto3
 from botocore.config import Config
 from botocore.exceptions import ClientError
-from typing import Optional
+from typing import Optional, Dict, List, Tuple
 import logging
-from datetime import timedelta
+from datetime import datetime, timedelta
+from urllib.parse import quote
 from app.core.config import settings
+from app.core.metrics import AWS_REQUEST_DURATION
+from app.core.tracing import CLIENT, INTERNAL, trace_span
 
 logger = logging.getLogger(__name__)
 
 # S3 client
 _s3_client = None
 
+# SigV4 signing key for the current (date, region, access key); derived once per day
+_signing_key: Optional[Tuple[Tuple[str, str, str], bytes]] = None
+
+PRESIGN_METHODS = {"get_object": "GET", "put_object": "PUT"}
+
+# Buckets that boto3 addresses virtual-host style (no dots, DNS-compatible)
+VIRTUAL_HOST_BUCKET_PATTERN = re.compile(r"^[a-z0-9][a-z0-9-]{1,61}[a-z0-9]$")
+
 
 def get_s3_client():
     """Get or create S3 client"""
@@ -23,6 +39,8 @@ def get_s3_client():
         config = Config(
             region_name=settings.AWS_REGION,
             retries={"max_attempts": 3, "mode": "standard"},
+            # Enough pooled connections for check_objects_exist's concurrent HEADs
+            max_pool_connections=settings.S3_MAX_CONCURRENT_REQUESTS,
         )
         
         _s3_client = boto3.client(
@@ -35,6 +53,75 @@ def get_s3_client():
     return _s3_client
 
 
+def _get_signing_key(date_stamp: str) -> bytes:
+    """SigV4 signing key for S3 in the configured region, cached for the day"""
+    global _signing_key
+    
+    cache_key = (date_stamp, settings.AWS_REGION, settings.AWS_ACCESS_KEY_ID)
+    if _signing_key is not None and _signing_key[0] == cache_key:
+        return _signing_key[1]
+    
+    key = ("AWS4" + settings.AWS_SECRET_ACCESS_KEY).encode("utf-8")
+    for part in (date_stamp, settings.AWS_REGION, "s3", "aws4_request"):
+        key = hmac.new(key, part.encode("utf-8"), hashlib.sha256).digest()
+    
+    _signing_key = (cache_key, key)
+    return key
+
+
+def presign_url_v4(
+    bucket: str,
+    key: str,
+    method: str = "GET",
+    expires_in: int = 3600,
+    content_type: Optional[str] = None,
+    now: Optional[datetime] = None,
+) -> str:
+    """
+    Build a SigV4 query-string presigned URL without going through botocore
+    
+    Produces the same URL as boto3's generate_presigned_url for a
+    virtual-hosted bucket, using only hashing and a signing key cached per
+    day. Requires static credentials (AWS_ACCESS_KEY_ID/AWS_SECRET_ACCESS_KEY).
+    
+    The output is byte-for-byte identical to boto3 only in regions where
+    boto3 itself presigns with SigV4. With botocore 1.32.7 and no explicit
+    signature_version, boto3 emits SigV2 URLs (AWSAccessKeyId/Signature/
+    Expires) for us-east-1 (the default AWS_REGION), us-west-1, us-west-2,
+    eu-west-1, ap-northeast-1, ap-southeast-1, ap-southeast-2 and sa-east-1.
+    In those regions this returns a SigV4 URL instead, which S3 accepts
+    just the same.
+    """
+    now = now or datetime.utcnow()
+    amz_date = now.strftime("%Y%m%dT%H%M%SZ")
+    date_stamp = amz_date[:8]
+    
+    host = f"{bucket}.s3.amazonaws.com"
+    path = "/" + quote(key, safe="/~")
+    scope = f"{date_stamp}/{settings.AWS_REGION}/s3/aws4_request"
+    signed_headers = "content-type;host" if content_type else "host"
+    
+    # Already in canonical (sorted) order
+    query = (
+        "X-Amz-Algorithm=AWS4-HMAC-SHA256"
+        f"&X-Amz-Credential={quote(f'{settings.AWS_ACCESS_KEY_ID}/{scope}', safe='-_.~')}"
+        f"&X-Amz-Date={amz_date}"
+        f"&X-Amz-Expires={expires_in}"
+        f"&X-Amz-SignedHeaders={quote(signed_headers, safe='-_.~')}"
+    )
+    canonical_headers = (f"content-type:{content_type}\n" if content_type else "") + f"host:{host}\n"
+    canonical_request = "\n".join([method, path, query, canonical_headers, signed_headers, "UNSIGNED-PAYLOAD"])
+    string_to_sign = "\n".join([
+        "AWS4-HMAC-SHA256",
+        amz_date,
+        scope,
+        hashlib.sha256(canonical_request.encode("utf-8")).hexdigest(),
+    ])
+    signature = hmac.new(_get_signing_key(date_stamp), string_to_sign.encode("utf-8"), hashlib.sha256).hexdigest()
+    
+    return f"https://{host}{path}?{query}&X-Amz-Signature={signature}"
+
+
 def generate_presigned_url(
     bucket: str,
     key: str,
@@ -55,27 +142,47 @@ def generate_presigned_url(
     Returns:
         Presigned URL
     """
-    try:
-        s3_client = get_s3_client()
-        
-        params = {
-            "Bucket": bucket,
-            "Key": key,
-        }
+    with trace_span(
+        "S3.presign",
+        INTERNAL,
+        {"aws.s3.bucket": bucket, "aws.s3.key": key, "aws.s3.operation": operation},
+    ):
+        # Fast path: sign locally (static credentials, virtual-hosted bucket)
+        if (
+            operation in PRESIGN_METHODS
+            and settings.AWS_ACCESS_KEY_ID
+            and settings.AWS_SECRET_ACCESS_KEY
+            and VIRTUAL_HOST_BUCKET_PATTERN.match(bucket)
+        ):
+            return presign_url_v4(
+                bucket,
+                key,
+                method=PRESIGN_METHODS[operation],
+                expires_in=expires_in,
+                content_type=content_type if operation == "put_object" else None,
+            )
         
-        if operation == "put_object" and content_type:
-            params["ContentType"] = content_type
-        
-        url = s3_client.generate_presigned_url(
-            operation,
-            Params=params,
-            ExpiresIn=expires_in,
-        )
-        
-        return url
-    except ClientError as e:
-        logger.error(f"Error generating presigned URL: {e}")
-        raise
+        try:
+            s3_client = get_s3_client()
+            
+            params = {
+                "Bucket": bucket,
+                "Key": key,
+            }
+            
+            if operation == "put_object" and content_type:
+                params["ContentType"] = content_type
+            
+            url = s3_client.generate_presigned_url(
+                operation,
+                Params=params,
+                ExpiresIn=expires_in,
+            )
+            
+            return url
+        except ClientError as e:
+            logger.error(f"Error generating presigned URL: {e}")
+            raise
 
 
 def check_object_exists(bucket: str, key: str) -> bool:
@@ -90,6 +197,47 @@ def check_object_exists(bucket: str, key: str) -> bool:
         raise
 
 
+async def check_objects_exist(bucket: str, keys: List[str]) -> Dict[str, bool]:
+    """
+    Check several S3 objects concurrently
+    
+    HEAD requests run in worker threads (boto3 is blocking), at most
+    S3_MAX_CONCURRENT_REQUESTS at a time.
+    
+    Returns:
+        Existence by key
+    """
+    semaphore = asyncio.Semaphore(settings.S3_MAX_CONCURRENT_REQUESTS)
+    
+    async def check(key: str) -> bool:
+        async with semaphore:
+            with trace_span(
+                "S3.HeadObject",
+                CLIENT,
+                {
+                    "rpc.system": "aws-api",
+                    "rpc.service": "S3",
+                    "rpc.method": "HeadObject",
+                    "aws.s3.bucket": bucket,
+                    "aws.s3.key": key,
+                },
+            ) as span:
+                start = time.perf_counter()
+                status = "error"
+                try:
+                    exists = await asyncio.to_thread(check_object_exists, bucket, key)
+                    status = "ok"
+                    if span is not None:
+                        span.set_attribute("aws.s3.exists", exists)
+                    return exists
+                finally:
+                    AWS_REQUEST_DURATION.observe(time.perf_counter() - start, "s3", "head_object", status)
+    
+    unique_keys = list(dict.fromkeys(keys))
+    results = await asyncio.gather(*(check(key) for key in unique_keys))
+    return dict(zip(unique_keys, results))
+
+
 def upload_file_to_s3(
     bucket: str,
     key: str,
@@ -0,0 +1,426 @@
+"""
+Distributed Tracing
+"""
+import asyncio
+import json
+import logging
+import random
+import re
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Deque, Dict, Iterator, List, NamedTuple, Optional
+import httpx
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# W3C Trace Context header
+TRACEPARENT_HEADER = "traceparent"
+TRACEPARENT_PATTERN = re.compile(r"^[0-9a-f]{2}-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+# Span kinds (OpenTelemetry SpanKind), with their OTLP enum values
+INTERNAL = "internal"
+SERVER = "server"
+CLIENT = "client"
+PRODUCER = "producer"
+CONSUMER = "consumer"
+OTLP_SPAN_KINDS = {INTERNAL: 1, SERVER: 2, CLIENT: 3, PRODUCER: 4, CONSUMER: 5}
+OTLP_STATUS_CODES = {"unset": 0, "ok": 1, "error": 2}
+
+
+class SpanContext(NamedTuple):
+    trace_id: str
+    span_id: str
+    sampled: bool
+
+
+def parse_traceparent(value: Optional[str]) -> Optional[SpanContext]:
+    """Parse a W3C traceparent header; None if absent or malformed"""
+    if not value:
+        return None
+    match = TRACEPARENT_PATTERN.match(value.strip().lower())
+    if not match:
+        return None
+    trace_id, span_id, flags = match.groups()
+    if trace_id == "0" * 32 or span_id == "0" * 16:
+        return None
+    return SpanContext(trace_id, span_id, bool(int(flags, 16) & 1))
+
+
+def extract_incoming_context(value: Optional[str]) -> Optional[SpanContext]:
+    """
+    Parent context for a request from its incoming traceparent header
+    
+    The caller's trace id is always continued. Its sampled flag is only
+    honored with TRACING_TRUST_INCOMING_SAMPLING; otherwise the request is
+    sampled at TRACING_SAMPLE_RATE like a new trace, so a client can't
+    force every request it sends to be recorded and exported.
+    """
+    context = parse_traceparent(value)
+    if context is None or settings.TRACING_TRUST_INCOMING_SAMPLING:
+        return context
+    return context._replace(sampled=random.random() < settings.TRACING_SAMPLE_RATE)
+
+
+def _new_id(bits: int) -> str:
+    # Same generator as the OpenTelemetry SDK; cheaper than os.urandom per span
+    return f"{random.getrandbits(bits):0{bits // 4}x}"
+
+
+def format_traceparent(context: SpanContext) -> str:
+    return f"00-{context.trace_id}-{context.span_id}-{'01' if context.sampled else '00'}"
+
+
+class Span:
+    """
+    A timed operation within a trace
+    
+    Fields follow the OpenTelemetry data model so spans can be exported to
+    any OTLP-compatible backend. Sampled spans are queued for export when
+    they end.
+    """
+    
+    __slots__ = (
+        "name", "context", "parent_span_id", "kind", "attributes",
+        "start_time_ns", "end_time_ns", "status", "status_message",
+    )
+    
+    def __init__(
+        self,
+        name: str,
+        context: SpanContext,
+        parent_span_id: Optional[str] = None,
+        kind: str = INTERNAL,
+        attributes: Optional[Dict[str, Any]] = None,
+    ):
+        self.name = name
+        self.context = context
+        self.parent_span_id = parent_span_id
+        self.kind = kind
+        self.attributes: Dict[str, Any] = dict(attributes) if attributes else {}
+        self.start_time_ns = time.time_ns()
+        self.end_time_ns: Optional[int] = None
+        self.status = "unset"
+        self.status_message: Optional[str] = None
+    
+    @property
+    def traceparent(self) -> str:
+        return format_traceparent(self.context)
+    
+    def set_attribute(self, key: str, value: Any) -> None:
+        if value is not None:
+            self.attributes[key] = value
+    
+    def set_status(self, status: str, message: Optional[str] = None) -> None:
+        self.status = status
+        self.status_message = message
+    
+    def record_exception(self, exc: BaseException) -> None:
+        self.attributes["exception.type"] = type(exc).__name__
+        self.attributes["exception.message"] = str(exc)[:500]
+        self.set_status("error", type(exc).__name__)
+    
+    def end(self) -> None:
+        if self.end_time_ns is not None:
+            return
+        self.end_time_ns = time.time_ns()
+        if self.context.sampled:
+            _enqueue(self)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.context.trace_id,
+            "span_id": self.context.span_id,
+            "parent_span_id": self.parent_span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "start_time_unix_nano": self.start_time_ns,
+            "end_time_unix_nano": self.end_time_ns,
+            "attributes": self.attributes,
+            "status": {"code": self.status, "message": self.status_message},
+            "service": settings.TRACING_SERVICE_NAME,
+        }
+
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+def get_current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+def current_traceparent() -> Optional[str]:
+    """traceparent of the active span, for handing trace context to deferred work"""
+    span = _current_span.get()
+    return span.traceparent if span is not None else None
+
+
+def inject_trace_headers(headers: Optional[Dict[str, str]] = None) -> Optional[Dict[str, str]]:
+    """Add the active span's traceparent to outgoing request headers"""
+    span = _current_span.get()
+    if span is None:
+        return headers
+    headers = dict(headers) if headers else {}
+    headers[TRACEPARENT_HEADER] = span.traceparent
+    return headers
+
+
+def start_span(
+    name: str,
+    kind: str = INTERNAL,
+    attributes: Optional[Dict[str, Any]] = None,
+    parent: Optional[SpanContext] = None,
+) -> Optional[Span]:
+    """
+    Create a span (without making it active)
+    
+    The parent is the given context (e.g. from an incoming traceparent) or
+    else the active span. A span without either starts a new trace, which
+    is sampled at TRACING_SAMPLE_RATE. Returns None when tracing is disabled.
+    """
+    if not settings.TRACING_ENABLED:
+        return None
+    
+    if parent is None:
+        current = _current_span.get()
+        parent = current.context if current is not None else None
+    
+    if parent is None:
+        context = SpanContext(
+            _new_id(128),
+            _new_id(64),
+            random.random() < settings.TRACING_SAMPLE_RATE,
+        )
+        return Span(name, context, None, kind, attributes)
+    
+    context = SpanContext(parent.trace_id, _new_id(64), parent.sampled)
+    return Span(name, context, parent.span_id, kind, attributes)
+
+
+@contextmanager
+def trace_span(
+    name: str,
+    kind: str = INTERNAL,
+    attributes: Optional[Dict[str, Any]] = None,
+    parent: Optional[SpanContext] = None,
+) -> Iterator[Optional[Span]]:
+    """
+    Run a block inside a new active span
+    
+    Exceptions are recorded on the span and re-raised. Yields None when
+    tracing is disabled, so callers should guard attribute updates.
+    """
+    span = start_span(name, kind, attributes, parent)
+    if span is None:
+        yield None
+        return
+    
+    token = _current_span.set(span)
+    try:
+        yield span
+    except Exception as e:
+        span.record_exception(e)
+        raise
+    finally:
+        _current_span.reset(token)
+        span.end()
+
+
+# Exporters
+class SpanExporter(ABC):
+    """Destination for finished spans; export() receives them in batches"""
+    
+    @abstractmethod
+    async def export(self, spans: List[Span]) -> None:
+        """Send one batch of finished spans"""
+    
+    async def shutdown(self) -> None:
+        pass
+
+
+class InMemorySpanExporter(SpanExporter):
+    """Keeps exported spans in a list (tests and local debugging)"""
+    
+    def __init__(self):
+        self.spans: List[Span] = []
+    
+    async def export(self, spans: List[Span]) -> None:
+        self.spans.extend(spans)
+    
+    def clear(self) -> None:
+        self.spans.clear()
+
+
+class FileSpanExporter(SpanExporter):
+    """Appends spans to a JSON lines file"""
+    
+    def __init__(self, path: str):
+        self.path = path
+    
+    def _write(self, lines: List[str]) -> None:
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write("".join(lines))
+    
+    async def export(self, spans: List[Span]) -> None:
+        lines = [json.dumps(span.to_dict(), default=str) + "\n" for span in spans]
+        await asyncio.to_thread(self._write, lines)
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_span(span: Span) -> Dict[str, Any]:
+    otlp = {
+        "traceId": span.context.trace_id,
+        "spanId": span.context.span_id,
+        "name": span.name,
+        "kind": OTLP_SPAN_KINDS.get(span.kind, 1),
+        "startTimeUnixNano": str(span.start_time_ns),
+        "endTimeUnixNano": str(span.end_time_ns),
+        "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in span.attributes.items()],
+        "status": {"code": OTLP_STATUS_CODES[span.status]},
+    }
+    if span.parent_span_id:
+        otlp["parentSpanId"] = span.parent_span_id
+    if span.status_message:
+        otlp["status"]["message"] = span.status_message
+    return otlp
+
+
+class OTLPHttpSpanExporter(SpanExporter):
+    """Sends spans to an OpenTelemetry collector using OTLP/HTTP with JSON encoding"""
+    
+    def __init__(self, endpoint: str, timeout: float = 10.0):
+        self.url = endpoint.rstrip("/") + "/v1/traces"
+        self._client = httpx.AsyncClient(timeout=timeout)
+    
+    async def export(self, spans: List[Span]) -> None:
+        body = {
+            "resourceSpans": [{
+                "resource": {
+                    "attributes": [
+                        {"key": "service.name", "value": {"stringValue": settings.TRACING_SERVICE_NAME}},
+                        {"key": "deployment.environment", "value": {"stringValue": settings.ENVIRONMENT}},
+                    ],
+                },
+                "scopeSpans": [{
+                    "scope": {"name": "trudy-api"},
+                    "spans": [_otlp_span(span) for span in spans],
+                }],
+            }],
+        }
+        response = await self._client.post(self.url, json=body)
+        response.raise_for_status()
+    
+    async def shutdown(self) -> None:
+        await self._client.aclose()
+
+
+def _create_exporter() -> Optional[SpanExporter]:
+    exporter = settings.TRACING_EXPORTER.lower()
+    if exporter == "file":
+        return FileSpanExporter(settings.TRACING_FILE_PATH)
+    if exporter == "otlp":
+        return OTLPHttpSpanExporter(settings.TRACING_OTLP_ENDPOINT)
+    if exporter == "memory":
+        return InMemorySpanExporter()
+    if exporter != "none":
+        logger.warning(f"Unknown TRACING_EXPORTER '{settings.TRACING_EXPORTER}'; spans will not be exported")
+    return None
+
+
+# Finished spans awaiting export
+_buffer: Deque[Span] = deque()
+_dropped = 0
+_exporter: Optional[SpanExporter] = None
+_flush_event: Optional[asyncio.Event] = None
+_exporter_task: Optional[asyncio.Task] = None
+
+
+def _enqueue(span: Span) -> None:
+    global _dropped
+    
+    if len(_buffer) >= settings.TRACING_BUFFER_SIZE:
+        _dropped += 1
+        if _dropped % 1000 == 1:
+            logger.warning(f"Span buffer full; dropped {_dropped} spans so far")
+        return
+    
+    _buffer.append(span)
+    if len(_buffer) >= settings.TRACING_EXPORT_BATCH_SIZE and _flush_event is not None:
+        _flush_event.set()
+
+
+def set_span_exporter(exporter: Optional[SpanExporter]) -> None:
+    """Replace the exporter (e.g. with an InMemorySpanExporter in tests)"""
+    global _exporter
+    _exporter = exporter
+
+
+def get_span_exporter() -> Optional[SpanExporter]:
+    return _exporter
+
+
+async def flush_spans() -> None:
+    """Export everything currently buffered; a failed batch is dropped"""
+    while _buffer:
+        batch = [_buffer.popleft() for _ in range(min(len(_buffer), settings.TRACING_EXPORT_BATCH_SIZE))]
+        if _exporter is None:
+            continue
+        try:
+            await _exporter.export(batch)
+        except Exception as e:
+            logger.error(f"Failed to export {len(batch)} spans: {e}")
+
+
+async def _export_loop() -> None:
+    while True:
+        try:
+            await asyncio.wait_for(_flush_event.wait(), timeout=settings.TRACING_EXPORT_INTERVAL_MS / 1000)
+        except asyncio.TimeoutError:
+            pass
+        _flush_event.clear()
+        
+        try:
+            await flush_spans()
+        except Exception:
+            logger.exception("Span export failed")
+
+
+async def start_tracing() -> None:
+    """Create the configured exporter and start the background export task (called on startup)"""
+    global _exporter, _flush_event, _exporter_task
+    
+    if not settings.TRACING_ENABLED or _exporter_task is not None:
+        return
+    
+    if _exporter is None:
+        _exporter = _create_exporter()
+    _flush_event = asyncio.Event()
+    _exporter_task = asyncio.create_task(_export_loop())
+
+
+async def stop_tracing() -> None:
+    """Stop the export task, export remaining spans and shut the exporter down (called on shutdown)"""
+    global _exporter_task
+    
+    if _exporter_task is None:
+        return
+    
+    _exporter_task.cancel()
+    await asyncio.gather(_exporter_task, return_exceptions=True)
+    _exporter_task = None
+    
+    await flush_spans()
+    if _exporter is not None:
+        await _exporter.shutdown()
@@ -9,6 +9,7 @@ from typing import Dict, Any, Optional
 import logging
 import httpx
 from app.core.config import settings
+from app.core.tracing import CLIENT, inject_trace_headers, trace_span
 
 logger = logging.getLogger(__name__)
 
@@ -131,7 +132,7 @@ def verify_stripe_signature(
         
         # Constant-time comparison
         return hmac.compare_digest(sig, expected_sig)
-        
+    
     except Exception as e:
         logger.error(f"Stripe signature verification error: {e}")
         return False
@@ -142,33 +143,54 @@ async def deliver_webhook(
     payload: Dict[str, Any],
     secret: str,
     timeout: int = 10,
+    client: Optional[httpx.AsyncClient] = None,
 ) -> tuple[bool, Optional[int], Optional[str]]:
     """
     Deliver webhook to client endpoint
     
+    Args:
+        client: Shared HTTP client to send with (a one-off client is used if omitted)
+    
     Returns:
         (success, status_code, error_message)
     """
-    try:
-        signature, timestamp = generate_webhook_signature(payload, secret)
-        
-        headers = {
-            "Content-Type": "application/json",
-            "X-Trudy-Timestamp": timestamp,
-            "X-Trudy-Signature": signature,
-        }
-        
-        async with httpx.AsyncClient(timeout=timeout) as client:
-            response = await client.post(url, json=payload, headers=headers)
+    with trace_span("HTTP POST", CLIENT, {"http.request.method": "POST", "url.full": url}) as span:
+        try:
+            signature, timestamp = generate_webhook_signature(payload, secret)
+            
+            headers = {
+                "Content-Type": "application/json",
+                "X-Trudy-Timestamp": timestamp,
+                "X-Trudy-Signature": signature,
+            }
+            # Let the endpoint continue the trace
+            headers = inject_trace_headers(headers)
+            
+            # Send exactly the bytes that were signed
+            body = json.dumps(payload, sort_keys=True)
+            
+            if client is None:
+                async with httpx.AsyncClient(timeout=timeout) as one_off_client:
+                    response = await one_off_client.post(url, content=body, headers=headers)
+            else:
+                response = await client.post(url, content=body, headers=headers, timeout=timeout)
+            
+            if span is not None:
+                span.set_attribute("http.response.status_code", response.status_code)
             
             if 200 <= response.status_code < 300:
                 return True, response.status_code, None
             else:
+                if span is not None:
+                    span.set_status("error")
                 return False, response.status_code, response.text[:500]
-                
-    except httpx.TimeoutException:
-        return False, None, "Request timeout"
-    except Exception as e:
-        logger.error(f"Webhook delivery error: {e}")
-        return False, None, str(e)
-
+        
+        except httpx.TimeoutException as e:
+            if span is not None:
+                span.record_exception(e)
+            return False, None, "Request timeout"
+        except Exception as e:
+            if span is not None:
+                span.record_exception(e)
+            logger.error(f"Webhook delivery error: {e}")
+            return False, None, str(e)
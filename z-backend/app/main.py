@@ -3,14 +3,22 @@ Trudy Backend API - FastAPI Application
 """
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 import logging
 from contextlib import asynccontextmanager
 
 from app.core.config import settings
+from app.core.database import close_supabase_clients
+from app.core.jobs import shutdown_jobs
+from app.core.events import start_event_publisher, stop_event_publisher
+from app.core.audit import start_audit_writer, stop_audit_writer
+from app.core.metrics import CONTENT_TYPE, render_metrics, start_metrics, stop_metrics
+from app.core.tracing import start_tracing, stop_tracing
+from app.services.ultravox import ultravox_client
+from app.services.webhook_delivery import start_webhook_workers, stop_webhook_workers
 from app.core.logging import setup_logging
-from app.core.rate_limiting import RateLimitMiddleware
-from app.core.middleware import RequestIDMiddleware, LoggingMiddleware
+from app.core.rate_limiting import close_rate_limit_store
+from app.core.middleware import RequestPipelineMiddleware
 from app.api.v1 import api_router
 from app.api.internal import routes as internal_routes
 from app.api.admin import routes as admin_routes
@@ -27,9 +35,24 @@ async def lifespan(app: FastAPI):
     # Startup
     logger.info("Starting Trudy Backend API...")
     logger.info(f"Environment: {settings.ENVIRONMENT}")
+    await ultravox_client.start()
+    await start_webhook_workers()
+    await start_event_publisher()
+    await start_audit_writer()
+    await start_metrics()
+    await start_tracing()
     yield
     # Shutdown
     logger.info("Shutting down Trudy Backend API...")
+    await stop_webhook_workers()
+    await shutdown_jobs()
+    await stop_event_publisher()
+    await stop_audit_writer()
+    await stop_metrics()
+    await stop_tracing()
+    await ultravox_client.close()
+    await close_rate_limit_store()
+    await close_supabase_clients()
 
 
 app = FastAPI(
@@ -50,14 +73,8 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Request ID Middleware (must be first to set request_id)
-app.add_middleware(RequestIDMiddleware)
-
-# Logging Middleware (must be after RequestIDMiddleware)
-app.add_middleware(LoggingMiddleware)
-
-# Rate Limiting Middleware
-app.add_middleware(RateLimitMiddleware)
+# Request ID, rate limiting and access logging
+app.add_middleware(RequestPipelineMiddleware)
 
 
 # Exception Handlers
@@ -103,6 +120,13 @@ async def health_check():
     return {"status": "healthy", "service": "trudy-api"}
 
 
+# Prometheus scrape endpoint
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Metrics in the Prometheus text format"""
+    return Response(render_metrics(), media_type=CONTENT_TYPE)
+
+
 # Include API routes
 app.include_router(api_router, prefix="/api/v1")
 app.include_router(internal_routes.router)
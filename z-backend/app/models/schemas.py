@@ -52,6 +52,7 @@ class CampaignStatus(str, Enum):
     ACTIVE = "active"
     COMPLETED = "completed"
     FAILED = "failed"
+    DELETING = "deleting"
 
 
 # ============================================
@@ -432,3 +433,21 @@ class ToolResponse(BaseModel):
     created_at: datetime
     updated_at: Optional[datetime] = None
 
+
+
+# ============================================
+# Background Job Models
+# ============================================
+
+class JobResponse(BaseModel):
+    id: str
+    client_id: str
+    type: str
+    resource_id: Optional[str] = None
+    status: str
+    progress: Dict[str, Any] = {}
+    error_message: Optional[str] = None
+    started_at: Optional[datetime] = None
+    completed_at: Optional[datetime] = None
+    created_at: datetime
+    updated_at: Optional[datetime] = None
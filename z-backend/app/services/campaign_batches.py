@@ -0,0 +1,184 @@
+"""
+Campaign Batch Submission
+"""
+import asyncio
+import json
+import logging
+from typing import Dict, Any, List, AsyncIterator
+from app.core.config import settings
+from app.core.database import DatabaseService
+from app.services.ultravox import ultravox_client
+
+logger = logging.getLogger(__name__)
+
+CONTACT_PAGE_SIZE = 1000
+
+# Attempts at recording a batch Ultravox has already accepted
+RECORD_BATCH_ATTEMPTS = 4
+RECORD_BATCH_BASE_DELAY = 0.5
+
+
+async def iter_unsubmitted_contacts(db: DatabaseService, campaign_id: str) -> AsyncIterator[Dict[str, Any]]:
+    """Yield pending contacts not yet submitted in an Ultravox batch, paging with a keyset cursor"""
+    cursor = None
+    while True:
+        rows = await db.select(
+            "campaign_contacts",
+            {"campaign_id": campaign_id, "status": "pending", "ultravox_batch_id": None},
+            order_by="created_at",
+            columns=["id", "phone_number", "first_name", "last_name", "custom_fields", "created_at"],
+            limit=CONTACT_PAGE_SIZE,
+            cursor=cursor,
+        )
+        for row in rows:
+            yield row
+        
+        if len(rows) < CONTACT_PAGE_SIZE:
+            return
+        cursor = (rows[-1]["created_at"], rows[-1]["id"])
+
+
+async def record_campaign_batch(
+    db: DatabaseService,
+    campaign_id: str,
+    batch_id: str,
+    contact_ids: List[str],
+) -> bool:
+    """
+    Record a submitted batch (tag its contacts, append the batch id), retrying with backoff
+    
+    Returns:
+        True if recorded; False if every attempt failed
+    """
+    for attempt in range(1, RECORD_BATCH_ATTEMPTS + 1):
+        try:
+            await db.rpc(
+                "record_campaign_batch",
+                {
+                    "p_campaign_id": campaign_id,
+                    "p_batch_id": batch_id,
+                    "p_contact_ids": contact_ids,
+                },
+            )
+            return True
+        except Exception as e:
+            if attempt == RECORD_BATCH_ATTEMPTS:
+                # The batch exists in Ultravox; these contacts must be tagged by hand
+                # or they will be submitted again when the campaign is rescheduled
+                logger.error(
+                    f"Failed to record Ultravox batch {batch_id} for campaign {campaign_id}: {e}",
+                    extra={"campaign_id": campaign_id, "batch_id": batch_id, "contact_ids": contact_ids},
+                )
+                return False
+            await asyncio.sleep(RECORD_BATCH_BASE_DELAY * 2 ** (attempt - 1))
+    return False
+
+
+def build_batch_contact(campaign_id: str, contact: Dict[str, Any]) -> Dict[str, Any]:
+    """Ultravox batch entry for a campaign contact"""
+    return {
+        "phone_number": contact["phone_number"],
+        "context": {
+            "first_name": contact.get("first_name"),
+            "last_name": contact.get("last_name"),
+            "campaign_id": campaign_id,
+            "custom_fields": contact.get("custom_fields") or {},
+        },
+    }
+
+
+async def submit_campaign_batches(
+    db: DatabaseService,
+    campaign: Dict[str, Any],
+    ultravox_agent_id: str,
+) -> Dict[str, Any]:
+    """
+    Submit a campaign's unsubmitted pending contacts to Ultravox in chunks
+    
+    Contacts are split into batches bounded by CAMPAIGN_BATCH_MAX_CONTACTS
+    and CAMPAIGN_BATCH_MAX_BYTES (JSON size) and submitted with at most
+    CAMPAIGN_BATCH_PARALLELISM requests in flight. Each successful batch is
+    recorded immediately (contacts tagged, batch id appended to the
+    campaign), so calling this again after a failure only resubmits the
+    contacts whose batch failed.
+    
+    A batch Ultravox accepted counts as submitted even if recording it
+    fails after retries; its id is listed in unrecorded_batch_ids.
+    
+    Returns:
+        Summary: batch_ids (submitted now), contacts_submitted, failed_batches,
+        contacts_failed, unrecorded_batch_ids
+    """
+    campaign_id = campaign["id"]
+    semaphore = asyncio.Semaphore(settings.CAMPAIGN_BATCH_PARALLELISM)
+    summary = {
+        "batch_ids": [],
+        "contacts_submitted": 0,
+        "failed_batches": 0,
+        "contacts_failed": 0,
+        "unrecorded_batch_ids": [],
+    }
+    
+    async def submit(chunk: List[Dict[str, Any]], contact_ids: List[str]) -> None:
+        batch_data = {
+            "batches": [{
+                "contacts": chunk,
+                "medium": {"telnyx": {}},
+                "schedule": {
+                    "at": campaign.get("scheduled_at"),
+                    "timezone": campaign.get("timezone", "UTC"),
+                },
+                "settings": {
+                    "max_concurrent": campaign.get("max_concurrent_calls", 10),
+                    "recording_enabled": True,
+                },
+            }],
+        }
+        
+        async with semaphore:
+            try:
+                response = await ultravox_client.create_scheduled_batch(ultravox_agent_id, batch_data)
+                batch_id = response.get("batches", [{}])[0].get("batch_id")
+                if not batch_id:
+                    raise ValueError("Ultravox response did not include a batch_id")
+            except Exception as e:
+                logger.error(
+                    f"Failed to submit batch of {len(chunk)} contacts for campaign {campaign_id}: {e}",
+                    extra={"campaign_id": campaign_id},
+                )
+                summary["failed_batches"] += 1
+                summary["contacts_failed"] += len(chunk)
+                return
+        
+        # Recorded outside the semaphore and the submit error handling: the batch
+        # is live in Ultravox whether or not the bookkeeping succeeds
+        summary["batch_ids"].append(batch_id)
+        summary["contacts_submitted"] += len(chunk)
+        if not await record_campaign_batch(db, campaign_id, batch_id, contact_ids):
+            summary["unrecorded_batch_ids"].append(batch_id)
+    
+    tasks = []
+    chunk: List[Dict[str, Any]] = []
+    contact_ids: List[str] = []
+    chunk_bytes = 0
+    
+    async for contact in iter_unsubmitted_contacts(db, campaign_id):
+        entry = build_batch_contact(campaign_id, contact)
+        entry_bytes = len(json.dumps(entry, default=str))
+        
+        if chunk and (
+            len(chunk) >= settings.CAMPAIGN_BATCH_MAX_CONTACTS
+            or chunk_bytes + entry_bytes > settings.CAMPAIGN_BATCH_MAX_BYTES
+        ):
+            tasks.append(asyncio.create_task(submit(chunk, contact_ids)))
+            chunk, contact_ids, chunk_bytes = [], [], 0
+        
+        chunk.append(entry)
+        contact_ids.append(contact["id"])
+        chunk_bytes += entry_bytes
+    
+    if chunk:
+        tasks.append(asyncio.create_task(submit(chunk, contact_ids)))
+    
+    await asyncio.gather(*tasks)
+    return summary
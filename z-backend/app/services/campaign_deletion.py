@@ -0,0 +1,79 @@
+"""
+Campaign Deletion
+"""
+import logging
+from typing import Dict
+from app.core.config import settings
+from app.core.database import DatabaseAdminService
+from app.core.jobs import ProgressReporter
+
+logger = logging.getLogger(__name__)
+
+
+async def delete_campaign_contacts(campaign_id: str, report_progress: ProgressReporter) -> int:
+    """
+    Delete a campaign's contacts in batches
+    
+    Each batch is one page of ids followed by chunked `in` deletes, so no
+    single statement holds locks on the whole contact list.
+    
+    Returns:
+        Number of contacts deleted
+    """
+    db = DatabaseAdminService()
+    deleted = 0
+    
+    while True:
+        # Ordered by phone_number to walk the (campaign_id, phone_number) unique index
+        rows = await db.select(
+            "campaign_contacts",
+            {"campaign_id": campaign_id},
+            order_by="phone_number",
+            columns=["id"],
+            limit=settings.CAMPAIGN_DELETE_BATCH_SIZE,
+        )
+        if not rows:
+            break
+        
+        deleted += await db.bulk_delete(
+            "campaign_contacts",
+            {"campaign_id": campaign_id},
+            ids=[row["id"] for row in rows],
+        )
+        await report_progress({"contacts_deleted": deleted})
+    
+    return deleted
+
+
+async def restore_campaign_status(campaign_id: str, previous_status: str) -> None:
+    """Move a campaign out of 'deleting' after a delete that did not finish"""
+    db = DatabaseAdminService()
+    try:
+        await db.update("campaigns", {"id": campaign_id, "status": "deleting"}, {"status": previous_status})
+    except Exception as e:
+        logger.error(f"Failed to reset status of campaign {campaign_id} after failed delete: {e}")
+
+
+async def delete_campaign(
+    campaign_id: str,
+    report_progress: ProgressReporter,
+    previous_status: str = "failed",
+) -> Dict[str, int]:
+    """
+    Delete a campaign and its contacts (background job)
+    
+    The campaign is already in 'deleting' status. If the job fails or is
+    cancelled (e.g. on shutdown) it is put back to previous_status so the
+    delete can be retried.
+    """
+    db = DatabaseAdminService()
+    
+    try:
+        contacts_deleted = await delete_campaign_contacts(campaign_id, report_progress)
+        await db.bulk_delete("campaigns", {"id": campaign_id})
+    except BaseException:
+        await restore_campaign_status(campaign_id, previous_status)
+        raise
+    
+    logger.info(f"Deleted campaign {campaign_id}", extra={"contacts_deleted": contacts_deleted})
+    return {"contacts_deleted": contacts_deleted, "campaign_deleted": 1}
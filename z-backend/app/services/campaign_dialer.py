@@ -0,0 +1,463 @@
+"""
+Campaign Dialer
+"""
+import asyncio
+import logging
+import time
+import uuid
+from typing import Dict, Any, AsyncIterator, Optional
+from datetime import datetime, timezone
+from app.core.config import settings
+from app.core.database import DatabaseAdminService
+from app.core.events import emit_call_created
+from app.core.jobs import ProgressReporter
+from app.services.ultravox import ultravox_client
+from app.services.credit_ledger import get_credit_balance
+
+logger = logging.getLogger(__name__)
+
+CONTACT_PAGE_SIZE = 500
+
+
+class PacingCurve:
+    """
+    Calls-per-second ramp for a campaign
+    
+    The dial rate starts at start_cps and rises linearly to max_cps over
+    ramp_seconds, so a large campaign warms up instead of opening with a
+    burst of calls.
+    """
+    
+    def __init__(self, start_cps: float, max_cps: float, ramp_seconds: float):
+        self.start_cps = max(start_cps, 0.01)
+        self.max_cps = max(max_cps, self.start_cps)
+        self.ramp_seconds = ramp_seconds
+    
+    def rate(self, elapsed: float) -> float:
+        """Calls per second allowed after elapsed seconds of dialing"""
+        if self.ramp_seconds <= 0 or elapsed >= self.ramp_seconds:
+            return self.max_cps
+        return self.start_cps + (self.max_cps - self.start_cps) * (elapsed / self.ramp_seconds)
+
+
+class TenantLimiter:
+    """
+    Concurrent call limit for one client, shared by all its campaigns
+    
+    A call is only started while the client's credit balance exceeds the
+    number of its calls in flight, so a tenant can never have more calls
+    running than it can pay at least one minute for.
+    """
+    
+    def __init__(self, client_id: str, max_concurrent: int):
+        self.client_id = client_id
+        self.semaphore = asyncio.Semaphore(max_concurrent)
+        self.in_flight = 0
+        self.campaigns = 0
+        self._stale_credits = False
+        self._released = asyncio.Event()
+    
+    async def acquire(self) -> bool:
+        """
+        Wait for a call slot
+        
+        Returns:
+            False when the client is out of credits and no call is left in
+            flight to wait for (the slot is not taken)
+        """
+        await self.semaphore.acquire()
+        while True:
+            # After a call ends its debit may have landed; skip the cached balance once
+            max_age = 0 if self._stale_credits else None
+            self._stale_credits = False
+            if await get_credit_balance(self.client_id, max_age=max_age) > self.in_flight:
+                self.in_flight += 1
+                return True
+            
+            if self.in_flight == 0:
+                self.semaphore.release()
+                return False
+            
+            # Credits are debited as calls complete; re-check after the next one ends
+            released = self._released
+            try:
+                await asyncio.wait_for(released.wait(), timeout=settings.CAMPAIGN_DIALER_RECONCILE_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+    
+    def release(self) -> None:
+        self.in_flight -= 1
+        self.semaphore.release()
+        self._stale_credits = True
+        self._released.set()
+        self._released = asyncio.Event()
+
+
+class _CallSlot:
+    """Campaign and tenant capacity held by one call until it finishes"""
+    
+    def __init__(self, run: "_CampaignRun", call_id: str):
+        self.run = run
+        self.call_id = call_id
+        self.started_at = time.monotonic()
+        self.released = False
+    
+    def release(self) -> None:
+        if self.released:
+            return
+        self.released = True
+        self.run.semaphore.release()
+        self.run.tenant.release()
+        self.run.active.pop(self.call_id, None)
+        if not self.run.active:
+            self.run.idle.set()
+
+
+class _CampaignRun:
+    """Dialing state of one campaign on this worker"""
+    
+    def __init__(self, campaign: Dict[str, Any], tenant: TenantLimiter):
+        self.campaign = campaign
+        self.tenant = tenant
+        self.semaphore = asyncio.Semaphore(campaign.get("max_concurrent_calls") or 10)
+        self.active: Dict[str, _CallSlot] = {}
+        self.idle = asyncio.Event()
+        self.idle.set()
+
+
+class CampaignDialer:
+    """
+    In-process dialer feeding campaign contacts to Ultravox one call at a time
+    
+    Each call holds a slot in its campaign (max_concurrent_calls) and in its
+    client (CAMPAIGN_DIALER_MAX_CONCURRENT_PER_CLIENT, bounded by the credit
+    balance) from creation until the call.completed / call.failed webhook
+    arrives, so the number of live calls is enforced here rather than left
+    to the provider. New calls are paced by a PacingCurve.
+    
+    Webhooks received by another worker are picked up by a periodic check
+    of the calls table; a slot whose call never reports back is reclaimed
+    after CAMPAIGN_DIALER_CALL_TIMEOUT_SECONDS.
+    """
+    
+    def __init__(self):
+        self._tenants: Dict[str, TenantLimiter] = {}
+        self._calls: Dict[str, _CallSlot] = {}
+    
+    def _get_tenant(self, client_id: str) -> TenantLimiter:
+        tenant = self._tenants.get(client_id)
+        if tenant is None:
+            tenant = TenantLimiter(client_id, settings.CAMPAIGN_DIALER_MAX_CONCURRENT_PER_CLIENT)
+            self._tenants[client_id] = tenant
+        return tenant
+    
+    def on_call_finished(self, call_id: str) -> None:
+        """Release the slot held by a campaign call (call.completed / call.failed webhook)"""
+        slot = self._calls.pop(call_id, None)
+        if slot is not None:
+            slot.release()
+    
+    def _release(self, slot: _CallSlot) -> None:
+        self._calls.pop(slot.call_id, None)
+        slot.release()
+    
+    async def _reconcile(self, db: DatabaseAdminService, run: _CampaignRun) -> None:
+        """Release slots of calls that finished elsewhere or never reported back"""
+        while True:
+            await asyncio.sleep(settings.CAMPAIGN_DIALER_RECONCILE_SECONDS)
+            if not run.active:
+                continue
+            
+            now = time.monotonic()
+            for slot in list(run.active.values()):
+                if now - slot.started_at >= settings.CAMPAIGN_DIALER_CALL_TIMEOUT_SECONDS:
+                    logger.warning(
+                        f"Releasing campaign call slot after timeout: {slot.call_id}",
+                        extra={"campaign_id": run.campaign["id"]},
+                    )
+                    self._release(slot)
+            
+            call_ids = list(run.active.keys())
+            if not call_ids:
+                continue
+            try:
+                finished = await db.select(
+                    "calls",
+                    {"id": call_ids, "status": ["completed", "failed"]},
+                    columns=["id"],
+                )
+            except Exception as e:
+                logger.error(f"Failed to reconcile campaign calls: {e}", extra={"campaign_id": run.campaign["id"]})
+                continue
+            
+            for row in finished:
+                slot = run.active.get(row["id"])
+                if slot is not None:
+                    self._release(slot)
+    
+    async def _iter_undialed_contacts(
+        self,
+        db: DatabaseAdminService,
+        campaign_id: str,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Yield pending contacts without a call or Ultravox batch, newest first (select pages descending)"""
+        cursor = None
+        while True:
+            rows = await db.select(
+                "campaign_contacts",
+                {"campaign_id": campaign_id, "status": "pending", "call_id": None, "ultravox_batch_id": None},
+                order_by="created_at",
+                columns=["id", "phone_number", "first_name", "last_name", "custom_fields", "created_at"],
+                limit=CONTACT_PAGE_SIZE,
+                cursor=cursor,
+            )
+            for row in rows:
+                yield row
+            
+            if len(rows) < CONTACT_PAGE_SIZE:
+                return
+            cursor = (rows[-1]["created_at"], rows[-1]["id"])
+    
+    async def _place_call(
+        self,
+        db: DatabaseAdminService,
+        run: _CampaignRun,
+        ultravox_agent_id: str,
+        contact: Dict[str, Any],
+        slot: _CallSlot,
+    ) -> Optional[bool]:
+        """
+        Claim one contact, then create its call record and Ultravox call
+        
+        The slot is released unless the call was placed, including when the
+        task is cancelled part way. A claimed contact whose call was never
+        placed goes back to pending, so rescheduling the campaign dials it.
+        
+        Returns:
+            True if the call was placed, False if it failed, None if the
+            contact had already been claimed by another run
+        """
+        campaign = run.campaign
+        context = {
+            "campaign_id": campaign["id"],
+            "first_name": contact.get("first_name"),
+            "last_name": contact.get("last_name"),
+            "custom_fields": contact.get("custom_fields") or {},
+        }
+        call_settings = {"recording_enabled": True}
+        placed = False
+        claimed = False
+        linked = False
+        settled = False
+        
+        try:
+            # Conditional claim: a contact read by two runs (or workers) is only dialed once
+            try:
+                claim = await db.update(
+                    "campaign_contacts",
+                    {"id": contact["id"], "status": "pending", "call_id": None},
+                    {"status": "calling"},
+                )
+            except Exception as e:
+                logger.error(f"Failed to claim campaign contact: {e}", extra={"campaign_id": campaign["id"]})
+                return False
+            if not claim:
+                return None
+            claimed = True
+            
+            try:
+                await db.insert(
+                    "calls",
+                    {
+                        "id": slot.call_id,
+                        "client_id": campaign["client_id"],
+                        "agent_id": campaign["agent_id"],
+                        "phone_number": contact["phone_number"],
+                        "direction": "outbound",
+                        "status": "queued",
+                        "context": context,
+                        "call_settings": call_settings,
+                    },
+                )
+                await db.update("campaign_contacts", {"id": contact["id"]}, {"call_id": slot.call_id})
+            except Exception as e:
+                logger.error(f"Failed to create campaign call record: {e}", extra={"campaign_id": campaign["id"]})
+                # Nothing was dialed; the contact is handed back below
+                return False
+            linked = True
+            
+            try:
+                response = await ultravox_client.create_call({
+                    "agent_id": ultravox_agent_id,
+                    "phone_number": contact["phone_number"],
+                    "direction": "outbound",
+                    "call_settings": call_settings,
+                    "context": context,
+                })
+                ultravox_call_id = response.get("id")
+                await db.update("calls", {"id": slot.call_id}, {"ultravox_call_id": ultravox_call_id})
+            except Exception as e:
+                logger.error(
+                    f"Failed to place campaign call to {contact['phone_number']}: {e}",
+                    extra={"campaign_id": campaign["id"], "call_id": slot.call_id},
+                )
+                self._release(slot)
+                await db.update("calls", {"id": slot.call_id}, {"status": "failed"})
+                await db.update("campaign_contacts", {"id": contact["id"]}, {"status": "failed"})
+                settled = True
+                return False
+            
+            # From here the slot is held until the call's webhook (or the reconciler) releases it
+            placed = True
+        finally:
+            if not placed:
+                self._release(slot)
+                if claimed and not settled:
+                    await self._release_contact(db, contact["id"], slot.call_id if linked else None)
+        
+        await emit_call_created(
+            call_id=slot.call_id,
+            client_id=campaign["client_id"],
+            agent_id=campaign["agent_id"],
+            ultravox_call_id=ultravox_call_id,
+            phone_number=contact["phone_number"],
+            direction="outbound",
+        )
+        return True
+    
+    async def _release_contact(self, db: DatabaseAdminService, contact_id: str, call_id: Optional[str]) -> None:
+        """Hand a claimed contact whose call was never placed back to pending"""
+        try:
+            if call_id:
+                await db.update("calls", {"id": call_id, "ultravox_call_id": None}, {"status": "failed"})
+            await db.update(
+                "campaign_contacts",
+                {"id": contact_id, "status": "calling", "call_id": call_id},
+                {"status": "pending", "call_id": None},
+            )
+        except Exception as e:
+            logger.error(f"Failed to release campaign contact {contact_id}: {e}")
+    
+    async def run_campaign(
+        self,
+        campaign: Dict[str, Any],
+        ultravox_agent_id: str,
+        report_progress: ProgressReporter,
+    ) -> Dict[str, Any]:
+        """
+        Dial a campaign's pending contacts (background job)
+        
+        Waits until scheduled_at, marks the campaign active, dials every
+        pending contact within the campaign and client limits, then waits
+        for the last calls to finish and marks the campaign completed. If
+        the client runs out of credits, or the job is interrupted, the
+        campaign is marked failed; scheduling it again resumes with the
+        contacts that were not dialed.
+        
+        The wait for scheduled_at is an in-process sleep and is not persisted.
+        A graceful shutdown marks a waiting campaign failed so it can be
+        scheduled again. After a crash the campaign stays 'scheduled' (or
+        'active'), and scheduling it again takes it over once this job's
+        heartbeat has expired (see find_live_job).
+        """
+        db = DatabaseAdminService()
+        campaign_id = campaign["id"]
+        
+        scheduled_at = campaign.get("scheduled_at")
+        if scheduled_at:
+            start_at = datetime.fromisoformat(str(scheduled_at).replace("Z", "+00:00"))
+            if start_at.tzinfo is None:
+                start_at = start_at.replace(tzinfo=timezone.utc)
+            delay = (start_at - datetime.now(timezone.utc)).total_seconds()
+            if delay > 0:
+                try:
+                    await asyncio.sleep(delay)
+                except asyncio.CancelledError:
+                    await db.update("campaigns", {"id": campaign_id, "status": "scheduled"}, {"status": "failed"})
+                    raise
+        
+        tenant = self._get_tenant(campaign["client_id"])
+        tenant.campaigns += 1
+        run = _CampaignRun(campaign, tenant)
+        curve = PacingCurve(
+            settings.CAMPAIGN_DIALER_START_CPS,
+            settings.CAMPAIGN_DIALER_MAX_CPS,
+            settings.CAMPAIGN_DIALER_RAMP_SECONDS,
+        )
+        reconciler = asyncio.create_task(self._reconcile(db, run))
+        placing = set()
+        progress = {"calls_placed": 0, "calls_failed": 0, "contacts_skipped": 0}
+        dialed = 0
+        status = "failed"
+        
+        def count_result(task: asyncio.Task) -> None:
+            placed = False if task.cancelled() or task.exception() else task.result()
+            if placed is None:
+                progress["contacts_skipped"] += 1
+            else:
+                progress["calls_placed" if placed else "calls_failed"] += 1
+        
+        try:
+            await db.update("campaigns", {"id": campaign_id}, {"status": "active"})
+            
+            started = time.monotonic()
+            next_call_at = started
+            out_of_credits = False
+            
+            async for contact in self._iter_undialed_contacts(db, campaign_id):
+                await run.semaphore.acquire()
+                if not await tenant.acquire():
+                    run.semaphore.release()
+                    out_of_credits = True
+                    break
+                
+                now = time.monotonic()
+                if next_call_at > now:
+                    await asyncio.sleep(next_call_at - now)
+                    now = next_call_at
+                next_call_at = now + 1 / curve.rate(now - started)
+                
+                slot = _CallSlot(run, str(uuid.uuid4()))
+                run.active[slot.call_id] = slot
+                run.idle.clear()
+                self._calls[slot.call_id] = slot
+                
+                task = asyncio.create_task(self._place_call(db, run, ultravox_agent_id, contact, slot))
+                placing.add(task)
+                task.add_done_callback(placing.discard)
+                task.add_done_callback(count_result)
+                
+                dialed += 1
+                if dialed % CONTACT_PAGE_SIZE == 0:
+                    await report_progress(dict(progress))
+            
+            if placing:
+                await asyncio.gather(*placing, return_exceptions=True)
+            await report_progress(dict(progress))
+            
+            # Backpressure from the webhooks: the campaign is done when its last call ends
+            await run.idle.wait()
+            
+            if out_of_credits:
+                logger.warning(
+                    f"Campaign {campaign_id} stopped: client is out of credits",
+                    extra={"campaign_id": campaign_id, "client_id": campaign["client_id"]},
+                )
+                progress["stopped_reason"] = "insufficient_credits"
+            else:
+                status = "completed"
+            return progress
+        
+        finally:
+            reconciler.cancel()
+            for task in list(placing):
+                task.cancel()
+            # Slots of calls still live stay registered until their webhooks arrive
+            tenant.campaigns -= 1
+            if tenant.campaigns == 0 and tenant.in_flight == 0:
+                self._tenants.pop(tenant.client_id, None)
+            await db.update("campaigns", {"id": campaign_id}, {"status": status})
+
+
+# Global dialer instance
+campaign_dialer = CampaignDialer()
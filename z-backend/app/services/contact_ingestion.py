@@ -0,0 +1,160 @@
+"""
+Campaign Contact Ingestion
+"""
+import asyncio
+import csv
+import io
+import re
+import logging
+from typing import Dict, Any, Optional, List, Iterator, Iterable, Tuple, Union
+from app.core.config import settings
+from app.core.database import DatabaseService, DatabaseAdminService
+from app.core.jobs import ProgressReporter
+from app.core.s3 import get_s3_client
+
+logger = logging.getLogger(__name__)
+
+E164_PATTERN = re.compile(r"^\+[1-9]\d{1,14}$")
+PHONE_FORMATTING_PATTERN = re.compile(r"[\s\-().]")
+
+STANDARD_FIELDS = ("phone_number", "first_name", "last_name", "email")
+
+
+def normalize_phone_numbers(raw_numbers: Iterable[str]) -> List[Optional[str]]:
+    """
+    Normalize a batch of phone numbers to E.164
+    
+    Strips formatting characters (spaces, dashes, dots, parentheses) and
+    converts a leading international "00" prefix to "+".
+    
+    Returns:
+        Normalized numbers in input order; None for numbers that are not valid E.164
+    """
+    stripped = [PHONE_FORMATTING_PATTERN.sub("", n) for n in raw_numbers]
+    prefixed = ["+" + n[2:] if n.startswith("00") else n for n in stripped]
+    return [n if E164_PATTERN.match(n) else None for n in prefixed]
+
+
+def build_contact_rows(campaign_id: str, rows: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], int]:
+    """
+    Validate and normalize a batch of contact rows
+    
+    Rows without a phone number are skipped; duplicates within the batch
+    are collapsed (first occurrence wins).
+    
+    Returns:
+        (campaign_contacts rows ready for insert, number of invalid phone numbers)
+    """
+    rows = [r for r in rows if (r.get("phone_number") or "").strip()]
+    phone_numbers = normalize_phone_numbers(r["phone_number"] for r in rows)
+    
+    contacts: Dict[str, Dict[str, Any]] = {}
+    invalid = 0
+    for row, phone_number in zip(rows, phone_numbers):
+        if not phone_number:
+            invalid += 1
+            continue
+        if phone_number in contacts:
+            continue
+        
+        if "custom_fields" in row:
+            custom_fields = row["custom_fields"] or {}
+        else:
+            # CSV rows: every non-standard column becomes a custom field
+            custom_fields = {k: v for k, v in row.items() if k and k not in STANDARD_FIELDS}
+        
+        contacts[phone_number] = {
+            "campaign_id": campaign_id,
+            "phone_number": phone_number,
+            "first_name": (row.get("first_name") or "").strip() or None,
+            "last_name": (row.get("last_name") or "").strip() or None,
+            "email": (row.get("email") or "").strip() or None,
+            "custom_fields": custom_fields,
+            "status": "pending",
+        }
+    
+    return list(contacts.values()), invalid
+
+
+def iter_csv_batches(body: io.IOBase, batch_size: int) -> Iterator[List[Dict[str, str]]]:
+    """Stream a CSV file object as batches of row dicts without loading it into memory"""
+    reader = csv.DictReader(io.TextIOWrapper(body, encoding="utf-8-sig", newline=""))
+    
+    batch: List[Dict[str, str]] = []
+    for row in reader:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    
+    if batch:
+        yield batch
+
+
+async def insert_contacts(
+    db: Union[DatabaseService, DatabaseAdminService],
+    campaign_id: str,
+    rows: List[Dict[str, Any]],
+) -> Dict[str, int]:
+    """
+    Normalize and bulk-insert contacts in chunks, skipping existing phone numbers
+    
+    Returns:
+        Counts: contacts_added, duplicates_skipped, invalid_rows
+    """
+    counts = {"contacts_added": 0, "duplicates_skipped": 0, "invalid_rows": 0}
+    batch_size = settings.CONTACT_INGEST_BATCH_SIZE
+    
+    for i in range(0, len(rows), batch_size):
+        contacts, invalid = build_contact_rows(campaign_id, rows[i:i + batch_size])
+        inserted = await db.bulk_insert(
+            "campaign_contacts",
+            contacts,
+            on_conflict="campaign_id,phone_number",
+            ignore_duplicates=True,
+        )
+        counts["contacts_added"] += inserted
+        counts["duplicates_skipped"] += len(contacts) - inserted
+        counts["invalid_rows"] += invalid
+    
+    return counts
+
+
+async def ingest_contacts_from_s3(
+    campaign_id: str,
+    bucket: str,
+    key: str,
+    report_progress: ProgressReporter,
+) -> Dict[str, int]:
+    """
+    Stream a contacts CSV from S3 into campaign_contacts (background job)
+    
+    The object is read incrementally; each batch is normalized and
+    bulk-inserted with ON CONFLICT DO NOTHING before the next one is read.
+    Blocking S3 reads run in a worker thread.
+    """
+    db = DatabaseAdminService()
+    s3_client = get_s3_client()
+    
+    obj = await asyncio.to_thread(s3_client.get_object, Bucket=bucket, Key=key)
+    body = obj["Body"]
+    batches = iter_csv_batches(body, settings.CONTACT_INGEST_BATCH_SIZE)
+    
+    progress = {"rows_processed": 0, "contacts_added": 0, "duplicates_skipped": 0, "invalid_rows": 0}
+    try:
+        while True:
+            rows = await asyncio.to_thread(next, batches, None)
+            if rows is None:
+                break
+            
+            counts = await insert_contacts(db, campaign_id, rows)
+            progress["rows_processed"] += len(rows)
+            for name, value in counts.items():
+                progress[name] += value
+            
+            await report_progress(progress)
+    finally:
+        body.close()
+    
+    logger.info(f"Ingested contacts for campaign {campaign_id}", extra={"progress": progress})
+    return progress
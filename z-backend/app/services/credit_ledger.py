@@ -0,0 +1,139 @@
+"""
+Credit Ledger
+"""
+import time
+import logging
+from collections import OrderedDict
+from typing import Optional, Tuple
+from app.core.config import settings
+from app.core.database import DatabaseAdminService
+from app.core.exceptions import NotFoundError, PaymentRequiredError
+
+logger = logging.getLogger(__name__)
+
+# client_id -> (balance, fetched_at); write-through from every ledger operation
+_balance_cache: "OrderedDict[str, Tuple[int, float]]" = OrderedDict()
+
+
+def _cache_balance(client_id: str, balance: int) -> None:
+    _balance_cache[client_id] = (balance, time.monotonic())
+    _balance_cache.move_to_end(client_id)
+    while len(_balance_cache) > settings.CREDIT_BALANCE_CACHE_MAX_SIZE:
+        _balance_cache.popitem(last=False)
+
+
+def invalidate_credit_balance(client_id: str) -> None:
+    """Drop a cached balance so the next read goes to the database"""
+    _balance_cache.pop(client_id, None)
+
+
+async def get_credit_balance(client_id: str, max_age: Optional[float] = None) -> int:
+    """
+    Get a client's credit balance, served from a short-lived cache
+    
+    For pre-flight checks only (e.g. before placing a call); the balance
+    may be up to max_age (default CREDIT_BALANCE_CACHE_TTL_SECONDS) stale.
+    Debits that must not overdraw use debit_credits(require_balance=True).
+    
+    Returns:
+        Balance, or 0 if the client doesn't exist
+    """
+    if max_age is None:
+        max_age = settings.CREDIT_BALANCE_CACHE_TTL_SECONDS
+    
+    entry = _balance_cache.get(client_id)
+    if entry is not None and time.monotonic() - entry[1] < max_age:
+        return entry[0]
+    
+    db = DatabaseAdminService()
+    client = await db.select_one("clients", {"id": client_id})
+    balance = (client or {}).get("credits_balance") or 0
+    _cache_balance(client_id, balance)
+    return balance
+
+
+async def _apply(
+    client_id: str,
+    tx_type: str,
+    amount: int,
+    reference_type: Optional[str],
+    reference_id: Optional[str],
+    description: Optional[str],
+    require_balance: bool = False,
+) -> Tuple[bool, int]:
+    db = DatabaseAdminService()
+    rows = await db.rpc(
+        "apply_credit_transaction",
+        {
+            "p_client_id": client_id,
+            "p_type": tx_type,
+            "p_amount": amount,
+            "p_reference_type": reference_type,
+            "p_reference_id": reference_id,
+            "p_description": description,
+            "p_require_balance": require_balance,
+        },
+    )
+    if not rows:
+        raise NotFoundError("client", client_id)
+    
+    applied, balance = rows[0]["applied"], rows[0]["balance"]
+    _cache_balance(client_id, balance)
+    return applied, balance
+
+
+async def debit_credits(
+    client_id: str,
+    amount: int,
+    reference_type: Optional[str] = None,
+    reference_id: Optional[str] = None,
+    description: Optional[str] = None,
+    require_balance: bool = True,
+) -> int:
+    """
+    Atomically debit credits and record the transaction
+    
+    Idempotent per reference: a debit whose reference was already recorded
+    (e.g. a redelivered call.completed webhook) is not applied again.
+    
+    Args:
+        require_balance: Reject the debit if the balance doesn't cover it.
+            When False (usage that already happened) the balance is floored at 0;
+            the transaction records what was debited and the uncovered shortfall.
+    
+    Returns:
+        New balance
+    
+    Raises:
+        PaymentRequiredError: If require_balance is set and the balance is insufficient
+    """
+    applied, balance = await _apply(
+        client_id, "spent", amount, reference_type, reference_id, description, require_balance
+    )
+    if not applied:
+        raise PaymentRequiredError(
+            f"Insufficient credits. Required: {amount}",
+            {"required": amount, "available": balance},
+        )
+    return balance
+
+
+async def add_credits(
+    client_id: str,
+    amount: int,
+    tx_type: str = "purchased",
+    reference_type: Optional[str] = None,
+    reference_id: Optional[str] = None,
+    description: Optional[str] = None,
+) -> int:
+    """
+    Atomically add credits (purchase or refund) and record the transaction
+    
+    Idempotent per reference: a replayed reference (e.g. a redelivered Stripe
+    payment_intent.succeeded webhook) returns the balance without crediting.
+    
+    Returns:
+        New balance
+    """
+    _, balance = await _apply(client_id, tx_type, amount, reference_type, reference_id, description)
+    return balance
@@ -1,18 +1,49 @@
 """
 Ultravox API Client
 """
+import asyncio
 import httpx
 import logging
+import time
 from typing import Dict, Any, Optional, List
 from app.core.config import settings
-from app.core.retry import retry_with_backoff
+from app.core.retry import (
+    retry_with_backoff,
+    parse_retry_after,
+    AdaptiveRateLimiter,
+    CircuitBreaker,
+    CircuitOpenError,
+)
 from app.core.exceptions import ProviderError
+from app.core.metrics import ULTRAVOX_REQUEST_DURATION, ULTRAVOX_RETRIES
+from app.core.tracing import CLIENT, INTERNAL, inject_trace_headers, trace_span
 
 logger = logging.getLogger(__name__)
 
 
+# Request timeouts (seconds) per endpoint family; others use ULTRAVOX_TIMEOUT
+ENDPOINT_TIMEOUTS: Dict[str, float] = {
+    "calls": 15.0,
+    "corpora": 60.0,
+    "batches": 60.0,
+}
+
+
+def endpoint_family(endpoint: str) -> str:
+    """Map an API path to its endpoint family (e.g. /agents/{id}/scheduled-batches -> batches)"""
+    if "batches" in endpoint:
+        return "batches"
+    return endpoint.strip("/").split("/", 1)[0]
+
+
 class UltravoxClient:
-    """Client for Ultravox API"""
+    """Client for Ultravox API
+    
+    Uses one pooled HTTP/2 connection pool for the lifetime of the process
+    (opened in the app lifespan) and caps in-flight requests with a semaphore.
+    Requests are paced by a shared adaptive token bucket and guarded by a
+    circuit breaker per endpoint family.
+    """
     
     def __init__(self):
         self.base_url = settings.ULTRAVOX_BASE_URL
@@ -21,6 +52,53 @@ class UltravoxClient:
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json",
         }
+        self._client: Optional[httpx.AsyncClient] = None
+        self._semaphore = asyncio.Semaphore(settings.ULTRAVOX_MAX_CONCURRENT_REQUESTS)
+        self._rate_limiter = AdaptiveRateLimiter(
+            rate=settings.ULTRAVOX_RATE_LIMIT_PER_SECOND,
+            burst=settings.ULTRAVOX_RATE_LIMIT_BURST,
+        )
+        self._circuit_breakers: Dict[str, CircuitBreaker] = {}
+    
+    async def start(self) -> None:
+        """Open the pooled HTTP client (called on startup)"""
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers=self.headers,
+                http2=True,
+                timeout=httpx.Timeout(
+                    settings.ULTRAVOX_TIMEOUT,
+                    connect=settings.ULTRAVOX_CONNECT_TIMEOUT,
+                ),
+                limits=httpx.Limits(
+                    max_connections=settings.ULTRAVOX_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.ULTRAVOX_MAX_CONNECTIONS,
+                ),
+            )
+    
+    async def close(self) -> None:
+        """Close the pooled HTTP client (called on shutdown)"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+    
+    async def _get_client(self) -> httpx.AsyncClient:
+        # Opened lazily when used outside the app lifespan (scripts, workers)
+        if self._client is None:
+            await self.start()
+        return self._client
+    
+    def _get_circuit_breaker(self, family: str) -> CircuitBreaker:
+        breaker = self._circuit_breakers.get(family)
+        if breaker is None:
+            breaker = CircuitBreaker(
+                f"ultravox:{family}",
+                failure_threshold=settings.ULTRAVOX_CIRCUIT_FAILURE_THRESHOLD,
+                recovery_timeout=settings.ULTRAVOX_CIRCUIT_RECOVERY_SECONDS,
+            )
+            self._circuit_breakers[family] = breaker
+        return breaker
     
     async def _request(
         self,
@@ -30,29 +108,90 @@ class UltravoxClient:
         params: Optional[Dict[str, Any]] = None,
     ) -> Dict[str, Any]:
         """Make HTTP request with retry logic"""
-        url = f"{self.base_url}{endpoint}"
+        client = await self._get_client()
+        family = endpoint_family(endpoint)
+        timeout = ENDPOINT_TIMEOUTS.get(family, settings.ULTRAVOX_TIMEOUT)
+        breaker = self._get_circuit_breaker(family)
+        attempts = 0
         
         async def _make_request():
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.request(
-                    method,
-                    url,
-                    json=data,
-                    params=params,
-                    headers=self.headers,
-                )
-                response.raise_for_status()
-                return response.json()
+            nonlocal attempts
+            attempts += 1
+            
+            # Fail fast while the endpoint family is known to be down
+            breaker.before_request()
+            await self._rate_limiter.acquire()
+            
+            try:
+                # Only the request itself holds a slot; backoff sleeps do not
+                async with self._semaphore:
+                    with trace_span(
+                        f"HTTP {method}",
+                        CLIENT,
+                        {"http.request.method": method, "url.path": endpoint, "ultravox.attempt": attempts},
+                    ) as span:
+                        start = time.perf_counter()
+                        response = await client.request(
+                            method,
+                            endpoint,
+                            json=data,
+                            params=params,
+                            headers=inject_trace_headers(),
+                            timeout=httpx.Timeout(timeout, connect=settings.ULTRAVOX_CONNECT_TIMEOUT),
+                        )
+                        if span is not None:
+                            span.set_attribute("http.response.status_code", response.status_code)
+                            if response.status_code >= 400:
+                                span.set_status("error")
+            except httpx.TransportError:
+                ULTRAVOX_REQUEST_DURATION.observe(time.perf_counter() - start, family, "error")
+                breaker.record_failure()
+                raise
+            
+            ULTRAVOX_REQUEST_DURATION.observe(time.perf_counter() - start, family, str(response.status_code))
+            
+            # Only 5xx counts against the circuit; a 429 or other 4xx still means
+            # the endpoint is up (and must clear a half-open probe)
+            if response.status_code >= 500:
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+            
+            if response.status_code == 429:
+                self._rate_limiter.on_throttled(parse_retry_after(response.headers.get("Retry-After")))
+            elif response.status_code < 500:
+                self._rate_limiter.on_success()
+            
+            response.raise_for_status()
+            return response.json() if response.content else {}
         
-        try:
-            return await retry_with_backoff(_make_request)
-        except httpx.HTTPStatusError as e:
-            raise ProviderError(
-                provider="ultravox",
-                message=f"Ultravox API error: {e.response.status_code}",
-                http_status=e.response.status_code,
-                retry_after=int(e.response.headers.get("Retry-After", 0)) if e.response.status_code == 429 else None,
-            )
+        with trace_span(
+            f"ultravox {method} {family}",
+            INTERNAL,
+            {"ultravox.endpoint": family, "url.path": endpoint},
+        ) as span:
+            try:
+                return await retry_with_backoff(_make_request)
+            except CircuitOpenError as e:
+                raise ProviderError(
+                    provider="ultravox",
+                    message="Ultravox API temporarily unavailable",
+                    http_status=503,
+                    retry_after=int(e.retry_after) + 1,
+                )
+            except httpx.HTTPStatusError as e:
+                retry_after = parse_retry_after(e.response.headers.get("Retry-After"))
+                raise ProviderError(
+                    provider="ultravox",
+                    message=f"Ultravox API error: {e.response.status_code}",
+                    http_status=e.response.status_code,
+                    retry_after=int(retry_after) if e.response.status_code == 429 and retry_after is not None else None,
+                )
+            finally:
+                if span is not None:
+                    span.set_attribute("ultravox.attempts", attempts)
+                if attempts > 1:
+                    ULTRAVOX_RETRIES.inc(family, amount=attempts - 1)
     
     # Voices
     async def create_voice(self, voice_data: Dict[str, Any]) -> Dict[str, Any]:
@@ -0,0 +1,279 @@
+"""
+Egress Webhook Delivery Queue
+"""
+import asyncio
+import logging
+import time
+from typing import Dict, Any, Optional, List
+from datetime import datetime, timedelta
+import httpx
+from app.core.config import settings
+from app.core.database import DatabaseAdminService
+from app.core.metrics import WEBHOOK_DELIVERY_DURATION
+from app.core.tracing import CONSUMER, current_traceparent, parse_traceparent, trace_span
+from app.core.webhooks import deliver_webhook
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RETRY_CONFIG = {"max_attempts": 10, "backoff_strategy": "exponential"}
+
+_http_client: Optional[httpx.AsyncClient] = None
+_worker_tasks: List[asyncio.Task] = []
+_wake_event: Optional[asyncio.Event] = None
+
+
+async def enqueue_webhook_deliveries(
+    client_id: str,
+    event_type: str,
+    event_data: Dict[str, Any],
+) -> int:
+    """
+    Queue an event for every enabled endpoint of a client subscribed to it
+    
+    Deliveries are written to the webhook_deliveries outbox and sent by the
+    delivery workers, so callers (e.g. webhook ingress) don't wait on
+    customer endpoints.
+    
+    Returns:
+        Number of deliveries queued
+    """
+    db = DatabaseAdminService()
+    
+    endpoints = await db.select(
+        "webhook_endpoints",
+        {
+            "client_id": client_id,
+            "enabled": True,
+        },
+        columns=["id", "event_types"],
+    )
+    
+    # The envelope is stored so every attempt sends (and signs) the same body
+    payload = {
+        "event": event_type,
+        "data": event_data,
+        "timestamp": datetime.utcnow().isoformat(),
+    }
+    deliveries = [
+        {
+            "webhook_endpoint_id": endpoint["id"],
+            "event_type": event_type,
+            "payload": payload,
+            "status": "pending",
+            "attempt": 1,
+        }
+        for endpoint in endpoints
+        if event_type in (endpoint.get("event_types") or [])
+    ]
+    
+    # Delivery workers continue the queuing request's trace
+    traceparent = current_traceparent()
+    if traceparent:
+        for delivery in deliveries:
+            delivery["traceparent"] = traceparent
+    
+    queued = await db.bulk_insert("webhook_deliveries", deliveries)
+    if queued and _wake_event is not None:
+        _wake_event.set()
+    
+    return queued
+
+
+def get_retry_delay(attempt: int, retry_config: Optional[Dict[str, Any]]) -> float:
+    """Seconds to wait before retrying after the given failed attempt"""
+    strategy = (retry_config or DEFAULT_RETRY_CONFIG).get("backoff_strategy", "exponential")
+    base = settings.WEBHOOK_RETRY_BASE_SECONDS
+    
+    if strategy == "exponential":
+        delay = base * (2 ** (attempt - 1))
+    elif strategy == "linear":
+        delay = base * attempt
+    else:
+        delay = base
+    
+    return min(delay, settings.WEBHOOK_RETRY_MAX_SECONDS)
+
+
+async def _process_delivery(db: DatabaseAdminService, delivery: Dict[str, Any]) -> None:
+    """Attempt one delivery and record the outcome"""
+    if not delivery.get("enabled"):
+        await db.update(
+            "webhook_deliveries",
+            {"id": delivery["id"]},
+            {"status": "failed_permanently", "error_message": "Endpoint disabled", "locked_until": None},
+        )
+        return
+    
+    with trace_span(
+        f"webhook {delivery.get('event_type')} deliver",
+        CONSUMER,
+        {
+            "webhook.delivery_id": delivery["id"],
+            "webhook.endpoint_id": delivery["webhook_endpoint_id"],
+            "webhook.attempt": delivery["attempt"],
+        },
+        parent=parse_traceparent(delivery.get("traceparent")),
+    ):
+        start = time.perf_counter()
+        success, status_code, error = await deliver_webhook(
+            url=delivery["url"],
+            payload=delivery["payload"],
+            secret=delivery["secret"],
+            timeout=settings.WEBHOOK_DELIVERY_TIMEOUT,
+            client=_http_client,
+        )
+        duration = time.perf_counter() - start
+    
+    if success:
+        WEBHOOK_DELIVERY_DURATION.observe(duration, "delivered")
+        await db.update(
+            "webhook_deliveries",
+            {"id": delivery["id"]},
+            {
+                "status": "delivered",
+                "response_code": status_code,
+                "delivered_at": datetime.utcnow().isoformat(),
+                "locked_until": None,
+            },
+        )
+        return
+    
+    retry_config = delivery.get("retry_config") or DEFAULT_RETRY_CONFIG
+    attempt = delivery["attempt"]
+    max_attempts = retry_config.get("max_attempts", DEFAULT_RETRY_CONFIG["max_attempts"])
+    
+    if attempt >= max_attempts:
+        WEBHOOK_DELIVERY_DURATION.observe(duration, "failed_permanently")
+        logger.warning(
+            f"Webhook delivery {delivery['id']} failed permanently after {attempt} attempts",
+            extra={"webhook_endpoint_id": delivery["webhook_endpoint_id"], "status_code": status_code},
+        )
+        await db.update(
+            "webhook_deliveries",
+            {"id": delivery["id"]},
+            {
+                "status": "failed_permanently",
+                "response_code": status_code,
+                "error_message": error,
+                "locked_until": None,
+            },
+        )
+        return
+    
+    WEBHOOK_DELIVERY_DURATION.observe(duration, "failed")
+    next_attempt_at = datetime.utcnow() + timedelta(seconds=get_retry_delay(attempt, retry_config))
+    await db.update(
+        "webhook_deliveries",
+        {"id": delivery["id"]},
+        {
+            "status": "failed",
+            "attempt": attempt + 1,
+            "response_code": status_code,
+            "error_message": error,
+            "next_attempt_at": next_attempt_at.isoformat(),
+            "locked_until": None,
+        },
+    )
+
+
+async def _dispatcher(queue: asyncio.Queue, slots: asyncio.Semaphore) -> None:
+    """
+    Claim due deliveries from the outbox and hand them to the workers
+    
+    Only as many rows as there are idle workers are claimed, so every leased
+    delivery starts sending right away instead of waiting in the queue while
+    its lease runs out.
+    """
+    db = DatabaseAdminService()
+    
+    while True:
+        # Wait for at least one idle worker, then take every other free slot
+        await slots.acquire()
+        limit = 1
+        while limit < settings.WEBHOOK_DELIVERY_BATCH_SIZE and not slots.locked():
+            await slots.acquire()
+            limit += 1
+        
+        _wake_event.clear()
+        try:
+            deliveries = await db.rpc(
+                "claim_webhook_deliveries",
+                {
+                    "p_limit": limit,
+                    "p_lease_seconds": settings.WEBHOOK_DELIVERY_LEASE_SECONDS,
+                },
+            ) or []
+        except Exception as e:
+            logger.error(f"Failed to claim webhook deliveries: {e}")
+            deliveries = []
+        
+        for _ in range(limit - len(deliveries)):
+            slots.release()
+        for delivery in deliveries:
+            queue.put_nowait(delivery)
+        
+        # Claiming every free slot means more are probably due; otherwise wait for new work
+        if len(deliveries) < limit:
+            try:
+                await asyncio.wait_for(_wake_event.wait(), timeout=settings.WEBHOOK_DELIVERY_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+
+async def _worker(queue: asyncio.Queue, slots: asyncio.Semaphore) -> None:
+    db = DatabaseAdminService()
+    
+    while True:
+        delivery = await queue.get()
+        try:
+            await _process_delivery(db, delivery)
+        except Exception:
+            # The lease expires and the delivery is claimed again
+            logger.exception(f"Error processing webhook delivery {delivery.get('id')}")
+        finally:
+            queue.task_done()
+            slots.release()
+
+
+async def start_webhook_workers() -> None:
+    """Start the delivery dispatcher and worker pool (called on startup)"""
+    global _http_client, _wake_event
+    
+    if _worker_tasks:
+        return
+    
+    _http_client = httpx.AsyncClient(
+        http2=True,
+        limits=httpx.Limits(
+            max_connections=settings.WEBHOOK_DELIVERY_WORKERS * 2,
+            max_keepalive_connections=settings.WEBHOOK_DELIVERY_WORKERS,
+        ),
+    )
+    _wake_event = asyncio.Event()
+    
+    # One slot per worker; the dispatcher holds a slot for each delivery it claims
+    slots = asyncio.Semaphore(settings.WEBHOOK_DELIVERY_WORKERS)
+    queue: asyncio.Queue = asyncio.Queue()
+    _worker_tasks.append(asyncio.create_task(_dispatcher(queue, slots)))
+    for _ in range(settings.WEBHOOK_DELIVERY_WORKERS):
+        _worker_tasks.append(asyncio.create_task(_worker(queue, slots)))
+    
+    logger.info(f"Started {settings.WEBHOOK_DELIVERY_WORKERS} webhook delivery workers")
+
+
+async def stop_webhook_workers() -> None:
+    """Stop the worker pool (called on shutdown)
+    
+    In-flight deliveries are cancelled; their leases expire and they are
+    retried by the next instance to claim them.
+    """
+    global _http_client
+    
+    for task in _worker_tasks:
+        task.cancel()
+    await asyncio.gather(*_worker_tasks, return_exceptions=True)
+    _worker_tasks.clear()
+    
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
@@ -0,0 +1 @@
+# Benchmarks (run from z-backend: python -m benchmarks.<name>)
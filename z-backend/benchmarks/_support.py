@@ -0,0 +1,83 @@
+"""
+Shared helpers for the benchmark scripts
+"""
+import base64
+import multiprocessing
+import socket
+import statistics
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Tuple
+import jwt
+import uvicorn
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@contextmanager
+def serve(app, port: int) -> Iterator[str]:
+    """
+    Run an ASGI app on 127.0.0.1:port in a forked process; yields its base URL
+    
+    A separate process keeps the mock server from competing with the code
+    under test for the GIL, which would otherwise dominate the timings.
+    """
+    process = multiprocessing.get_context("fork").Process(
+        target=uvicorn.run,
+        args=(app,),
+        kwargs={"host": "127.0.0.1", "port": port, "log_level": "error"},
+        daemon=True,
+    )
+    process.start()
+    deadline = time.monotonic() + 10
+    while True:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.1).close()
+            break
+        except OSError:
+            if time.monotonic() > deadline:
+                process.kill()
+                raise RuntimeError(f"Mock server did not start on port {port}")
+            time.sleep(0.02)
+    try:
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        process.terminate()
+        process.join()
+
+
+def _b64(n: int) -> str:
+    raw = n.to_bytes((n.bit_length() + 7) // 8, "big")
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+
+def make_rsa_jwk(kid: str) -> Tuple[bytes, Dict[str, Any]]:
+    """New RSA key pair as (private key PEM, public JWK)"""
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    pem = key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    )
+    numbers = key.public_key().public_numbers()
+    return pem, {"kty": "RSA", "kid": kid, "use": "sig", "alg": "RS256", "n": _b64(numbers.n), "e": _b64(numbers.e)}
+
+
+def sign_token(private_pem: bytes, kid: str, claims: Dict[str, Any]) -> str:
+    return jwt.encode(claims, private_pem, algorithm="RS256", headers={"kid": kid})
+
+
+def summarize(samples: List[float]) -> str:
+    """p50/p99/mean of durations in seconds, formatted in milliseconds"""
+    ordered = sorted(samples)
+    p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+    return (
+        f"p50={statistics.median(ordered) * 1000:.3f}ms "
+        f"p99={p99 * 1000:.3f}ms mean={statistics.fmean(ordered) * 1000:.3f}ms"
+    )
@@ -0,0 +1,89 @@
+"""
+JWT Verification Benchmark
+
+Against a local JWKS endpoint serving 21 RSA keys:
+- cold start: how many JWKS fetches 50 concurrent verify_jwt calls make
+- per-request cost of verify_jwt with the claims cache cleared (signature
+  check against the pre-constructed key) and with a cached token
+
+Run from z-backend:
+    python -m benchmarks.bench_auth [--iterations 2000]
+"""
+import argparse
+import asyncio
+import os
+import time
+from benchmarks._support import free_port, make_rsa_jwk, serve, sign_token, summarize
+
+PORT = free_port()
+BASE_URL = f"http://127.0.0.1:{PORT}"
+
+# Settings are read at import time, so configure them before importing auth
+os.environ.update({
+    "JWT_ISSUER": f"{BASE_URL}/",
+    "JWT_AUDIENCE": "bench",
+    "LOG_LEVEL": "WARNING",
+})
+
+import httpx  # noqa: E402
+from fastapi import FastAPI  # noqa: E402
+from app.core import auth  # noqa: E402
+
+PRIVATE_KEY, SIGNING_JWK = make_rsa_jwk("bench")
+JWKS = {"keys": [make_rsa_jwk(f"other-{i}")[1] for i in range(20)] + [SIGNING_JWK]}
+
+
+def build_mock_jwks() -> FastAPI:
+    mock = FastAPI()
+    fetches = {"count": 0}
+    
+    @mock.get("/.well-known/jwks.json")
+    async def jwks():
+        fetches["count"] += 1
+        # Simulate the Auth0 round trip so concurrent callers overlap
+        await asyncio.sleep(0.05)
+        return JWKS
+    
+    @mock.get("/fetches")
+    async def fetch_count():
+        return fetches
+    
+    return mock
+
+
+async def main(args) -> None:
+    token = sign_token(PRIVATE_KEY, "bench", {
+        "sub": "auth0|bench",
+        "aud": "bench",
+        "iss": f"{BASE_URL}/",
+        "exp": int(time.time()) + 3600,
+    })
+    
+    await asyncio.gather(*(auth.verify_jwt(token) for _ in range(50)))
+    async with httpx.AsyncClient() as client:
+        fetches = (await client.get(f"{BASE_URL}/fetches")).json()["count"]
+    print(f"  cold start, 50 concurrent requests: {fetches} JWKS fetch(es)")
+    
+    samples = []
+    for _ in range(args.iterations):
+        auth._claims_cache.clear()
+        start = time.perf_counter()
+        await auth.verify_jwt(token)
+        samples.append(time.perf_counter() - start)
+    print(f"  uncached verify_jwt   {summarize(samples)}")
+    
+    samples = []
+    for _ in range(args.iterations):
+        start = time.perf_counter()
+        await auth.verify_jwt(token)
+        samples.append(time.perf_counter() - start)
+    print(f"  cached verify_jwt     {summarize(samples)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+    
+    with serve(build_mock_jwks(), PORT):
+        asyncio.run(main(args))
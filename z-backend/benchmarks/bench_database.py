@@ -0,0 +1,169 @@
+"""
+Database Throughput Benchmark
+
+Drives GET /api/v1/calls and POST /webhooks/ultravox through the app
+against a local mock PostgREST server that answers every query after a
+fixed delay (simulated database round trip).
+
+Each scenario runs twice:
+- async: the real DatabaseService (AsyncPostgrestClient)
+- blocking: the same queries sent with a synchronous httpx client on the
+  event loop, the way the supabase-py client did before the services
+  became async
+
+Run from z-backend:
+    python -m benchmarks.bench_database [--requests 400] [--concurrency 50] [--latency-ms 20]
+"""
+import argparse
+import asyncio
+import hashlib
+import hmac
+import json
+import os
+import time
+from datetime import datetime, timezone
+from benchmarks._support import free_port, make_rsa_jwk, serve, sign_token
+
+PORT = free_port()
+BASE_URL = f"http://127.0.0.1:{PORT}"
+CLIENT_ID = "00000000-0000-0000-0000-0000000000c1"
+WEBHOOK_SECRET = "bench-secret"
+
+# Settings are read at import time, so configure them before importing the app
+os.environ.update({
+    "SUPABASE_URL": BASE_URL,
+    "SUPABASE_KEY": "anon",
+    "SUPABASE_SERVICE_KEY": "service",
+    "JWT_ISSUER": f"{BASE_URL}/",
+    "JWT_AUDIENCE": "bench",
+    "ULTRAVOX_API_KEY": "bench",
+    "ULTRAVOX_WEBHOOK_SECRET": WEBHOOK_SECRET,
+    "RATE_LIMIT_ENABLED": "false",
+    "EVENTBRIDGE_ENABLED": "false",
+    "LOG_LEVEL": "WARNING",
+})
+
+import httpx  # noqa: E402
+from fastapi import FastAPI, Request, Response  # noqa: E402
+from postgrest import APIResponse  # noqa: E402
+from app.main import app  # noqa: E402
+from app.core import database  # noqa: E402
+
+PRIVATE_KEY, JWK = make_rsa_jwk("bench")
+
+CALL_ROW = {
+    "id": "00000000-0000-0000-0000-0000000000a1",
+    "client_id": CLIENT_ID,
+    "agent_id": "00000000-0000-0000-0000-0000000000b1",
+    "ultravox_call_id": "uv-call-1",
+    "phone_number": "+15555550100",
+    "direction": "outbound",
+    "status": "queued",
+    "created_at": datetime.now(timezone.utc).isoformat(),
+}
+
+
+def build_mock_postgrest(latency: float) -> FastAPI:
+    mock = FastAPI()
+    
+    @mock.get("/.well-known/jwks.json")
+    async def jwks():
+        return {"keys": [JWK]}
+    
+    @mock.api_route("/rest/v1/{table}", methods=["GET", "HEAD", "POST", "PATCH", "DELETE"])
+    async def table(table: str, request: Request):
+        await asyncio.sleep(latency)
+        rows = [CALL_ROW] if table == "calls" and request.method in ("GET", "PATCH") else []
+        return Response(
+            json.dumps(rows),
+            status_code=201 if request.method == "POST" else 200,
+            media_type="application/json",
+            headers={"Content-Range": f"0-{len(rows)}/{len(rows)}"},
+        )
+    
+    return mock
+
+
+def use_blocking_client() -> None:
+    """Send every query with a synchronous client, blocking the event loop"""
+    sync_client = httpx.Client()
+    
+    async def blocking_execute(query, table, operation):
+        request = query.request
+        response = sync_client.request(
+            request.http_method,
+            str(request.path),
+            params=request.params,
+            headers=request.headers,
+            json=request.json,
+        )
+        return APIResponse.from_http_request_response(response)
+    
+    database._execute = blocking_execute
+
+
+def signed_webhook() -> dict:
+    body = json.dumps({"event": "call.started", "call_id": "uv-call-1", "timestamp": CALL_ROW["created_at"]})
+    timestamp = str(int(time.time()))
+    signature = hmac.new(WEBHOOK_SECRET.encode(), f"{timestamp}.{body}".encode(), hashlib.sha256).hexdigest()
+    return {
+        "content": body,
+        "headers": {
+            "Content-Type": "application/json",
+            "X-Ultravox-Signature": signature,
+            "X-Ultravox-Timestamp": timestamp,
+        },
+    }
+
+
+async def run(name: str, send, requests: int, concurrency: int) -> None:
+    semaphore = asyncio.Semaphore(concurrency)
+    statuses = {}
+    
+    async def one():
+        async with semaphore:
+            response = await send()
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+    
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    elapsed = time.perf_counter() - start
+    print(f"  {name:28} {requests / elapsed:8.1f} req/s  ({elapsed:.2f}s, statuses {statuses})")
+
+
+async def main(args) -> None:
+    token = sign_token(PRIVATE_KEY, "bench", {
+        "sub": "auth0|bench",
+        "client_id": CLIENT_ID,
+        "aud": "bench",
+        "iss": f"{BASE_URL}/",
+        "exp": int(time.time()) + 3600,
+    })
+    auth = {"Authorization": f"Bearer {token}", "X-Client-ID": CLIENT_ID}
+    
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        # Warm up the JWKS and connection pool
+        await client.get("/api/v1/calls", headers=auth)
+        
+        for mode in ("async", "blocking"):
+            if mode == "blocking":
+                use_blocking_client()
+            print(f"{mode} (concurrency {args.concurrency}, {args.latency_ms}ms per query):")
+            await run("GET /api/v1/calls", lambda: client.get("/api/v1/calls", headers=auth), args.requests, args.concurrency)
+            await run(
+                "POST /webhooks/ultravox",
+                lambda: client.post("/api/v1/webhooks/ultravox", **signed_webhook()),
+                args.requests,
+                args.concurrency,
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--latency-ms", type=float, default=20)
+    args = parser.parse_args()
+    
+    with serve(build_mock_postgrest(args.latency_ms / 1000), PORT):
+        asyncio.run(main(args))
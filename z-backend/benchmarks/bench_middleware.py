@@ -0,0 +1,75 @@
+"""
+Middleware Overhead Benchmark
+
+Times sequential requests to a no-op route over the ASGI transport with:
+- no middleware
+- three pass-through BaseHTTPMiddleware layers (the layering cost of the
+  old RequestID/Logging/RateLimit stack, without their work)
+- RequestPipelineMiddleware
+
+Run from z-backend:
+    python -m benchmarks.bench_middleware [--requests 3000]
+"""
+import argparse
+import asyncio
+import os
+import time
+from benchmarks._support import summarize
+
+os.environ.update({
+    "RATE_LIMIT_ENABLED": "true",
+    "RATE_LIMIT_PER_MINUTE": "1000000000",
+    "LOG_LEVEL": "WARNING",
+})
+
+import httpx  # noqa: E402
+from fastapi import FastAPI  # noqa: E402
+from starlette.middleware.base import BaseHTTPMiddleware  # noqa: E402
+from app.core.middleware import RequestPipelineMiddleware  # noqa: E402
+
+
+class PassThroughMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request, call_next):
+        return await call_next(request)
+
+
+def build_app(*middleware) -> FastAPI:
+    app = FastAPI()
+    
+    @app.get("/noop")
+    async def noop():
+        return {}
+    
+    for cls in middleware:
+        app.add_middleware(cls)
+    return app
+
+
+async def measure(app: FastAPI, requests: int) -> list:
+    samples = []
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        for _ in range(50):
+            await client.get("/noop")
+        for _ in range(requests):
+            start = time.perf_counter()
+            await client.get("/noop")
+            samples.append(time.perf_counter() - start)
+    return samples
+
+
+async def main(args) -> None:
+    scenarios = (
+        ("no middleware", build_app()),
+        ("3x BaseHTTPMiddleware", build_app(PassThroughMiddleware, PassThroughMiddleware, PassThroughMiddleware)),
+        ("RequestPipelineMiddleware", build_app(RequestPipelineMiddleware)),
+    )
+    for name, app in scenarios:
+        print(f"  {name:26} {summarize(await measure(app, args.requests))}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=3000)
+    args = parser.parse_args()
+    
+    asyncio.run(main(args))
@@ -0,0 +1,77 @@
+"""
+Ultravox Client Pooling Benchmark
+
+Times sequential GET /calls/{id} requests against a local mock Ultravox
+server, once with a fresh client per call (what _request did before it
+kept a pooled client) and once with the shared pooled client.
+
+Run from z-backend:
+    python -m benchmarks.bench_ultravox_pool [--calls 300]
+"""
+import argparse
+import asyncio
+import os
+import time
+from benchmarks._support import free_port, serve, summarize
+
+PORT = free_port()
+
+# Settings are read at import time, so configure them before importing the client
+os.environ.update({
+    "ULTRAVOX_BASE_URL": f"http://127.0.0.1:{PORT}/v1",
+    "ULTRAVOX_API_KEY": "bench",
+    # Keep the token bucket out of the measurement
+    "ULTRAVOX_RATE_LIMIT_PER_SECOND": "100000",
+    "ULTRAVOX_RATE_LIMIT_BURST": "100000",
+    "TRACING_ENABLED": "false",
+    "LOG_LEVEL": "WARNING",
+})
+
+from fastapi import FastAPI  # noqa: E402
+from app.services.ultravox import UltravoxClient  # noqa: E402
+
+
+def build_mock_ultravox() -> FastAPI:
+    mock = FastAPI()
+    
+    @mock.get("/v1/calls/{call_id}")
+    async def get_call(call_id: str):
+        return {"callId": call_id, "ended": None}
+    
+    return mock
+
+
+async def fresh_client_call(call_id: str) -> None:
+    client = UltravoxClient()
+    try:
+        await client.get_call(call_id)
+    finally:
+        await client.close()
+
+
+async def main(args) -> None:
+    pooled = UltravoxClient()
+    await pooled.start()
+    try:
+        # Warm up imports and the pooled connection
+        await fresh_client_call("warmup")
+        await pooled.get_call("warmup")
+        
+        for name, call in (("fresh client per call", fresh_client_call), ("pooled client", pooled.get_call)):
+            samples = []
+            for i in range(args.calls):
+                start = time.perf_counter()
+                await call(f"call-{i}")
+                samples.append(time.perf_counter() - start)
+            print(f"  {name:24} {summarize(samples)}")
+    finally:
+        await pooled.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=300)
+    args = parser.parse_args()
+    
+    with serve(build_mock_ultravox(), PORT):
+        asyncio.run(main(args))
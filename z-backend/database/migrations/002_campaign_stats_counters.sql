@@ -0,0 +1,102 @@
+-- Campaign stats maintained incrementally
+-- Replaces recount-on-read of campaign_contacts with per-statement deltas
+
+-- ============================================
+-- Helper Functions
+-- ============================================
+
+-- Add per-status deltas to a stats object, e.g. {"pending": -1, "completed": 1}
+CREATE OR REPLACE FUNCTION campaign_stats_add(p_stats JSONB, p_deltas JSONB) RETURNS JSONB AS $$
+    SELECT COALESCE(p_stats, '{}'::jsonb) || COALESCE(
+        jsonb_object_agg(key, COALESCE((p_stats->>key)::INTEGER, 0) + value::INTEGER),
+        '{}'::jsonb
+    )
+    FROM jsonb_each_text(p_deltas);
+$$ LANGUAGE sql IMMUTABLE;
+
+-- Recount stats for a single campaign (repair path; normal updates use the trigger below)
+CREATE OR REPLACE FUNCTION recalculate_campaign_stats(p_campaign_id UUID) RETURNS JSONB AS $$
+    UPDATE campaigns
+    SET stats = '{"pending": 0, "calling": 0, "completed": 0, "failed": 0}'::jsonb || COALESCE(
+        (
+            SELECT jsonb_object_agg(status, n)
+            FROM (
+                SELECT status, count(*) AS n
+                FROM campaign_contacts
+                WHERE campaign_id = p_campaign_id
+                GROUP BY status
+            ) s
+        ),
+        '{}'::jsonb
+    )
+    WHERE id = p_campaign_id
+    RETURNING stats;
+$$ LANGUAGE sql;
+
+-- ============================================
+-- Stats Triggers
+-- ============================================
+
+-- Statement-level trigger: aggregates the status transitions of all rows touched
+-- by one statement and applies them with a single UPDATE per campaign
+CREATE OR REPLACE FUNCTION campaign_contacts_stats_trigger_func()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        UPDATE campaigns c
+        SET stats = campaign_stats_add(c.stats, d.deltas)
+        FROM (
+            SELECT campaign_id, jsonb_object_agg(status, n) AS deltas
+            FROM (SELECT campaign_id, status, count(*) AS n FROM new_rows GROUP BY 1, 2) s
+            GROUP BY campaign_id
+        ) d
+        WHERE c.id = d.campaign_id;
+    ELSIF TG_OP = 'DELETE' THEN
+        UPDATE campaigns c
+        SET stats = campaign_stats_add(c.stats, d.deltas)
+        FROM (
+            SELECT campaign_id, jsonb_object_agg(status, n) AS deltas
+            FROM (SELECT campaign_id, status, -count(*) AS n FROM old_rows GROUP BY 1, 2) s
+            GROUP BY campaign_id
+        ) d
+        WHERE c.id = d.campaign_id;
+    ELSIF TG_OP = 'UPDATE' THEN
+        UPDATE campaigns c
+        SET stats = campaign_stats_add(c.stats, d.deltas)
+        FROM (
+            SELECT campaign_id, jsonb_object_agg(status, n) AS deltas
+            FROM (
+                SELECT campaign_id, status, sum(n) AS n
+                FROM (
+                    SELECT campaign_id, status, count(*) AS n FROM new_rows GROUP BY 1, 2
+                    UNION ALL
+                    SELECT campaign_id, status, -count(*) AS n FROM old_rows GROUP BY 1, 2
+                ) t
+                GROUP BY 1, 2
+                HAVING sum(n) <> 0
+            ) s
+            GROUP BY campaign_id
+        ) d
+        WHERE c.id = d.campaign_id;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+CREATE TRIGGER campaign_contacts_stats_insert
+    AFTER INSERT ON campaign_contacts
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION campaign_contacts_stats_trigger_func();
+
+CREATE TRIGGER campaign_contacts_stats_update
+    AFTER UPDATE ON campaign_contacts
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION campaign_contacts_stats_trigger_func();
+
+CREATE TRIGGER campaign_contacts_stats_delete
+    AFTER DELETE ON campaign_contacts
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION campaign_contacts_stats_trigger_func();
+
+-- Backfill existing campaigns
+SELECT recalculate_campaign_stats(id) FROM campaigns;
@@ -0,0 +1,30 @@
+-- Background jobs
+-- Tracks long-running work (e.g. campaign contact imports) started from API requests
+
+CREATE TABLE background_jobs (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    client_id UUID NOT NULL REFERENCES clients(id) ON DELETE CASCADE,
+    type TEXT NOT NULL,
+    resource_id UUID,
+    status TEXT NOT NULL DEFAULT 'queued' CHECK (status IN ('queued', 'running', 'completed', 'failed')),
+    progress JSONB DEFAULT '{}'::jsonb,
+    error_message TEXT,
+    started_at TIMESTAMPTZ,
+    completed_at TIMESTAMPTZ,
+    created_at TIMESTAMPTZ DEFAULT now() NOT NULL,
+    updated_at TIMESTAMPTZ DEFAULT now() NOT NULL
+);
+
+CREATE INDEX idx_background_jobs_client_id ON background_jobs(client_id);
+CREATE INDEX idx_background_jobs_resource ON background_jobs(type, resource_id);
+
+ALTER TABLE background_jobs ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY background_jobs_policy ON background_jobs
+    FOR ALL
+    USING (
+        jwt_role() = 'agency_admin' OR
+        client_id = jwt_client_id()
+    );
+
+CREATE TRIGGER update_background_jobs_updated_at BEFORE UPDATE ON background_jobs FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
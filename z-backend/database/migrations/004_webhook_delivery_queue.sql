@@ -0,0 +1,49 @@
+-- Webhook delivery queue
+-- Turns webhook_deliveries into a durable outbox drained by the API's delivery workers
+
+ALTER TABLE webhook_deliveries ADD COLUMN next_attempt_at TIMESTAMPTZ DEFAULT now() NOT NULL;
+ALTER TABLE webhook_deliveries ADD COLUMN locked_until TIMESTAMPTZ;
+
+-- Deliveries waiting for an attempt (pending, or failed with attempts left)
+CREATE INDEX idx_webhook_deliveries_due ON webhook_deliveries(next_attempt_at)
+    WHERE status IN ('pending', 'failed');
+
+-- Claim due deliveries for a worker
+-- Rows are leased for p_lease_seconds so a crashed worker's deliveries are retried;
+-- SKIP LOCKED lets several API instances drain the queue concurrently.
+CREATE OR REPLACE FUNCTION claim_webhook_deliveries(p_limit INTEGER, p_lease_seconds INTEGER)
+RETURNS TABLE (
+    id UUID,
+    webhook_endpoint_id UUID,
+    event_type TEXT,
+    payload JSONB,
+    attempt INTEGER,
+    url TEXT,
+    secret TEXT,
+    enabled BOOLEAN,
+    retry_config JSONB
+) AS $$
+#variable_conflict use_column
+BEGIN
+    RETURN QUERY
+    WITH claimed AS (
+        UPDATE webhook_deliveries d
+        SET locked_until = now() + make_interval(secs => p_lease_seconds)
+        WHERE d.id IN (
+            SELECT due.id
+            FROM webhook_deliveries due
+            WHERE due.status IN ('pending', 'failed')
+              AND due.next_attempt_at <= now()
+              AND (due.locked_until IS NULL OR due.locked_until < now())
+            ORDER BY due.next_attempt_at
+            LIMIT p_limit
+            FOR UPDATE SKIP LOCKED
+        )
+        RETURNING d.id, d.webhook_endpoint_id, d.event_type, d.payload, d.attempt
+    )
+    SELECT c.id, c.webhook_endpoint_id, c.event_type, c.payload, c.attempt,
+           e.url, e.secret, e.enabled, e.retry_config
+    FROM claimed c
+    JOIN webhook_endpoints e ON e.id = c.webhook_endpoint_id;
+END;
+$$ LANGUAGE plpgsql;
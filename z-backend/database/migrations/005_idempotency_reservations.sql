@@ -0,0 +1,53 @@
+-- Idempotency key reservations
+-- A key is reserved (in_progress) before the request executes and completed with its
+-- response afterwards, so concurrent duplicates cannot both run the side effect
+
+ALTER TABLE idempotency_keys ADD COLUMN status TEXT NOT NULL DEFAULT 'completed'
+    CHECK (status IN ('in_progress', 'completed'));
+ALTER TABLE idempotency_keys ALTER COLUMN response_body DROP NOT NULL;
+ALTER TABLE idempotency_keys ALTER COLUMN status_code DROP NOT NULL;
+
+-- Reserve a key (insert-if-absent)
+-- Expired keys and in_progress reservations older than p_stale_seconds (crashed requests)
+-- are taken over. Returns reserved = true if the caller now owns the key; otherwise the
+-- existing row's status and response.
+CREATE OR REPLACE FUNCTION reserve_idempotency_key(
+    p_client_id UUID,
+    p_key TEXT,
+    p_request_hash TEXT,
+    p_ttl_at TIMESTAMPTZ,
+    p_stale_seconds INTEGER
+)
+RETURNS TABLE (
+    reserved BOOLEAN,
+    status TEXT,
+    response_body JSONB,
+    status_code INTEGER
+) AS $$
+#variable_conflict use_column
+BEGIN
+    INSERT INTO idempotency_keys (client_id, key, request_hash, status, ttl_at)
+    VALUES (p_client_id, p_key, p_request_hash, 'in_progress', p_ttl_at)
+    ON CONFLICT (client_id, key, request_hash) DO UPDATE
+    SET status = 'in_progress',
+        response_body = NULL,
+        status_code = NULL,
+        created_at = now(),
+        ttl_at = EXCLUDED.ttl_at
+    WHERE idempotency_keys.ttl_at < now()
+       OR (idempotency_keys.status = 'in_progress'
+           AND idempotency_keys.created_at < now() - make_interval(secs => p_stale_seconds));
+
+    IF FOUND THEN
+        RETURN QUERY SELECT true, 'in_progress'::TEXT, NULL::JSONB, NULL::INTEGER;
+        RETURN;
+    END IF;
+
+    RETURN QUERY
+    SELECT false, k.status, k.response_body, k.status_code
+    FROM idempotency_keys k
+    WHERE k.client_id = p_client_id
+      AND k.key = p_key
+      AND k.request_hash = p_request_hash;
+END;
+$$ LANGUAGE plpgsql;
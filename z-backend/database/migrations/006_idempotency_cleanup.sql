@@ -0,0 +1,24 @@
+-- Set-based expiry of idempotency keys
+-- Deletes one bounded batch of expired keys per call, walking idx_idempotency_ttl
+
+CREATE OR REPLACE FUNCTION delete_expired_idempotency_keys(p_batch_size INTEGER)
+RETURNS INTEGER AS $$
+DECLARE
+    v_deleted INTEGER;
+BEGIN
+    WITH expired AS (
+        SELECT id
+        FROM idempotency_keys
+        WHERE ttl_at < now()
+        ORDER BY ttl_at
+        LIMIT p_batch_size
+        FOR UPDATE SKIP LOCKED
+    )
+    DELETE FROM idempotency_keys k
+    USING expired e
+    WHERE k.id = e.id;
+
+    GET DIAGNOSTICS v_deleted = ROW_COUNT;
+    RETURN v_deleted;
+END;
+$$ LANGUAGE plpgsql;
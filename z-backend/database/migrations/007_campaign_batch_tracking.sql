@@ -0,0 +1,27 @@
+-- Campaign batch tracking
+-- Records which Ultravox batch each contact was submitted in, so scheduling can
+-- resume with only the contacts whose batch submission failed
+
+ALTER TABLE campaign_contacts ADD COLUMN ultravox_batch_id TEXT;
+
+CREATE INDEX idx_campaign_contacts_unsubmitted ON campaign_contacts(campaign_id, created_at)
+    WHERE ultravox_batch_id IS NULL;
+
+-- Record a submitted batch: tag its contacts and append the batch id to the campaign
+-- (one transaction, safe for batches submitted concurrently)
+CREATE OR REPLACE FUNCTION record_campaign_batch(
+    p_campaign_id UUID,
+    p_batch_id TEXT,
+    p_contact_ids UUID[]
+) RETURNS VOID AS $$
+BEGIN
+    UPDATE campaign_contacts
+    SET ultravox_batch_id = p_batch_id
+    WHERE campaign_id = p_campaign_id
+      AND id = ANY(p_contact_ids);
+
+    UPDATE campaigns
+    SET ultravox_batch_ids = COALESCE(ultravox_batch_ids, '[]'::jsonb) || to_jsonb(p_batch_id)
+    WHERE id = p_campaign_id;
+END;
+$$ LANGUAGE plpgsql;
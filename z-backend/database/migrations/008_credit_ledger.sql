@@ -0,0 +1,47 @@
+-- Credit ledger
+-- Applies a credit transaction and the matching balance change in one statement,
+-- so concurrent debits and purchases can't overwrite each other's balance
+
+-- Stripe payment intent ids ("pi_...") are not UUIDs
+ALTER TABLE credit_transactions ALTER COLUMN reference_id TYPE TEXT USING reference_id::text;
+
+-- Returns (applied, balance): applied is false when p_require_balance is set and
+-- the balance doesn't cover a debit; no rows when the client doesn't exist.
+-- Unconditional debits (e.g. for a call that already happened) floor the balance at 0.
+CREATE OR REPLACE FUNCTION apply_credit_transaction(
+    p_client_id UUID,
+    p_type TEXT,
+    p_amount INTEGER,
+    p_reference_type TEXT DEFAULT NULL,
+    p_reference_id TEXT DEFAULT NULL,
+    p_description TEXT DEFAULT NULL,
+    p_require_balance BOOLEAN DEFAULT FALSE
+) RETURNS TABLE (applied BOOLEAN, balance INTEGER) AS $$
+#variable_conflict use_column
+DECLARE
+    v_balance INTEGER;
+BEGIN
+    IF p_type = 'spent' THEN
+        UPDATE clients
+        SET credits_balance = GREATEST(credits_balance - p_amount, 0)
+        WHERE id = p_client_id
+          AND (NOT p_require_balance OR credits_balance >= p_amount)
+        RETURNING credits_balance INTO v_balance;
+    ELSE
+        UPDATE clients
+        SET credits_balance = credits_balance + p_amount
+        WHERE id = p_client_id
+        RETURNING credits_balance INTO v_balance;
+    END IF;
+
+    IF NOT FOUND THEN
+        RETURN QUERY SELECT FALSE, c.credits_balance FROM clients c WHERE c.id = p_client_id;
+        RETURN;
+    END IF;
+
+    INSERT INTO credit_transactions (client_id, type, amount, reference_type, reference_id, description)
+    VALUES (p_client_id, p_type, p_amount, p_reference_type, p_reference_id, p_description);
+
+    RETURN QUERY SELECT TRUE, v_balance;
+END;
+$$ LANGUAGE plpgsql;
@@ -0,0 +1,46 @@
+-- Webhook delivery trace context
+-- Stores the W3C traceparent of the request that queued a delivery so the
+-- delivery workers can continue its trace and propagate it to the endpoint
+
+ALTER TABLE webhook_deliveries ADD COLUMN traceparent TEXT;
+
+-- The return type changes, so the function must be dropped first
+DROP FUNCTION IF EXISTS claim_webhook_deliveries(INTEGER, INTEGER);
+
+CREATE OR REPLACE FUNCTION claim_webhook_deliveries(p_limit INTEGER, p_lease_seconds INTEGER)
+RETURNS TABLE (
+    id UUID,
+    webhook_endpoint_id UUID,
+    event_type TEXT,
+    payload JSONB,
+    attempt INTEGER,
+    traceparent TEXT,
+    url TEXT,
+    secret TEXT,
+    enabled BOOLEAN,
+    retry_config JSONB
+) AS $$
+#variable_conflict use_column
+BEGIN
+    RETURN QUERY
+    WITH claimed AS (
+        UPDATE webhook_deliveries d
+        SET locked_until = now() + make_interval(secs => p_lease_seconds)
+        WHERE d.id IN (
+            SELECT due.id
+            FROM webhook_deliveries due
+            WHERE due.status IN ('pending', 'failed')
+              AND due.next_attempt_at <= now()
+              AND (due.locked_until IS NULL OR due.locked_until < now())
+            ORDER BY due.next_attempt_at
+            LIMIT p_limit
+            FOR UPDATE SKIP LOCKED
+        )
+        RETURNING d.id, d.webhook_endpoint_id, d.event_type, d.payload, d.attempt, d.traceparent
+    )
+    SELECT c.id, c.webhook_endpoint_id, c.event_type, c.payload, c.attempt, c.traceparent,
+           e.url, e.secret, e.enabled, e.retry_config
+    FROM claimed c
+    JOIN webhook_endpoints e ON e.id = c.webhook_endpoint_id;
+END;
+$$ LANGUAGE plpgsql;
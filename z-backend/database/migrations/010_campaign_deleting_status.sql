@@ -0,0 +1,8 @@
+-- Campaign deleting status
+-- A campaign is moved to 'deleting' (conditionally, from draft or failed)
+-- before it is deleted, so it cannot be scheduled or receive contacts while
+-- its contacts are being removed in the background
+
+ALTER TABLE campaigns DROP CONSTRAINT IF EXISTS campaigns_status_check;
+ALTER TABLE campaigns ADD CONSTRAINT campaigns_status_check
+    CHECK (status IN ('draft', 'scheduled', 'active', 'completed', 'failed', 'deleting'));
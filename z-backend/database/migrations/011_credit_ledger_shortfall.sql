@@ -0,0 +1,63 @@
+-- Credit ledger shortfall
+-- An unconditional debit that exceeds the balance floors the balance at 0.
+-- The transaction now records the amount actually debited, and the part
+-- that could not be covered goes in shortfall, so summing credit_transactions
+-- matches the balance changes
+
+ALTER TABLE credit_transactions ADD COLUMN shortfall INTEGER NOT NULL DEFAULT 0 CHECK (shortfall >= 0);
+
+-- A debit against an empty balance is recorded with amount 0 and the full shortfall
+ALTER TABLE credit_transactions DROP CONSTRAINT IF EXISTS credit_transactions_amount_check;
+ALTER TABLE credit_transactions ADD CONSTRAINT credit_transactions_amount_check
+    CHECK (amount > 0 OR (amount = 0 AND shortfall > 0));
+
+-- Returns (applied, balance): applied is false when p_require_balance is set and
+-- the balance doesn't cover a debit; no rows when the client doesn't exist.
+CREATE OR REPLACE FUNCTION apply_credit_transaction(
+    p_client_id UUID,
+    p_type TEXT,
+    p_amount INTEGER,
+    p_reference_type TEXT DEFAULT NULL,
+    p_reference_id TEXT DEFAULT NULL,
+    p_description TEXT DEFAULT NULL,
+    p_require_balance BOOLEAN DEFAULT FALSE
+) RETURNS TABLE (applied BOOLEAN, balance INTEGER) AS $$
+#variable_conflict use_column
+DECLARE
+    v_balance INTEGER;
+    v_amount INTEGER := p_amount;
+BEGIN
+    IF p_type = 'spent' THEN
+        -- Lock the row so the debited amount is computed from the balance it replaces
+        SELECT credits_balance INTO v_balance FROM clients WHERE id = p_client_id FOR UPDATE;
+        IF NOT FOUND THEN
+            RETURN;
+        END IF;
+
+        IF p_require_balance AND v_balance < p_amount THEN
+            RETURN QUERY SELECT FALSE, v_balance;
+            RETURN;
+        END IF;
+
+        v_amount := GREATEST(LEAST(p_amount, v_balance), 0);
+        UPDATE clients
+        SET credits_balance = credits_balance - v_amount
+        WHERE id = p_client_id
+        RETURNING credits_balance INTO v_balance;
+    ELSE
+        UPDATE clients
+        SET credits_balance = credits_balance + p_amount
+        WHERE id = p_client_id
+        RETURNING credits_balance INTO v_balance;
+
+        IF NOT FOUND THEN
+            RETURN;
+        END IF;
+    END IF;
+
+    INSERT INTO credit_transactions (client_id, type, amount, shortfall, reference_type, reference_id, description)
+    VALUES (p_client_id, p_type, v_amount, p_amount - v_amount, p_reference_type, p_reference_id, p_description);
+
+    RETURN QUERY SELECT TRUE, v_balance;
+END;
+$$ LANGUAGE plpgsql;
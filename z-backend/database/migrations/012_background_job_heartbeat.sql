@@ -0,0 +1,9 @@
+-- Background job heartbeats
+-- Running jobs refresh heartbeat_at periodically. A queued or running job
+-- whose heartbeat is older than the lease (JOB_LEASE_SECONDS) belongs to a
+-- worker that crashed, so its resource (e.g. a campaign stuck in 'deleting')
+-- can be taken over by a new job
+
+ALTER TABLE background_jobs ADD COLUMN IF NOT EXISTS heartbeat_at TIMESTAMPTZ;
+
+UPDATE background_jobs SET heartbeat_at = updated_at WHERE status IN ('queued', 'running');
@@ -0,0 +1,82 @@
+-- Credit ledger idempotency
+-- A webhook redelivered by Ultravox (call.completed) or Stripe
+-- (payment_intent.succeeded) must not debit or credit the client again.
+-- A reference can be recorded once per transaction type, and replaying it
+-- returns the current balance without applying it again
+
+-- The unique index can't be built over existing duplicates; reconcile them first
+DO $$
+BEGIN
+    IF EXISTS (
+        SELECT 1 FROM credit_transactions
+        WHERE reference_id IS NOT NULL
+        GROUP BY reference_type, reference_id, type
+        HAVING count(*) > 1
+    ) THEN
+        RAISE EXCEPTION 'credit_transactions has duplicate (reference_type, reference_id, type) rows; reconcile them before applying this migration';
+    END IF;
+END;
+$$;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_credit_transactions_reference
+    ON credit_transactions(reference_type, reference_id, type)
+    WHERE reference_id IS NOT NULL;
+
+-- Returns (applied, balance): applied is false when p_require_balance is set and
+-- the balance doesn't cover a debit; no rows when the client doesn't exist.
+-- A reference already recorded for p_type returns (true, current balance).
+CREATE OR REPLACE FUNCTION apply_credit_transaction(
+    p_client_id UUID,
+    p_type TEXT,
+    p_amount INTEGER,
+    p_reference_type TEXT DEFAULT NULL,
+    p_reference_id TEXT DEFAULT NULL,
+    p_description TEXT DEFAULT NULL,
+    p_require_balance BOOLEAN DEFAULT FALSE
+) RETURNS TABLE (applied BOOLEAN, balance INTEGER) AS $$
+#variable_conflict use_column
+DECLARE
+    v_balance INTEGER;
+    v_amount INTEGER := p_amount;
+BEGIN
+    -- Lock the row so a debit is computed from the balance it replaces, and a
+    -- concurrent replay of the same reference waits for this one to commit
+    SELECT credits_balance INTO v_balance FROM clients WHERE id = p_client_id FOR UPDATE;
+    IF NOT FOUND THEN
+        RETURN;
+    END IF;
+
+    IF p_reference_id IS NOT NULL AND EXISTS (
+        SELECT 1 FROM credit_transactions
+        WHERE reference_type IS NOT DISTINCT FROM p_reference_type
+          AND reference_id = p_reference_id
+          AND type = p_type
+    ) THEN
+        RETURN QUERY SELECT TRUE, v_balance;
+        RETURN;
+    END IF;
+
+    IF p_type = 'spent' THEN
+        IF p_require_balance AND v_balance < p_amount THEN
+            RETURN QUERY SELECT FALSE, v_balance;
+            RETURN;
+        END IF;
+
+        v_amount := GREATEST(LEAST(p_amount, v_balance), 0);
+        UPDATE clients
+        SET credits_balance = credits_balance - v_amount
+        WHERE id = p_client_id
+        RETURNING credits_balance INTO v_balance;
+    ELSE
+        UPDATE clients
+        SET credits_balance = credits_balance + p_amount
+        WHERE id = p_client_id
+        RETURNING credits_balance INTO v_balance;
+    END IF;
+
+    INSERT INTO credit_transactions (client_id, type, amount, shortfall, reference_type, reference_id, description)
+    VALUES (p_client_id, p_type, v_amount, p_amount - v_amount, p_reference_type, p_reference_id, p_description);
+
+    RETURN QUERY SELECT TRUE, v_balance;
+END;
+$$ LANGUAGE plpgsql;
@@ -0,0 +1,50 @@
+"""
+Audit writer tests
+"""
+import json
+import pytest
+from app.core import audit
+from app.core.config import settings
+
+
+class UnavailableDatabase:
+    def __init__(self):
+        raise RuntimeError("SUPABASE_URL is not configured")
+
+
+@pytest.fixture
+def spill_path(tmp_path, monkeypatch):
+    path = tmp_path / "audit_spill.jsonl"
+    monkeypatch.setattr(settings, "AUDIT_SPILL_PATH", str(path))
+    monkeypatch.setattr(settings, "AUDIT_FLUSH_INTERVAL_MS", 60_000)
+    audit._buffer.clear()
+    yield path
+    audit._buffer.clear()
+
+
+@pytest.mark.asyncio
+async def test_stop_spills_buffer_when_database_is_unavailable(spill_path, monkeypatch):
+    monkeypatch.setattr(audit, "DatabaseAdminService", UnavailableDatabase)
+    await audit.start_audit_writer()
+    await audit.log_audit_event("UPDATE", "agents", "agent-1", "auth0|u1", "client-1")
+    
+    # Must not raise, so the rest of the lifespan shutdown runs
+    await audit.stop_audit_writer()
+    
+    rows = [json.loads(line) for line in spill_path.read_text().splitlines()]
+    assert [row["record_id"] for row in rows] == ["agent-1"]
+    assert not audit._buffer
+
+
+@pytest.mark.asyncio
+async def test_full_buffer_spills_to_disk(spill_path, monkeypatch):
+    monkeypatch.setattr(settings, "AUDIT_BUFFER_SIZE", 1)
+    monkeypatch.setattr(settings, "AUDIT_FLUSH_BATCH_SIZE", 10)
+    monkeypatch.setattr(audit, "_writer_task", object())
+    monkeypatch.setattr(audit, "_flush_event", None)
+    audit._buffer.append(({"record_id": "buffered"}, 0))
+    
+    await audit.log_audit_event("DELETE", "agents", "agent-2", "auth0|u1", "client-1")
+    
+    rows = [json.loads(line) for line in spill_path.read_text().splitlines()]
+    assert [row["record_id"] for row in rows] == ["agent-2"]
@@ -0,0 +1,61 @@
+"""
+Campaign batch submission tests
+"""
+import pytest
+from app.services import campaign_batches
+
+CAMPAIGN = {"id": "campaign-1", "timezone": "UTC", "max_concurrent_calls": 5}
+
+
+class FakeDB:
+    def __init__(self, contacts, rpc_failures):
+        self.contacts = contacts
+        self.rpc_failures = rpc_failures
+        self.recorded = []
+    
+    async def select(self, table, filters=None, **kwargs):
+        return self.contacts if kwargs.get("cursor") is None else []
+    
+    async def rpc(self, function, params):
+        if self.rpc_failures:
+            self.rpc_failures -= 1
+            raise ConnectionError("database unavailable")
+        self.recorded.append(params["p_batch_id"])
+
+
+class FakeUltravox:
+    async def create_scheduled_batch(self, agent_id, batch_data):
+        return {"batches": [{"batch_id": "batch-1"}]}
+
+
+@pytest.fixture(autouse=True)
+def fake_ultravox(monkeypatch):
+    monkeypatch.setattr(campaign_batches, "ultravox_client", FakeUltravox())
+    monkeypatch.setattr(campaign_batches, "RECORD_BATCH_BASE_DELAY", 0)
+
+
+def contacts(n):
+    return [{"id": f"contact-{i}", "phone_number": f"+1555000{i:04d}", "created_at": "2024-01-01"} for i in range(n)]
+
+
+@pytest.mark.asyncio
+async def test_record_failure_is_retried():
+    db = FakeDB(contacts(3), rpc_failures=2)
+    summary = await campaign_batches.submit_campaign_batches(db, CAMPAIGN, "agent-1")
+    
+    assert db.recorded == ["batch-1"]
+    assert summary["batch_ids"] == ["batch-1"]
+    assert summary["failed_batches"] == 0
+    assert summary["unrecorded_batch_ids"] == []
+
+
+@pytest.mark.asyncio
+async def test_unrecorded_batch_is_not_counted_as_failed():
+    db = FakeDB(contacts(3), rpc_failures=campaign_batches.RECORD_BATCH_ATTEMPTS)
+    summary = await campaign_batches.submit_campaign_batches(db, CAMPAIGN, "agent-1")
+    
+    assert summary["batch_ids"] == ["batch-1"]
+    assert summary["contacts_submitted"] == 3
+    assert summary["failed_batches"] == 0
+    assert summary["contacts_failed"] == 0
+    assert summary["unrecorded_batch_ids"] == ["batch-1"]
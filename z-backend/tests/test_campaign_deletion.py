@@ -0,0 +1,137 @@
+"""
+Campaign deletion tests
+"""
+import asyncio
+from datetime import datetime, timedelta, timezone
+import pytest
+from app.api.v1 import campaigns as campaigns_api
+from app.core import jobs
+from app.core.exceptions import ValidationError
+from app.services import campaign_deletion
+
+CAMPAIGN_ID = "campaign-1"
+USER = {"role": "client_admin", "client_id": "client-1", "token": "token"}
+
+
+class FakeDB:
+    """Records campaign updates; optionally blocks selects until cancelled"""
+    
+    def __init__(self, campaign=None, block_selects=False, select_rows=None):
+        self.campaign = campaign
+        self.block_selects = block_selects
+        self.select_rows = select_rows or []
+        self.selecting = asyncio.Event()
+        self.updates = []
+        self.deleted = []
+    
+    def __call__(self, *args):
+        return self
+    
+    def set_auth(self, token):
+        pass
+    
+    async def get_campaign(self, campaign_id, client_id):
+        return self.campaign
+    
+    async def select(self, table, filters, **kwargs):
+        self.selecting.set()
+        if self.block_selects:
+            await asyncio.sleep(3600)
+        return self.select_rows
+    
+    async def update(self, table, filters, data):
+        self.updates.append((table, filters, data))
+        return {"id": filters["id"], **data}
+    
+    async def bulk_delete(self, table, filters, ids=None):
+        self.deleted.append(table)
+        return 1
+
+
+@pytest.mark.asyncio
+async def test_cancelled_job_restores_status(monkeypatch):
+    db = FakeDB(block_selects=True)
+    monkeypatch.setattr(campaign_deletion, "DatabaseAdminService", db)
+    
+    async def report_progress(progress):
+        pass
+    
+    task = asyncio.create_task(campaign_deletion.delete_campaign(CAMPAIGN_ID, report_progress, "draft"))
+    await db.selecting.wait()
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    
+    assert db.updates == [("campaigns", {"id": CAMPAIGN_ID, "status": "deleting"}, {"status": "draft"})]
+
+
+@pytest.mark.asyncio
+async def test_find_live_job_ignores_stale_heartbeat(monkeypatch):
+    now = datetime.now(timezone.utc)
+    stale = {"id": "job-1", "heartbeat_at": (now - timedelta(seconds=jobs.settings.JOB_LEASE_SECONDS + 60)).isoformat()}
+    fresh = {"id": "job-2", "heartbeat_at": now.replace(tzinfo=None).isoformat()}
+    
+    monkeypatch.setattr(jobs, "DatabaseAdminService", FakeDB(select_rows=[stale]))
+    assert await jobs.find_live_job("campaign_delete", CAMPAIGN_ID) is None
+    
+    monkeypatch.setattr(jobs, "DatabaseAdminService", FakeDB(select_rows=[stale, fresh]))
+    assert await jobs.find_live_job("campaign_delete", CAMPAIGN_ID) == fresh
+
+
+@pytest.mark.asyncio
+async def test_fail_dead_jobs_counts_only_jobs_it_marked(monkeypatch):
+    now = datetime.now(timezone.utc)
+    stale = {"id": "job-1", "status": "running", "heartbeat_at": (now - timedelta(days=1)).isoformat()}
+    fresh = {"id": "job-2", "status": "running", "heartbeat_at": now.isoformat()}
+    db = FakeDB(select_rows=[stale, fresh])
+    monkeypatch.setattr(jobs, "DatabaseAdminService", db)
+    
+    assert await jobs.fail_dead_jobs("campaign_dial", CAMPAIGN_ID) == 1
+    assert [(filters, data["status"]) for _, filters, data in db.updates] == [
+        ({"id": "job-1", "status": "running"}, "failed"),
+    ]
+    
+    # A concurrent caller that loses the conditional update takes over nothing
+    async def lost_update(table, filters, data):
+        return {}
+    
+    db.update = lost_update
+    assert await jobs.fail_dead_jobs("campaign_dial", CAMPAIGN_ID) == 0
+
+
+@pytest.mark.asyncio
+async def test_delete_restores_status_when_job_creation_fails(monkeypatch):
+    campaign = {"id": CAMPAIGN_ID, "status": "failed", "stats": {"pending": 5000}}
+    db = FakeDB(campaign=campaign)
+    monkeypatch.setattr(campaigns_api, "DatabaseService", db)
+    monkeypatch.setattr(campaign_deletion, "DatabaseAdminService", db)
+    
+    async def failing_create_job(*args):
+        raise RuntimeError("database unavailable")
+    
+    monkeypatch.setattr(campaigns_api, "create_job", failing_create_job)
+    
+    with pytest.raises(RuntimeError):
+        await campaigns_api.delete_campaign(CAMPAIGN_ID, current_user=USER, x_client_id=None)
+    
+    assert db.updates[-1] == ("campaigns", {"id": CAMPAIGN_ID, "status": "deleting"}, {"status": "failed"})
+
+
+@pytest.mark.asyncio
+async def test_delete_takes_over_campaign_without_live_job(monkeypatch):
+    db = FakeDB(campaign={"id": CAMPAIGN_ID, "status": "deleting", "stats": {"pending": 10}})
+    monkeypatch.setattr(campaigns_api, "DatabaseService", db)
+    live_job = {}
+    
+    async def fake_find_live_job(job_type, resource_id):
+        return live_job.get(resource_id)
+    
+    monkeypatch.setattr(campaigns_api, "find_live_job", fake_find_live_job)
+    
+    response = await campaigns_api.delete_campaign(CAMPAIGN_ID, current_user=USER, x_client_id=None)
+    assert response["data"]["deleted"] is True
+    assert db.deleted == ["campaigns"]
+    
+    live_job[CAMPAIGN_ID] = {"id": "job-1"}
+    with pytest.raises(ValidationError):
+        await campaigns_api.delete_campaign(CAMPAIGN_ID, current_user=USER, x_client_id=None)
@@ -0,0 +1,246 @@
+"""
+Campaign dialer tests
+"""
+import asyncio
+import uuid
+import pytest
+from app.api.v1 import campaigns as campaigns_api
+from app.core.config import settings
+from app.core.exceptions import ValidationError
+from app.services import campaign_dialer as dialer_module
+from app.services.campaign_dialer import CampaignDialer, TenantLimiter, _CallSlot, _CampaignRun
+
+CAMPAIGN = {"id": "campaign-1", "client_id": "client-1", "agent_id": "agent-1", "max_concurrent_calls": 2}
+CONTACT = {"id": "contact-1", "phone_number": "+15550000001"}
+USER = {"role": "client_admin", "client_id": "client-1", "token": "token"}
+
+
+class FakeDB:
+    """Applies conditional updates to a single campaign contact"""
+    
+    def __init__(self, claimable=True):
+        self.contact = {"status": "pending" if claimable else "calling", "call_id": None}
+        self.updates = []
+        self.inserts = []
+    
+    async def update(self, table, filters, data):
+        self.updates.append((table, filters, data))
+        if table == "campaign_contacts":
+            conditions = {k: v for k, v in filters.items() if k != "id"}
+            if any(self.contact[k] != v for k, v in conditions.items()):
+                return {}
+            self.contact.update(data)
+        return {"id": filters["id"], **data}
+    
+    async def insert(self, table, data):
+        self.inserts.append((table, data))
+        return data
+
+
+class FailingUltravox:
+    async def create_call(self, data):
+        raise RuntimeError("ultravox unavailable")
+
+
+class BlockingUltravox:
+    def __init__(self):
+        self.called = asyncio.Event()
+    
+    async def create_call(self, data):
+        self.called.set()
+        await asyncio.sleep(3600)
+
+
+async def take_slot(dialer: CampaignDialer, run: _CampaignRun) -> _CallSlot:
+    await run.semaphore.acquire()
+    run.tenant.in_flight += 1
+    await run.tenant.semaphore.acquire()
+    slot = _CallSlot(run, str(uuid.uuid4()))
+    run.active[slot.call_id] = slot
+    run.idle.clear()
+    dialer._calls[slot.call_id] = slot
+    return slot
+
+
+@pytest.mark.asyncio
+async def test_already_claimed_contact_is_skipped():
+    dialer = CampaignDialer()
+    run = _CampaignRun(CAMPAIGN, TenantLimiter("client-1", 5))
+    slot = await take_slot(dialer, run)
+    db = FakeDB(claimable=False)
+    
+    assert await dialer._place_call(db, run, "uv-agent", CONTACT, slot) is None
+    
+    # Nothing was created and the slot is free again
+    assert db.inserts == []
+    assert slot.released and run.idle.is_set()
+    assert run.tenant.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_cancelled_placement_releases_slot(monkeypatch):
+    ultravox = BlockingUltravox()
+    monkeypatch.setattr(dialer_module, "ultravox_client", ultravox)
+    dialer = CampaignDialer()
+    run = _CampaignRun(CAMPAIGN, TenantLimiter("client-1", 5))
+    slot = await take_slot(dialer, run)
+    
+    db = FakeDB()
+    
+    task = asyncio.create_task(dialer._place_call(db, run, "uv-agent", CONTACT, slot))
+    await ultravox.called.wait()
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    
+    # The contact goes back to pending so the next run dials it
+    assert db.contact == {"status": "pending", "call_id": None}
+    assert ("calls", {"id": slot.call_id, "ultravox_call_id": None}, {"status": "failed"}) in db.updates
+    assert slot.released
+    assert slot.call_id not in dialer._calls
+    assert run.tenant.in_flight == 0
+    assert not run.semaphore.locked()
+
+
+@pytest.mark.asyncio
+async def test_placement_cancelled_before_call_record_releases_contact():
+    dialer = CampaignDialer()
+    run = _CampaignRun(CAMPAIGN, TenantLimiter("client-1", 5))
+    slot = await take_slot(dialer, run)
+    db = FakeDB()
+    inserting = asyncio.Event()
+    
+    async def blocking_insert(table, data):
+        inserting.set()
+        await asyncio.sleep(3600)
+    
+    db.insert = blocking_insert
+    task = asyncio.create_task(dialer._place_call(db, run, "uv-agent", CONTACT, slot))
+    await inserting.wait()
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    
+    assert db.contact == {"status": "pending", "call_id": None}
+    assert slot.released
+
+
+@pytest.mark.asyncio
+async def test_failed_placement_without_status_update_releases_contact(monkeypatch):
+    monkeypatch.setattr(dialer_module, "ultravox_client", FailingUltravox())
+    dialer = CampaignDialer()
+    run = _CampaignRun(CAMPAIGN, TenantLimiter("client-1", 5))
+    slot = await take_slot(dialer, run)
+    db = FakeDB()
+    
+    original_update = db.update
+    
+    async def update(table, filters, data):
+        # Marking the call failed after the Ultravox error raises too
+        if table == "calls" and data == {"status": "failed"} and "ultravox_call_id" not in filters:
+            raise RuntimeError("database unavailable")
+        return await original_update(table, filters, data)
+    
+    db.update = update
+    with pytest.raises(RuntimeError):
+        await dialer._place_call(db, run, "uv-agent", CONTACT, slot)
+    
+    assert db.contact == {"status": "pending", "call_id": None}
+    assert slot.released
+
+
+class FakeScheduleDB:
+    def __init__(self, status):
+        self.campaign = {
+            **CAMPAIGN,
+            "name": "Campaign",
+            "schedule_type": "immediate",
+            "scheduled_at": None,
+            "timezone": "UTC",
+            "status": status,
+            "stats": {"pending": 3},
+            "created_at": "2026-01-01T00:00:00+00:00",
+        }
+        self.updates = []
+    
+    def __call__(self, *args):
+        return self
+    
+    def set_auth(self, token):
+        pass
+    
+    async def get_campaign(self, campaign_id, client_id):
+        return dict(self.campaign)
+    
+    async def get_agent(self, agent_id, client_id):
+        return {"id": agent_id, "ultravox_agent_id": "uv-agent"}
+    
+    async def count(self, table, filters, method="exact"):
+        return 3
+    
+    async def update(self, table, filters, data):
+        self.updates.append((table, filters, data))
+        if table == "campaigns":
+            if self.campaign["status"] not in filters["status"]:
+                return {}
+            self.campaign.update(data)
+        return {"id": filters.get("id"), **data}
+
+
+@pytest.fixture
+def schedule_env(monkeypatch):
+    monkeypatch.setattr(settings, "CAMPAIGN_DIALER_ENABLED", True)
+    started = []
+    jobs = {"live": None, "dead": 0}
+    
+    async def find_live_job(job_type, resource_id):
+        return jobs["live"]
+    
+    async def fail_dead_jobs(job_type, resource_id):
+        return jobs["dead"]
+    
+    async def create_job(client_id, job_type, resource_id):
+        return {"id": "job-2", "type": job_type, "status": "queued"}
+    
+    async def emit_campaign_scheduled(**kwargs):
+        pass
+    
+    monkeypatch.setattr(campaigns_api, "find_live_job", find_live_job)
+    monkeypatch.setattr(campaigns_api, "fail_dead_jobs", fail_dead_jobs)
+    monkeypatch.setattr(campaigns_api, "create_job", create_job)
+    monkeypatch.setattr(campaigns_api, "start_job", lambda job, func: started.append(job))
+    monkeypatch.setattr(campaigns_api, "emit_campaign_scheduled", emit_campaign_scheduled)
+    return jobs, started
+
+
+@pytest.mark.asyncio
+async def test_schedule_takes_over_campaign_of_dead_dial_job(monkeypatch, schedule_env):
+    jobs, started = schedule_env
+    jobs["dead"] = 1
+    db = FakeScheduleDB("active")
+    monkeypatch.setattr(campaigns_api, "DatabaseService", db)
+    
+    await campaigns_api.schedule_campaign(CAMPAIGN["id"], current_user=USER, x_client_id=None)
+    
+    assert db.campaign["status"] == "scheduled"
+    assert [job["id"] for job in started] == ["job-2"]
+    # Contacts the dead run claimed without dialing are pending again
+    assert (
+        "campaign_contacts",
+        {"campaign_id": CAMPAIGN["id"], "status": "calling", "call_id": None},
+        {"status": "pending"},
+    ) in db.updates
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("live, dead", [({"id": "job-1"}, 0), (None, 0)])
+async def test_schedule_rejects_campaign_without_dead_dial_job(monkeypatch, schedule_env, live, dead):
+    jobs, started = schedule_env
+    jobs.update(live=live, dead=dead)
+    db = FakeScheduleDB("scheduled")
+    monkeypatch.setattr(campaigns_api, "DatabaseService", db)
+    
+    with pytest.raises(ValidationError):
+        await campaigns_api.schedule_campaign(CAMPAIGN["id"], current_user=USER, x_client_id=None)
+    
+    assert started == []
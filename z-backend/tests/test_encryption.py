@@ -0,0 +1,157 @@
+"""
+Envelope encryption tests (against a fake KMS client)
+"""
+import asyncio
+import base64
+import os
+import threading
+import time
+import pytest
+from app.core import encryption
+from app.core.config import settings
+
+CLIENT_ID = "00000000-0000-0000-0000-0000000000c1"
+
+
+class FakeKMS:
+    """Wraps data keys by prefixing them; decrypts legacy blobs from a lookup table"""
+    
+    def __init__(self, decrypt_delay: float = 0.0):
+        self.decrypt_delay = decrypt_delay
+        self.generated = 0
+        self.decrypted = 0
+        self.legacy = {}
+        self._lock = threading.Lock()
+    
+    def generate_data_key(self, KeyId, KeySpec, EncryptionContext):
+        assert EncryptionContext == encryption.ENCRYPTION_CONTEXT
+        plaintext = os.urandom(32)
+        with self._lock:
+            self.generated += 1
+        return {"Plaintext": plaintext, "CiphertextBlob": b"wrapped:" + plaintext}
+    
+    def decrypt(self, CiphertextBlob, EncryptionContext=None):
+        time.sleep(self.decrypt_delay)
+        with self._lock:
+            self.decrypted += 1
+        if CiphertextBlob in self.legacy:
+            return {"Plaintext": self.legacy[CiphertextBlob]}
+        assert EncryptionContext == encryption.ENCRYPTION_CONTEXT
+        assert CiphertextBlob.startswith(b"wrapped:")
+        return {"Plaintext": CiphertextBlob[len(b"wrapped:"):]}
+
+
+@pytest.fixture
+def kms(monkeypatch):
+    fake = FakeKMS()
+    monkeypatch.setattr(settings, "KMS_KEY_ID", "alias/test")
+    monkeypatch.setattr(settings, "AWS_REGION", "eu-west-2")
+    monkeypatch.setattr(encryption, "_kms_client", fake)
+    monkeypatch.setattr(encryption, "_data_key", None)
+    monkeypatch.setattr(encryption, "_data_key_lock", None)
+    monkeypatch.setattr(encryption, "_decrypted_data_keys", type(encryption._decrypted_data_keys)())
+    monkeypatch.setattr(encryption, "_pending_data_keys", {})
+    monkeypatch.setattr(encryption, "_secret_cache", type(encryption._secret_cache)())
+    return fake
+
+
+def forget_plaintexts() -> None:
+    """Drop cached secrets and data keys so the next decrypt goes through KMS"""
+    encryption._secret_cache.clear()
+    encryption._decrypted_data_keys.clear()
+
+
+@pytest.mark.asyncio
+async def test_round_trip(kms):
+    ciphertext = await encryption.encrypt_api_key("sk-secret", CLIENT_ID, "elevenlabs")
+    
+    assert ciphertext.startswith(encryption.ENVELOPE_PREFIX)
+    assert "sk-secret" not in ciphertext
+    forget_plaintexts()
+    assert await encryption.decrypt_api_key(ciphertext, CLIENT_ID, "elevenlabs") == "sk-secret"
+    assert kms.generated == 1 and kms.decrypted == 1
+
+
+@pytest.mark.asyncio
+async def test_data_key_rotates_by_use_count(kms, monkeypatch):
+    monkeypatch.setattr(settings, "ENCRYPTION_DATA_KEY_MAX_USES", 3)
+    
+    for i in range(7):
+        await encryption.encrypt_api_key(f"sk-{i}", CLIENT_ID, "elevenlabs")
+    
+    assert kms.generated == 3
+
+
+@pytest.mark.asyncio
+async def test_data_key_rotates_by_age(kms):
+    first = await encryption.encrypt_api_key("sk-1", CLIENT_ID, "elevenlabs")
+    await encryption.encrypt_api_key("sk-2", CLIENT_ID, "elevenlabs")
+    assert kms.generated == 1
+    
+    encryption._data_key.created_at -= settings.ENCRYPTION_DATA_KEY_MAX_AGE_SECONDS
+    second = await encryption.encrypt_api_key("sk-3", CLIENT_ID, "elevenlabs")
+    
+    assert kms.generated == 2
+    # Secrets under the old data key still decrypt
+    forget_plaintexts()
+    assert await encryption.decrypt_api_key(first, CLIENT_ID, "elevenlabs") == "sk-1"
+    assert await encryption.decrypt_api_key(second, CLIENT_ID, "elevenlabs") == "sk-3"
+
+
+@pytest.mark.asyncio
+async def test_concurrent_decrypts_share_one_kms_call(kms):
+    ciphertexts = [await encryption.encrypt_api_key(f"sk-{i}", CLIENT_ID, "elevenlabs") for i in range(20)]
+    forget_plaintexts()
+    kms.decrypt_delay = 0.05
+    
+    plaintexts = await asyncio.gather(
+        *(encryption.decrypt_api_key(c, CLIENT_ID, "elevenlabs") for c in ciphertexts)
+    )
+    
+    assert plaintexts == [f"sk-{i}" for i in range(20)]
+    assert kms.decrypted == 1
+
+
+@pytest.mark.asyncio
+async def test_tampered_ciphertext_is_rejected(kms):
+    ciphertext = await encryption.encrypt_api_key("sk-secret", CLIENT_ID, "elevenlabs")
+    blob = bytearray(base64.b64decode(ciphertext[len(encryption.ENVELOPE_PREFIX):]))
+    blob[-1] ^= 0x01
+    tampered = encryption.ENVELOPE_PREFIX + base64.b64encode(bytes(blob)).decode()
+    
+    assert await encryption.decrypt_api_key(tampered, CLIENT_ID, "elevenlabs") is None
+
+
+@pytest.mark.asyncio
+async def test_ciphertext_is_bound_to_client_and_service(kms):
+    ciphertext = await encryption.encrypt_api_key("sk-secret", CLIENT_ID, "elevenlabs")
+    other_client = "00000000-0000-0000-0000-0000000000c2"
+    
+    # Rejected even while the plaintext is cached for the owner
+    assert await encryption.decrypt_api_key(ciphertext, other_client, "elevenlabs") is None
+    assert await encryption.decrypt_api_key(ciphertext, CLIENT_ID, "cartesia") is None
+    assert await encryption.decrypt_api_key(ciphertext, CLIENT_ID, "elevenlabs") == "sk-secret"
+
+
+@pytest.mark.asyncio
+async def test_envelope_without_associated_data_is_rejected(kms):
+    data_key = os.urandom(32)
+    encrypted_key = b"wrapped:" + data_key
+    nonce = os.urandom(encryption.NONCE_SIZE)
+    ciphertext = encryption.AESGCM(data_key).encrypt(nonce, b"sk-unbound", None)
+    blob = len(encrypted_key).to_bytes(2, "big") + encrypted_key + nonce + ciphertext
+    unbound = encryption.ENVELOPE_PREFIX + base64.b64encode(blob).decode()
+    
+    assert await encryption.decrypt_api_key(unbound, CLIENT_ID, "elevenlabs") is None
+
+
+@pytest.mark.asyncio
+async def test_legacy_direct_kms_value_decrypts(kms):
+    # Values encrypted with KMS Encrypt before envelope encryption ("AQICA..." base64)
+    blob = b"\x01\x02\x02\x00" + os.urandom(40)
+    kms.legacy[blob] = b"sk-legacy"
+    legacy = base64.b64encode(blob).decode()
+    assert legacy.startswith("AQICA")
+    
+    assert await encryption.decrypt_api_key(legacy, CLIENT_ID, "elevenlabs") == "sk-legacy"
+    assert kms.decrypted == 1
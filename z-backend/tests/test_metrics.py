@@ -0,0 +1,35 @@
+"""
+Metrics exposition tests
+"""
+import pytest
+from app.core import metrics
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    monkeypatch.setattr(metrics, "_registry", [])
+    return metrics._registry
+
+
+def test_metric_base_is_abstract():
+    with pytest.raises(TypeError):
+        metrics._Metric("test_metric", "Test")
+
+
+def test_counter_and_histogram_render(registry):
+    counter = metrics.Counter("test_requests_total", "Requests", ["route"])
+    histogram = metrics.Histogram("test_duration_seconds", "Duration", ["route"], buckets=(0.1, 1.0))
+    counter.inc('/a"b')
+    counter.inc('/a"b', amount=2)
+    histogram.observe(0.1, "/x")
+    histogram.observe(5, "/x")
+    
+    lines = metrics.render_metrics().splitlines()
+    
+    assert "# TYPE test_requests_total counter" in lines
+    assert 'test_requests_total{route="/a\\"b"} 3' in lines
+    assert 'test_duration_seconds_bucket{route="/x",le="0.1"} 1' in lines
+    assert 'test_duration_seconds_bucket{route="/x",le="1.0"} 1' in lines
+    assert 'test_duration_seconds_bucket{route="/x",le="+Inf"} 2' in lines
+    assert 'test_duration_seconds_sum{route="/x"} 5.1' in lines
+    assert 'test_duration_seconds_count{route="/x"} 2' in lines
@@ -0,0 +1,80 @@
+"""
+Rate limiting tests
+"""
+import time
+import pytest
+from app.core import auth
+from app.core.rate_limiting import MemoryRateLimitStore, RateLimitStore, RedisRateLimitStore, get_rate_limit_identity
+
+CLIENT_ID = "00000000-0000-0000-0000-0000000000c1"
+
+
+@pytest.fixture(autouse=True)
+def clear_claims_cache():
+    auth._claims_cache.clear()
+    yield
+    auth._claims_cache.clear()
+
+
+def test_unverified_token_is_limited_by_ip():
+    headers = {"authorization": "Bearer not-verified", "x-client-id": CLIENT_ID}
+    assert get_rate_limit_identity(headers, "10.0.0.1") == "ip:10.0.0.1"
+
+
+def test_verified_token_is_limited_by_claimed_client():
+    auth._cache_claims("good-token", {"sub": "auth0|u1", "client_id": CLIENT_ID, "exp": time.time() + 60})
+    # x-client-id is ignored in favour of the verified claim
+    headers = {"authorization": "Bearer good-token", "x-client-id": "someone-else"}
+    assert get_rate_limit_identity(headers, "10.0.0.1") == f"client:{CLIENT_ID}"
+
+
+def test_verified_token_without_client_claim_is_limited_by_user():
+    auth._cache_claims("admin-token", {"sub": "auth0|admin", "exp": time.time() + 60})
+    headers = {"authorization": "Bearer admin-token"}
+    assert get_rate_limit_identity(headers, "10.0.0.1") == "user:auth0|admin"
+
+
+def test_store_requires_hit():
+    with pytest.raises(TypeError):
+        RateLimitStore()
+
+
+@pytest.mark.asyncio
+async def test_memory_store_enforces_limit():
+    store = MemoryRateLimitStore()
+    results = [await store.hit("k", limit=3, period=60) for _ in range(4)]
+    assert [allowed for allowed, _ in results] == [True, True, True, False]
+    assert results[-1][1] > 0
+
+
+@pytest.fixture
+def connect_redis():
+    """Factory for separate connections to one in-memory Redis server"""
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")
+    server = fakeredis.FakeServer()
+    return lambda: fakeredis.FakeAsyncRedis(server=server)
+
+
+@pytest.mark.asyncio
+async def test_redis_store_enforces_limit(connect_redis):
+    store = RedisRateLimitStore(client=connect_redis())
+    
+    results = [await store.hit("k", limit=3, period=60) for _ in range(4)]
+    assert [allowed for allowed, _ in results] == [True, True, True, False]
+    assert results[-1][1] > 0
+    await store.close()
+
+
+@pytest.mark.asyncio
+async def test_redis_stores_share_limit(connect_redis):
+    # Two workers, each with its own store and connection to the same Redis
+    first = RedisRateLimitStore(client=connect_redis())
+    second = RedisRateLimitStore(client=connect_redis())
+    
+    results = [await store.hit("k", limit=3, period=60) for store in (first, second, first, second)]
+    assert [allowed for allowed, _ in results] == [True, True, True, False]
+    # Other keys keep their own quota
+    assert (await second.hit("other", limit=3, period=60))[0]
+    await first.close()
+    await second.close()
@@ -0,0 +1,72 @@
+"""
+Circuit breaker tests
+"""
+import httpx
+import pytest
+from app.core.exceptions import ProviderError
+from app.core.retry import CircuitBreaker, CircuitOpenError
+from app.services.ultravox import UltravoxClient
+
+
+def open_breaker(breaker: CircuitBreaker) -> None:
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+    # Pretend the recovery timeout has elapsed
+    breaker._opened_at -= breaker.recovery_timeout + 1
+
+
+def test_half_open_allows_a_single_probe():
+    breaker = CircuitBreaker("test", failure_threshold=2, recovery_timeout=30)
+    open_breaker(breaker)
+    
+    breaker.before_request()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request()
+    
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.before_request()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("status_code", [404, 422])
+async def test_client_error_probe_closes_circuit(status_code):
+    client = UltravoxClient()
+    client._client = httpx.AsyncClient(
+        base_url="http://ultravox.test/api",
+        transport=httpx.MockTransport(lambda request: httpx.Response(status_code, json={})),
+    )
+    breaker = client._get_circuit_breaker("calls")
+    open_breaker(breaker)
+    
+    with pytest.raises(ProviderError):
+        await client.get_call("missing")
+    
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert not breaker._probe_in_flight
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_server_error_probe_reopens_circuit():
+    requests = []
+    
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(503, json={})
+    
+    client = UltravoxClient()
+    client._client = httpx.AsyncClient(base_url="http://ultravox.test/api", transport=httpx.MockTransport(handler))
+    breaker = client._get_circuit_breaker("calls")
+    open_breaker(breaker)
+    
+    with pytest.raises(ProviderError) as exc_info:
+        await client.get_call("down")
+    
+    # Exactly one probe reached the server (an open breaker would send none)
+    assert len(requests) == 1
+    assert exc_info.value.details["httpStatus"] == 503
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker._probe_in_flight
+    await client.close()
@@ -0,0 +1,56 @@
+"""
+S3 presigning tests
+"""
+import datetime as dt
+from unittest import mock
+import boto3
+import botocore.auth
+import pytest
+from botocore.config import Config
+from app.core import s3
+from app.core.config import settings
+
+PINNED_NOW = dt.datetime(2024, 3, 5, 12, 34, 56)
+
+
+@pytest.fixture
+def credentials(monkeypatch):
+    monkeypatch.setattr(settings, "AWS_ACCESS_KEY_ID", "AKIDEXAMPLE")
+    monkeypatch.setattr(settings, "AWS_SECRET_ACCESS_KEY", "wJalrXUtnFEMI/K7MDENG+bPxRfiCYEXAMPLEKEY")
+    monkeypatch.setattr(s3, "_signing_key", None)
+
+
+def boto3_presign(region: str, operation: str, params: dict) -> str:
+    client = boto3.client(
+        "s3",
+        aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
+        aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
+        config=Config(region_name=region),
+    )
+    with mock.patch.object(botocore.auth.datetime, "datetime", wraps=dt.datetime) as pinned:
+        pinned.utcnow.return_value = PINNED_NOW
+        return client.generate_presigned_url(operation, Params=params, ExpiresIn=900)
+
+
+# Regions where boto3 presigns with SigV4 (see presign_url_v4 for the SigV2 ones)
+@pytest.mark.parametrize("region", ["eu-west-2", "eu-central-1", "us-east-2"])
+@pytest.mark.parametrize("key", ["contacts.csv", "uploads/client 1/list~v2+final.csv"])
+def test_get_matches_boto3(credentials, monkeypatch, region, key):
+    monkeypatch.setattr(settings, "AWS_REGION", region)
+    
+    expected = boto3_presign(region, "get_object", {"Bucket": "trudy-uploads", "Key": key})
+    
+    assert s3.presign_url_v4("trudy-uploads", key, "GET", 900, now=PINNED_NOW) == expected
+
+
+@pytest.mark.parametrize("region", ["eu-west-2", "eu-central-1", "us-east-2"])
+def test_put_with_content_type_matches_boto3(credentials, monkeypatch, region):
+    monkeypatch.setattr(settings, "AWS_REGION", region)
+    params = {"Bucket": "trudy-uploads", "Key": "campaigns/c1/contacts.csv", "ContentType": "text/csv"}
+    
+    expected = boto3_presign(region, "put_object", params)
+    
+    actual = s3.presign_url_v4(
+        "trudy-uploads", params["Key"], "PUT", 900, content_type="text/csv", now=PINNED_NOW
+    )
+    assert actual == expected
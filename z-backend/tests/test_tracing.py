@@ -0,0 +1,90 @@
+"""
+Tracing tests
+"""
+import httpx
+import pytest
+from fastapi import FastAPI
+from app.core import tracing
+from app.core.config import settings
+from app.core.middleware import RequestPipelineMiddleware
+
+INCOMING_TRACE_ID = "0af7651916cd43dd8448eb211c80319c"
+INCOMING_SPAN_ID = "b7ad6b7169203331"
+INCOMING_TRACEPARENT = f"00-{INCOMING_TRACE_ID}-{INCOMING_SPAN_ID}-01"
+
+
+@pytest.fixture
+def exporter(monkeypatch):
+    monkeypatch.setattr(settings, "TRACING_ENABLED", True)
+    monkeypatch.setattr(settings, "RATE_LIMIT_ENABLED", False)
+    monkeypatch.setattr(tracing, "_buffer", tracing.deque())
+    exporter = tracing.InMemorySpanExporter()
+    monkeypatch.setattr(tracing, "_exporter", exporter)
+    return exporter
+
+
+def build_app() -> FastAPI:
+    app = FastAPI()
+    
+    @app.get("/work")
+    async def work():
+        with tracing.trace_span("work"):
+            return tracing.inject_trace_headers()
+    
+    app.add_middleware(RequestPipelineMiddleware)
+    return app
+
+
+async def get_work(headers=None) -> httpx.Response:
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=build_app()), base_url="http://test") as client:
+        return await client.get("/work", headers=headers)
+
+
+def test_span_exporter_is_abstract():
+    with pytest.raises(TypeError):
+        tracing.SpanExporter()
+
+
+@pytest.mark.asyncio
+async def test_child_span_nests_under_server_span_and_is_injected(exporter, monkeypatch):
+    monkeypatch.setattr(settings, "TRACING_SAMPLE_RATE", 1.0)
+    
+    response = await get_work()
+    await tracing.flush_spans()
+    
+    spans = {span.kind: span for span in exporter.spans}
+    server, child = spans[tracing.SERVER], spans[tracing.INTERNAL]
+    assert server.parent_span_id is None
+    assert child.parent_span_id == server.context.span_id
+    assert child.context.trace_id == server.context.trace_id
+    assert response.json()[tracing.TRACEPARENT_HEADER] == (
+        f"00-{child.context.trace_id}-{child.context.span_id}-01"
+    )
+
+
+@pytest.mark.asyncio
+async def test_untrusted_incoming_sampled_flag_is_resampled(exporter, monkeypatch):
+    monkeypatch.setattr(settings, "TRACING_SAMPLE_RATE", 0.0)
+    monkeypatch.setattr(settings, "TRACING_TRUST_INCOMING_SAMPLING", False)
+    
+    response = await get_work({tracing.TRACEPARENT_HEADER: INCOMING_TRACEPARENT})
+    await tracing.flush_spans()
+    
+    assert exporter.spans == []
+    # The trace id is still continued, just not recorded
+    assert response.json()[tracing.TRACEPARENT_HEADER].startswith(f"00-{INCOMING_TRACE_ID}-")
+    assert response.json()[tracing.TRACEPARENT_HEADER].endswith("-00")
+
+
+@pytest.mark.asyncio
+async def test_trusted_incoming_sampled_flag_is_honored(exporter, monkeypatch):
+    monkeypatch.setattr(settings, "TRACING_SAMPLE_RATE", 0.0)
+    monkeypatch.setattr(settings, "TRACING_TRUST_INCOMING_SAMPLING", True)
+    
+    await get_work({tracing.TRACEPARENT_HEADER: INCOMING_TRACEPARENT})
+    await tracing.flush_spans()
+    
+    spans = {span.kind: span for span in exporter.spans}
+    assert {span.context.trace_id for span in exporter.spans} == {INCOMING_TRACE_ID}
+    assert spans[tracing.SERVER].parent_span_id == INCOMING_SPAN_ID
+    assert spans[tracing.INTERNAL].parent_span_id == spans[tracing.SERVER].context.span_id
@@ -0,0 +1,59 @@
+"""
+Webhook delivery dispatcher tests
+"""
+import asyncio
+import pytest
+from app.core.config import settings
+from app.services import webhook_delivery
+
+
+class FakeOutbox:
+    """Serves claim_webhook_deliveries from an in-memory list of due rows"""
+    
+    def __init__(self, due: int):
+        self.due = [{"id": f"delivery-{i}"} for i in range(due)]
+        self.limits = []
+    
+    def __call__(self):
+        return self
+    
+    async def rpc(self, name, params):
+        assert name == "claim_webhook_deliveries"
+        self.limits.append(params["p_limit"])
+        claimed, self.due = self.due[:params["p_limit"]], self.due[params["p_limit"]:]
+        return claimed
+
+
+@pytest.mark.asyncio
+async def test_dispatcher_claims_only_free_worker_slots(monkeypatch):
+    outbox = FakeOutbox(due=7)
+    in_flight = 0
+    max_in_flight = 0
+    sent = []
+    
+    async def slow_delivery(db, delivery):
+        nonlocal in_flight, max_in_flight
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        sent.append(delivery["id"])
+    
+    monkeypatch.setattr(settings, "WEBHOOK_DELIVERY_WORKERS", 3)
+    monkeypatch.setattr(settings, "WEBHOOK_DELIVERY_BATCH_SIZE", 50)
+    monkeypatch.setattr(settings, "WEBHOOK_DELIVERY_POLL_SECONDS", 0.01)
+    monkeypatch.setattr(webhook_delivery, "DatabaseAdminService", outbox)
+    monkeypatch.setattr(webhook_delivery, "_process_delivery", slow_delivery)
+    
+    await webhook_delivery.start_webhook_workers()
+    try:
+        for _ in range(100):
+            if len(sent) == 7:
+                break
+            await asyncio.sleep(0.01)
+    finally:
+        await webhook_delivery.stop_webhook_workers()
+    
+    assert sorted(sent) == sorted(f"delivery-{i}" for i in range(7))
+    assert max(outbox.limits) <= 3
+    assert max_in_flight <= 3